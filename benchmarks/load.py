@@ -0,0 +1,176 @@
+"""
+Load generation against a running server.
+
+A load run keeps a fixed number of requests in flight for a given duration. Each
+request picks one of the `SCENARIOS` at random, weighted by a traffic mix, and
+records its latency and the time until the first byte of the response arrived,
+which is what users of the streaming endpoints wait for.
+"""
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+import itertools
+from pathlib import Path
+import random
+import statistics
+import time
+from typing import Any
+
+import httpx
+
+API = "/api/v1"
+AUDIO_FILE = (
+    Path(__file__).parents[1] / "tests/data/audio/me_gusta_aprender_idiomas.mp3"
+)
+AUDIO_BYTES = AUDIO_FILE.read_bytes()
+SENTENCES = (
+    "Hola, ¿qué tal?",
+    "Me gusta mucho aprender idiomas con mis amigos.",
+    "Mañana vamos a la playa si hace buen tiempo.",
+    "¿Puedes repetir la última frase, por favor?",
+)
+
+type Request = dict[str, Any]
+
+
+def _messages(index: int) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": f"{SENTENCES[index % len(SENTENCES)]} ({index})"},
+    ]
+
+
+def _text(index: int) -> str:
+    # Unique texts, so that every request misses the TTS cache
+    return " ".join(SENTENCES[: index % len(SENTENCES) + 1]) + f" {index}"
+
+
+def _chat(index: int) -> Request:
+    body = {"messages": _messages(index), "model": "gpt-4o", "max_tokens": 150}
+    return {"url": f"{API}/chat-responses/", "json": body}
+
+
+def _chat_stream(index: int) -> Request:
+    request = _chat(index)
+    request["json"]["stream"] = True
+    return request
+
+
+def _chat_speech(index: int) -> Request:
+    body = {"messages": _messages(index), "model": "gpt-4o", "max_tokens": 150}
+    return {"url": f"{API}/chat-speech/", "json": body}
+
+
+def _stt(_: int) -> Request:
+    return {
+        "url": f"{API}/speech-to-text/",
+        "files": {"audio_file": (AUDIO_FILE.name, AUDIO_BYTES, "audio/mpeg")},
+        "params": {"language": "es"},
+    }
+
+
+def _tts(index: int) -> Request:
+    return {"url": f"{API}/text-to-speech/", "json": {"text": _text(index)}}
+
+
+def _tts_stream(index: int) -> Request:
+    return {"url": f"{API}/text-to-speech/stream", "json": {"text": _text(index)}}
+
+
+SCENARIOS: dict[str, Callable[[int], Request]] = {
+    "chat": _chat,
+    "chat_stream": _chat_stream,
+    "chat_speech": _chat_speech,
+    "stt": _stt,
+    "tts": _tts,
+    "tts_stream": _tts_stream,
+}
+
+
+@dataclass
+class Sample:
+    """The outcome of a single request."""
+
+    scenario: str
+    seconds: float
+    first_byte_seconds: float
+    ok: bool
+
+
+async def _send(client: httpx.AsyncClient, scenario: str, index: int) -> Sample:
+    start = time.perf_counter()
+    first_byte = None
+    try:
+        async with client.stream("POST", **SCENARIOS[scenario](index)) as response:
+            async for _ in response.aiter_raw():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+            ok = response.is_success
+    except httpx.HTTPError:
+        ok = False
+    seconds = time.perf_counter() - start
+    return Sample(scenario, seconds, first_byte or seconds, ok)
+
+
+async def run_load(
+    base_url: str, mix: dict[str, float], concurrency: int, duration: float
+) -> tuple[list[Sample], float]:
+    """
+    Send requests according to the traffic mix for `duration` seconds.
+
+    Returns the samples of all completed requests and the elapsed time. Requests in
+    flight when the time is up are completed, so the elapsed time can be slightly
+    longer than `duration`.
+    """
+    scenarios, weights = zip(*mix.items(), strict=True)
+    counter = itertools.count()
+    samples: list[Sample] = []
+    limits = httpx.Limits(max_connections=concurrency)
+    start = time.perf_counter()
+    deadline = start + duration
+
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                scenario = random.choices(scenarios, weights)[0]  # noqa: S311
+                samples.append(await _send(client, scenario, next(counter)))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def _percentiles(values: list[float]) -> dict[str, float]:
+    if len(values) == 1:
+        values = values * 2
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": round(cuts[49] * 1000, 2),
+        "p95": round(cuts[94] * 1000, 2),
+        "p99": round(cuts[98] * 1000, 2),
+        "max": round(max(values) * 1000, 2),
+    }
+
+
+def summarize(samples: list[Sample], elapsed: float) -> dict[str, Any]:
+    """
+    Summarize the samples of a load run.
+
+    Latencies are given in milliseconds. Failed requests count towards the number
+    of requests and errors, but not towards the latencies.
+    """
+    ok = [sample for sample in samples if sample.ok]
+    summary: dict[str, Any] = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "rps": round(len(samples) / elapsed, 2),
+    }
+    if ok:
+        summary["latency_ms"] = _percentiles([sample.seconds for sample in ok])
+        summary["first_byte_ms"] = _percentiles(
+            [sample.first_byte_seconds for sample in ok]
+        )
+    return summary
@@ -0,0 +1,246 @@
+"""
+Benchmark the server against local fakes of the upstream APIs.
+
+The fakes from `benchmarks.upstreams` are started in this process, and the server
+is started as a separate uvicorn process configured to call them, so that its
+memory use can be measured on its own. Each scenario is first run in isolation and
+then all of them together in the traffic mix. For every run, the latency
+percentiles, the throughput and the peak resident memory of the server are
+reported as JSON.
+
+Example:
+    ```bash
+    python -m benchmarks.run --duration 30 --output results.json
+    python -m benchmarks.run --baseline results.json
+    ```
+
+If a baseline is given, the process exits with status 1 if the p95 or p99 latency
+of any run regressed by more than the tolerance, so that it can be used as a gate
+before deploying.
+"""
+
+import argparse
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager, closing
+from datetime import UTC, datetime
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+from typing import Any
+
+import httpx
+import uvicorn
+
+from benchmarks.load import SCENARIOS, run_load, summarize
+from benchmarks.upstreams import UpstreamProfile, create_openai_app, start_tts_server
+
+logger = logging.getLogger("benchmarks")
+
+DEFAULT_MIX = "chat=4,chat_stream=2,chat_speech=1,stt=1,tts=3,tts_stream=1"
+SECRET = "benchmark"  # noqa: S105
+
+
+def _free_port() -> int:
+    with closing(socket.socket()) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            msg = f"Unknown scenario {name!r}, choose from {', '.join(SCENARIOS)}"
+            raise argparse.ArgumentTypeError(msg)
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _reset_peak_rss(pid: int) -> None:
+    """Reset the peak resident memory of a process, if the kernel supports it."""
+    try:
+        Path(f"/proc/{pid}/clear_refs").write_text("5")
+    except OSError:
+        logger.warning("Cannot reset the peak memory, reporting the peak since start")
+
+
+def _peak_rss(pid: int) -> int | None:
+    """Return the peak resident memory of a process in bytes, on Linux."""
+    try:
+        status = Path(f"/proc/{pid}/status").read_text()
+    except OSError:
+        return None
+    for line in status.splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) * 1024
+    return None
+
+
+@asynccontextmanager
+async def fake_upstreams(profile: UpstreamProfile) -> AsyncIterator[tuple[int, int]]:
+    """Run the fake OpenAI and TTS APIs, yielding the ports they listen on."""
+    openai_port = _free_port()
+    openai_server = uvicorn.Server(
+        uvicorn.Config(
+            create_openai_app(profile), port=openai_port, log_level="warning"
+        )
+    )
+    openai_task = asyncio.create_task(openai_server.serve())
+    tts_server, tts_port = await start_tts_server(profile)
+    while not openai_server.started:
+        await asyncio.sleep(0.05)
+    try:
+        yield openai_port, tts_port
+    finally:
+        openai_server.should_exit = True
+        await openai_task
+        await tts_server.stop(None)
+
+
+@asynccontextmanager
+async def drivel_server(
+    openai_port: int, tts_port: int
+) -> AsyncIterator[tuple[str, subprocess.Popen]]:
+    """Run the server against the fakes, yielding its URL and process."""
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as secrets:
+        for folder in ("api-key", "org-id", "proj-id"):
+            Path(secrets, folder).mkdir()
+            Path(secrets, folder, SECRET).write_text(SECRET)
+        env = {
+            **os.environ,
+            "ENV": "prod",
+            "SECRETS_FOLDER": secrets,
+            "GCP_PROJECT_NUMBER": "0",
+            "GCP_SECRET_NAME_OPENAI_KEY": SECRET,
+            "GCP_SECRET_NAME_OPENAI_ORGANIZATION_ID": SECRET,
+            "GCP_SECRET_NAME_OPENAI_PROJECT_ID": SECRET,
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+            "TTS_API_ENDPOINT": f"127.0.0.1:{tts_port}",
+        }
+        args = [sys.executable, "-m", "uvicorn", "drivel_server.main:app"]
+        args += ["--port", str(port), "--log-level", "warning"]
+        # Run outside of the repository, so that a local `.env.yaml` is not loaded
+        process = subprocess.Popen(args, env=env, cwd=secrets)  # noqa: S603
+        url = f"http://127.0.0.1:{port}"
+        try:
+            await _wait_until_up(url, process)
+            yield url, process
+        finally:
+            process.terminate()
+            process.wait()
+
+
+async def _wait_until_up(url: str, process: subprocess.Popen) -> None:
+    async with httpx.AsyncClient(base_url=url) as client:
+        while process.poll() is None:
+            try:
+                await client.get("/api/v1/")
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+            else:
+                return
+    msg = f"The server exited with status {process.returncode}"
+    raise RuntimeError(msg)
+
+
+async def benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    """Run each scenario of the mix in isolation, then the whole mix."""
+    profile = UpstreamProfile(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        chunk_interval=args.chunk_interval,
+    )
+    runs = {name: {name: 1.0} for name in args.mix} | {"mix": args.mix}
+    results = {}
+    async with (
+        fake_upstreams(profile) as (openai_port, tts_port),
+        drivel_server(openai_port, tts_port) as (url, process),
+    ):
+        for name, mix in runs.items():
+            logger.info("Running %s for %s seconds", name, args.duration)
+            _reset_peak_rss(process.pid)
+            samples, elapsed = await run_load(url, mix, args.concurrency, args.duration)
+            results[name] = summarize(samples, elapsed) | {
+                "peak_rss_bytes": _peak_rss(process.pid)
+            }
+    return {
+        "timestamp": datetime.now(UTC).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "upstream": vars(profile),
+        },
+        "results": results,
+    }
+
+
+def compare(
+    report: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Return a description of every latency regression compared to a baseline."""
+    regressions = []
+    for name, result in report["results"].items():
+        previous = baseline["results"].get(name, {}).get("latency_ms")
+        current = result.get("latency_ms")
+        if previous is None or current is None:
+            continue
+        for percentile in ("p95", "p99"):
+            limit = previous[percentile] * (1 + tolerance)
+            if current[percentile] > limit:
+                regressions.append(
+                    f"{name} {percentile}: {current[percentile]} ms, "
+                    f"baseline {previous[percentile]} ms"
+                )
+    return regressions
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the server against local fakes of the upstream APIs.",
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="per run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", type=_parse_mix, default=_parse_mix(DEFAULT_MIX))
+    parser.add_argument("--latency", type=float, default=0.1, help="of the fakes")
+    parser.add_argument("--jitter", type=float, default=0.05, help="of the fakes")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="of the fakes")
+    parser.add_argument("--chunk-interval", type=float, default=0.01)
+    parser.add_argument("--output", type=Path, help="defaults to stdout")
+    parser.add_argument("--baseline", type=Path, help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    return parser
+
+
+def main() -> None:
+    """Run the benchmark and report the results."""
+    logging.basicConfig(format="%(message)s")
+    logger.setLevel(logging.INFO)
+    args = _parser().parse_args()
+    report = asyncio.run(benchmark(args))
+    output = json.dumps(report, indent=2)
+    if args.output is None:
+        sys.stdout.write(output + "\n")
+    else:
+        args.output.write_text(output + "\n")
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())
+        if regressions := compare(report, baseline, args.tolerance):
+            logger.error("Latency regressions:\n%s", "\n".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Microbenchmarks of the serialization of responses.
+
+Measures the CPU time spent turning the objects returned by the OpenAI SDK into
+response bodies, without any network or upstream calls. For each payload, the
+validating path FastAPI takes for endpoints that return models with a
+`response_model` is compared with the paths used by the endpoints:
+
+- `fastapi`: re-validation against the response model, `jsonable_encoder` and
+  `json.dumps`, as done for endpoints returning models.
+- `orjson`: `model_dump` of the trusted models, encoded with orjson.
+- `pydantic_core`: serialization of the trusted models with pydantic-core,
+  without validation, as done by `drivel_server.core.responses`.
+- `raw`: passing the upstream JSON bytes through untouched.
+
+Example:
+    ```bash
+    python -m benchmarks.serialization --choices 1 4 --words 50 500
+    ```
+
+The mean time per response in microseconds is reported as JSON per payload.
+"""
+
+import argparse
+import asyncio
+from collections.abc import Callable
+import json
+import timeit
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from openai.types.audio import Transcription
+from openai.types.chat import ChatCompletion
+from openai.types.chat.chat_completion import Choice
+import orjson
+
+from drivel_server.core.responses import json_response
+
+WORD = "palabra"
+
+
+def _completion(choices: int, words: int) -> bytes:
+    content = " ".join([WORD] * words)
+    return json.dumps(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": i,
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                    "message": {"role": "assistant", "content": content},
+                }
+                for i in range(choices)
+            ],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+    ).encode()
+
+
+def _time(fn: Callable[[], Any], number: int) -> float:
+    """Return the mean time of a call in microseconds, best of three runs."""
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def benchmark_payload(
+    name: str,
+    response_model: Any,  # noqa: ANN401
+    value: Any,  # noqa: ANN401
+    raw: bytes,
+    number: int,
+) -> dict[str, float]:
+    """Time the serialization paths for one payload."""
+    field = create_model_field(
+        name="response", type_=response_model, mode="serialization"
+    )
+    loop = asyncio.new_event_loop()
+
+    def fastapi() -> bytes:
+        content = loop.run_until_complete(
+            serialize_response(field=field, response_content=value)
+        )
+        return JSONResponse(content).body
+
+    def orjson_dump() -> bytes:
+        models = value if isinstance(value, list) else [value]
+        dumped = [model.model_dump() for model in models]
+        return orjson.dumps(dumped if isinstance(value, list) else dumped[0])
+
+    results = {
+        "payload": name,
+        "bytes": len(raw),
+        "fastapi_us": _time(fastapi, number),
+        "orjson_us": _time(orjson_dump, number),
+        "pydantic_core_us": _time(lambda: json_response(value).body, number),
+        "raw_us": _time(lambda: json_response(raw).body, number),
+    }
+    loop.close()
+    return results
+
+
+def main() -> None:
+    """Run the microbenchmarks and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--choices", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--words", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = []
+    for choices in args.choices:
+        for words in args.words:
+            raw = _completion(choices, words)
+            completion = ChatCompletion.model_validate_json(raw)
+            results.append(
+                benchmark_payload(
+                    f"chat n={choices} words={words}",
+                    list[Choice],
+                    completion.choices,
+                    orjson.dumps(orjson.loads(raw)["choices"]),
+                    args.number,
+                )
+            )
+    for words in args.words:
+        raw = json.dumps({"text": " ".join([WORD] * words)}).encode()
+        results.append(
+            benchmark_payload(
+                f"stt words={words}",
+                Transcription,
+                Transcription.model_validate_json(raw),
+                raw,
+                args.number,
+            )
+        )
+    print(json.dumps(results, indent=2))  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
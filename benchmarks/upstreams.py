@@ -0,0 +1,221 @@
+"""
+Local fakes of the upstream APIs used by the server.
+
+The fake OpenAI API is a Starlette app serving chat completions, streamed chat
+completions and transcriptions. The fake Google TTS API is a gRPC server
+implementing `SynthesizeSpeech` and `ListVoices` with the messages of the real
+client library. Both respond after a configurable latency and fail a configurable
+share of the requests, so that the overhead of the server can be measured in
+isolation from the real APIs.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+import json
+import random
+import time
+
+from google.cloud import texttospeech as tts
+import grpc
+import proto
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+REPLY = (
+    "¡Claro! Uno más uno es dos. ¿Quieres practicar más sumas? "
+    "También podemos hablar de otra cosa, si prefieres."
+)
+TRANSCRIPTION = "Me gusta aprender idiomas."
+# Roughly the size of 24 kbps MP3 audio at a speaking rate of 15 characters per
+# second.
+AUDIO_BYTES_PER_CHAR = 200
+TTS_SERVICE = "google.cloud.texttospeech.v1.TextToSpeech"
+
+
+@dataclass
+class UpstreamProfile:
+    """
+    The simulated behavior of an upstream API.
+
+    Attributes:
+        latency: Seconds before a response, or the first chunk of a stream, is sent.
+        jitter: Upper bound of a uniformly distributed delay added to the latency.
+        error_rate: Share of requests that fail, between 0 and 1.
+        chunk_interval: Seconds between the chunks of a streamed response.
+    """
+
+    latency: float = 0.1
+    jitter: float = 0.05
+    error_rate: float = 0.0
+    chunk_interval: float = 0.01
+
+    async def delay(self) -> None:
+        """Wait for the latency of one response."""
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))  # noqa: S311
+
+    def fails(self) -> bool:
+        """Return whether the current request should fail."""
+        return random.random() < self.error_rate  # noqa: S311
+
+
+def _error() -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": "Simulated failure", "type": "server_error"}},
+        status_code=500,
+    )
+
+
+USAGE = {"prompt_tokens": 25, "completion_tokens": 30, "total_tokens": 55}
+
+
+def _completion(model: str) -> JSONResponse:
+    return JSONResponse(
+        {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": REPLY},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": USAGE,
+        }
+    )
+
+
+def _completion_chunk(model: str, delta: dict, usage: dict | None = None) -> str:
+    choices = [{"index": 0, "delta": delta, "finish_reason": None}]
+    chunk = {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [] if usage else choices,
+        "usage": usage,
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+async def _completion_stream(
+    model: str, profile: UpstreamProfile
+) -> AsyncIterator[str]:
+    """Stream the reply word by word, ending with the usage as the real API does."""
+    yield _completion_chunk(model, {"role": "assistant", "content": ""})
+    for word in REPLY.split(" "):
+        await asyncio.sleep(profile.chunk_interval)
+        yield _completion_chunk(model, {"content": f"{word} "})
+    yield _completion_chunk(model, {}, usage=USAGE)
+    yield "data: [DONE]\n\n"
+
+
+async def _chat_completions(request: Request) -> Response:
+    profile: UpstreamProfile = request.app.state.profile
+    body = await request.json()
+    await profile.delay()
+    if profile.fails():
+        return _error()
+    if body.get("stream"):
+        return StreamingResponse(
+            _completion_stream(body["model"], profile), media_type="text/event-stream"
+        )
+    return _completion(body["model"])
+
+
+async def _transcriptions(request: Request) -> Response:
+    profile: UpstreamProfile = request.app.state.profile
+    async with request.form() as form:
+        await form["file"].read()
+    await profile.delay()
+    if profile.fails():
+        return _error()
+    return JSONResponse({"text": TRANSCRIPTION})
+
+
+async def _models(_: Request) -> Response:
+    return JSONResponse({"object": "list", "data": []})
+
+
+def create_openai_app(profile: UpstreamProfile) -> Starlette:
+    """Create a fake of the parts of the OpenAI API called by the server."""
+    app = Starlette(
+        routes=[
+            Route("/v1/chat/completions", _chat_completions, methods=["POST"]),
+            Route("/v1/audio/transcriptions", _transcriptions, methods=["POST"]),
+            Route("/v1/models", _models),
+        ]
+    )
+    app.state.profile = profile
+    return app
+
+
+def _tts_handler(profile: UpstreamProfile) -> grpc.GenericRpcHandler:
+    async def synthesize_speech(
+        request: tts.SynthesizeSpeechRequest, context: grpc.aio.ServicerContext
+    ) -> tts.SynthesizeSpeechResponse:
+        await profile.delay()
+        if profile.fails():
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "Simulated failure")
+        size = max(len(request.input.text), 1) * AUDIO_BYTES_PER_CHAR
+        return tts.SynthesizeSpeechResponse(audio_content=bytes(size))
+
+    async def list_voices(
+        request: tts.ListVoicesRequest, _: grpc.aio.ServicerContext
+    ) -> tts.ListVoicesResponse:
+        return tts.ListVoicesResponse(
+            voices=[
+                tts.Voice(
+                    language_codes=[request.language_code or "es-ES"],
+                    name="es-ES-Standard-B",
+                    ssml_gender=tts.SsmlVoiceGender.MALE,
+                    natural_sample_rate_hertz=24000,
+                )
+            ]
+        )
+
+    def unary(
+        method: Callable,
+        request_type: type[proto.Message],
+        response_type: type[proto.Message],
+    ) -> grpc.RpcMethodHandler:
+        return grpc.unary_unary_rpc_method_handler(
+            method,
+            request_deserializer=request_type.deserialize,
+            response_serializer=response_type.serialize,
+        )
+
+    return grpc.method_handlers_generic_handler(
+        TTS_SERVICE,
+        {
+            "SynthesizeSpeech": unary(
+                synthesize_speech,
+                tts.SynthesizeSpeechRequest,
+                tts.SynthesizeSpeechResponse,
+            ),
+            "ListVoices": unary(
+                list_voices, tts.ListVoicesRequest, tts.ListVoicesResponse
+            ),
+        },
+    )
+
+
+async def start_tts_server(
+    profile: UpstreamProfile, port: int = 0
+) -> tuple[grpc.aio.Server, int]:
+    """
+    Start a fake of the Google TTS API on an insecure local port.
+
+    Returns the server and the port it listens on, which is chosen by the operating
+    system if `port` is 0. Stop the server with `await server.stop(None)`.
+    """
+    server = grpc.aio.server()
+    server.add_generic_rpc_handlers((_tts_handler(profile),))
+    port = server.add_insecure_port(f"127.0.0.1:{port}")
+    await server.start()
+    return server, port
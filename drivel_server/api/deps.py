@@ -0,0 +1,23 @@
+"""Dependencies shared by the endpoints."""
+
+from typing import Annotated
+
+from fastapi import Depends
+from google.cloud import texttospeech as tts
+from openai import AsyncClient
+
+from drivel_server.clients import GoogleCloudClientSingleton, OpenAIClientSingleton
+
+
+async def get_openai_client() -> AsyncClient:
+    """Get the OpenAI client created at application startup."""
+    return await OpenAIClientSingleton.get_instance()
+
+
+async def get_tts_client() -> tts.TextToSpeechAsyncClient:
+    """Get the Google Cloud Text-to-Speech client created at application startup."""
+    return await GoogleCloudClientSingleton.get_instance()
+
+
+OpenAIClientDep = Annotated[AsyncClient, Depends(get_openai_client)]
+TTSClientDep = Annotated[tts.TextToSpeechAsyncClient, Depends(get_tts_client)]
@@ -2,7 +2,17 @@
 
 from fastapi import APIRouter
 
-from drivel_server.api.v1.endpoints import chat_replies, stt, tts
+from drivel_server.api.v1.endpoints import (
+    chat_replies,
+    chat_speech,
+    conversations,
+    sessions,
+    structured_replies,
+    stt,
+    tts,
+    voices,
+)
+from drivel_server.core.stats import collect_stats
 
 router = APIRouter()
 
@@ -13,10 +23,29 @@ def root() -> dict[str, str]:
     return {"Hello": "World"}
 
 
+@router.get("/stats")
+def stats() -> dict[str, dict[str, int]]:
+    """Runtime counters of caches and other components, keyed by component."""
+    return collect_stats()
+
+
 api_router = APIRouter()
 api_router.include_router(router, prefix="", tags=["root"])
 api_router.include_router(tts.router, prefix="/text-to-speech", tags=["tts"])
+api_router.include_router(voices.router, prefix="/voices", tags=["voices"])
 api_router.include_router(stt.router, prefix="/speech-to-text", tags=["stt"])
 api_router.include_router(
     chat_replies.router, prefix="/chat-responses", tags=["chat_replies"]
 )
+api_router.include_router(
+    chat_speech.router, prefix="/chat-speech", tags=["chat_speech"]
+)
+api_router.include_router(sessions.router, prefix="/sessions", tags=["sessions"])
+api_router.include_router(
+    conversations.router, prefix="/conversations", tags=["conversations"]
+)
+api_router.include_router(
+    structured_replies.router,
+    prefix="/structured-responses",
+    tags=["structured_replies"],
+)
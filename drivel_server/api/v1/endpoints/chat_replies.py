@@ -1,17 +1,211 @@
 """Endpoint and business logic related to Chat."""
 
-from fastapi import APIRouter, HTTPException, status
-from openai.types.chat import ChatCompletion
+from collections.abc import AsyncIterator, Awaitable, Callable
+import functools
+import json
+from typing import TypeVar
+
+from fastapi import APIRouter, Response, status
+from fastapi.responses import StreamingResponse
+from openai import AsyncClient
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
 from openai.types.chat.chat_completion import Choice
 
-from drivel_server.clients import OpenAIClientSingleton
+from drivel_server.api.deps import OpenAIClientDep, TTSClientDep
+from drivel_server.api.v1.endpoints.tts import prefetch_speech
+from drivel_server.clients import openai_upstream
+from drivel_server.core.completion_cache import create_completion_cache
+from drivel_server.core.config import settings
+from drivel_server.core.context import SUMMARY_PREFIX, ContextWindow, format_transcript
+from drivel_server.core.errors import to_http_exception
+from drivel_server.core.metrics import record_token_usage
+from drivel_server.core.resilience import HeldStream
+from drivel_server.core.responses import json_response
+from drivel_server.core.sessions import Messages
+from drivel_server.core.singleflight import SingleFlight
+from drivel_server.core.sse import SSE_HEADERS, sse_event
+from drivel_server.core.stats import register_stats
 from drivel_server.schemas.chat_replies import OpenAIParameters
 
 router = APIRouter()
 
+P = TypeVar("P", bound=OpenAIParameters)
+
+CONTEXT_TOKENS_SAVED_HEADER = "X-Context-Tokens-Saved"
+AUDIO_TICKET_HEADER = "X-Audio-Ticket"
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the conversation below in a few sentences, keeping the facts, names "
+    "and topics needed to continue it. If it starts with a summary, extend it."
+)
+
+chat_flight = SingleFlight()
+register_stats("chat_singleflight", chat_flight.stats)
+
+context_window = ContextWindow(
+    settings.context_max_tokens,
+    summary_max_tokens=settings.context_summary_max_tokens,
+    max_summaries=settings.context_summary_cache_size,
+)
+register_stats("context", context_window.stats)
+
+completion_cache = create_completion_cache()
+if completion_cache is not None:
+    register_stats("completion_cache", completion_cache.stats)
+
+
+async def request_chat_completion(
+    client: AsyncClient, **kwargs
+) -> ChatCompletion | HeldStream[ChatCompletionChunk]:
+    """
+    Make a chat completion request, recording token usage.
+
+    The request is made through `openai_upstream`, which limits concurrency and
+    retries transient failures.
+
+    Streamed completions are requested with usage reporting, which adds a final
+    chunk without choices carrying the token usage of the whole completion. They
+    count against the concurrency limit until they are exhausted or closed.
+    """
+    if kwargs.get("stream"):
+        kwargs["stream_options"] = {"include_usage": True}
+        return await openai_upstream.stream(
+            "chat.completions.create", lambda: client.chat.completions.create(**kwargs)
+        )
+    completion = await openai_upstream.call(
+        "chat.completions.create", lambda: client.chat.completions.create(**kwargs)
+    )
+    record_token_usage(completion.model, completion.usage)
+    return completion
+
+
+async def summarize_turns(
+    client: AsyncClient, summary: str | None, turns: Messages
+) -> str:
+    """Summarize turns of a conversation, extending a previous summary if given."""
+    transcript = format_transcript(turns)
+    if summary is not None:
+        transcript = f"{SUMMARY_PREFIX}{summary}\n\n{transcript}"
+    completion = await request_chat_completion(
+        client,
+        model=settings.context_summary_model,
+        max_tokens=settings.context_summary_max_tokens,
+        temperature=0,
+        messages=[
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+            {"role": "user", "content": transcript},
+        ],
+    )
+    assert isinstance(completion, ChatCompletion)
+    return completion.choices[0].message.content or ""
+
+
+async def fit_context(params: P, client: AsyncClient) -> tuple[P, dict[str, str]]:
+    """
+    Trim the conversation to the token budget of `settings.context_max_tokens`.
+
+    Returns the parameters with the trimmed conversation, and the headers reporting
+    the number of prompt tokens saved. No headers are returned if the conversations
+    are not trimmed.
+    """
+    if context_window.max_tokens is None:
+        return params, {}
+    summarize = (
+        functools.partial(summarize_turns, client)
+        if settings.context_summarize
+        else None
+    )
+    context = await context_window.fit(params.messages, params.model, summarize)
+    headers = {CONTEXT_TOKENS_SAVED_HEADER: str(context.tokens_saved)}
+    if context.tokens_saved == 0:
+        return params, headers
+    return params.model_copy(update={"messages": context.messages}), headers
+
+
+async def create_chat_completion(
+    params: OpenAIParameters, client: AsyncClient
+) -> ChatCompletion | HeldStream[ChatCompletionChunk]:
+    """
+    Call the OpenAI chat completion API with the given parameters.
+
+    Deterministic requests that are identical to a request already in flight wait
+    for its completion instead of making their own upstream call.
 
-@router.post("/", response_model=list[Choice])
-async def chat_responses(params: OpenAIParameters) -> list[Choice]:
+    If the completion cache is enabled, cacheable requests are served from it when
+    an identical request has been completed before, and their completions are
+    stored in it otherwise.
+    """
+    kwargs = params.model_dump(exclude_none=True)
+    if completion_cache is not None and params.is_cacheable:
+        key = params.cache_key()
+        if (completion := await completion_cache.get(key)) is not None:
+            return completion
+        return await chat_flight.do(
+            key, lambda: request_and_cache_completion(client, key, kwargs)
+        )
+    if params.is_deterministic:
+        return await chat_flight.do(
+            params.cache_key(), lambda: request_chat_completion(client, **kwargs)
+        )
+    return await request_chat_completion(client, **kwargs)
+
+
+async def request_and_cache_completion(
+    client: AsyncClient, key: str, kwargs: dict
+) -> ChatCompletion:
+    """Make a chat completion request and store the completion in the cache."""
+    assert completion_cache is not None
+    completion = await request_chat_completion(client, **kwargs)
+    assert isinstance(completion, ChatCompletion)
+    await completion_cache.set(key, completion)
+    return completion
+
+
+async def stream_chat_completion(
+    stream: HeldStream[ChatCompletionChunk],
+    on_complete: Callable[[str], Awaitable[None]] | None = None,
+) -> AsyncIterator[str]:
+    """
+    Relay the chunks of a streamed completion as Server-Sent Events.
+
+    Chunks are only pulled from the upstream stream when the previous event has been
+    sent to the client, so a slow client slows down the upstream read instead of
+    making the server buffer the completion. If the client disconnects, the task
+    consuming this generator is cancelled and the upstream response is closed.
+
+    If given, `on_complete` is called with the generated text once the whole
+    completion has been received. It is only meant for completions with one choice.
+    """
+    content = []
+    try:
+        async for chunk in stream:
+            record_token_usage(chunk.model, chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                content.append(chunk.choices[0].delta.content)
+            yield sse_event(chunk.model_dump_json(exclude_unset=True))
+        if on_complete is not None:
+            await on_complete("".join(content))
+        yield sse_event("[DONE]")
+    except Exception as e:
+        # The status code has already been sent, so report the error in-band
+        yield sse_event(json.dumps({"detail": str(e)}), event="error")
+    finally:
+        await stream.close()
+
+
+@router.post(
+    "/",
+    response_model=list[Choice],
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"text/event-stream": {}},
+            "description": "A stream of `chat.completion.chunk` events if `stream` "
+            "is set.",
+        }
+    },
+)
+async def chat_responses(
+    params: OpenAIParameters, client: OpenAIClientDep, tts_client: TTSClientDep
+) -> Response:
     """
     Forwards the conversation to the OpenAI API and retrieves a generated response.
 
@@ -23,22 +217,44 @@ async def chat_responses(params: OpenAIParameters) -> list[Choice]:
 
     The response is encapsulated in a dictionary with the key 'response'. In the event
     of an API failure or absence of a response, an HTTP exception with an appropriate
-    status code will be raised.
+    status code will be raised. If OpenAI is overloaded or rate limits the request,
+    the status code is 503 or 429 and the `Retry-After` header says when to retry.
+
+    If `stream` is set, the completion is instead relayed token by token as
+    Server-Sent Events as soon as OpenAI produces them.
+
+    If `settings.context_max_tokens` is set, conversations longer than that many
+    tokens are trimmed, or their older turns summarized, before they are forwarded.
+    The `X-Context-Tokens-Saved` header reports the number of prompt tokens saved.
+
+    If `prefetch_speech` is given, the reply is synthesized while the response is
+    on its way to the client, which fetches the audio from
+    `/text-to-speech/tickets/{ticket_id}` with the ticket in the `X-Audio-Ticket`
+    header instead of requesting it from `/text-to-speech` afterwards.
 
     For the structure of the input and further details on the parameters, refer to the
     `OpenAIParameters` model.
     """
     try:
-        client = await OpenAIClientSingleton.get_instance()
+        params, headers = await fit_context(params, client)
         # Call the OpenAI API with the messages
-        chat_completion = await client.chat.completions.create(
-            **params.model_dump(exclude_none=True)
-        )
+        chat_completion = await create_chat_completion(params, client)
+        if params.stream:
+            assert isinstance(chat_completion, HeldStream)
+            return StreamingResponse(
+                stream_chat_completion(chat_completion),
+                media_type="text/event-stream",
+                headers={**SSE_HEADERS, **headers},
+            )
         assert isinstance(chat_completion, ChatCompletion)
-        # Return the text part of the OpenAI API response
-        return chat_completion.choices
+        content = chat_completion.choices[0].message.content
+        if params.prefetch_speech is not None and content:
+            headers[AUDIO_TICKET_HEADER] = prefetch_speech(
+                content, params.prefetch_speech, tts_client
+            )
+        # Return the text part of the OpenAI API response, which the SDK has
+        # already validated
+        return json_response(chat_completion.choices, headers)
     except Exception as e:
         # Handle errors and exceptions
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
-        ) from e
+        raise to_http_exception(e) from e
@@ -0,0 +1,190 @@
+"""Endpoint and business logic related to spoken chat replies."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+import json
+
+from fastapi import APIRouter, status
+from fastapi.responses import StreamingResponse
+from google.cloud import texttospeech as tts
+from openai.types.chat import ChatCompletionChunk
+
+from drivel_server.api.deps import OpenAIClientDep, TTSClientDep
+from drivel_server.api.v1.endpoints.chat_replies import request_chat_completion
+from drivel_server.api.v1.endpoints.tts import synthesize
+from drivel_server.core.config import settings
+from drivel_server.core.errors import to_http_exception
+from drivel_server.core.metrics import record_token_usage
+from drivel_server.core.multipart import multipart_end, multipart_part, new_boundary
+from drivel_server.core.resilience import HeldStream
+from drivel_server.core.text import pop_sentences, split_sentences
+from drivel_server.schemas.chat_speech import ChatSpeechParameters
+from drivel_server.schemas.tts import AUDIO_MEDIA_TYPES, TTSParameters, VoiceParameters
+
+router = APIRouter()
+
+
+@dataclass
+class SentenceAudio:
+    """The synthesized audio of a sentence of a reply, by its position in it."""
+
+    index: int
+    audio: bytes
+
+
+type SpeechEvent = str | SentenceAudio
+
+
+class ChatSpeechPipeline:
+    """
+    Interleave a streamed reply text with the synthesized audio of its sentences.
+
+    Iterating the pipeline yields the text deltas as soon as they arrive. Every
+    completed sentence is synthesized in the background while the generation
+    continues, and its `SentenceAudio` is yielded once it and all earlier sentences
+    are ready. Errors of the generation or synthesis are raised by the iteration.
+    """
+
+    def __init__(
+        self,
+        stream: HeldStream[ChatCompletionChunk],
+        voice: VoiceParameters,
+        tts_client: tts.TextToSpeechAsyncClient,
+    ) -> None:
+        self.stream = stream
+        self.voice = voice
+        self.tts_client = tts_client
+        self._events: asyncio.Queue[SpeechEvent | Exception | None] = asyncio.Queue()
+        self._syntheses: asyncio.Queue[asyncio.Task[bytes] | None] = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(settings.tts_stream_concurrency)
+        self._tasks: list[asyncio.Task] = []
+
+    async def _synthesize(self, sentence: str) -> bytes:
+        async with self._semaphore:
+            return await synthesize(
+                TTSParameters(text=sentence, **self.voice.model_dump()), self.tts_client
+            )
+
+    async def _dispatch(self, sentence: str) -> None:
+        task = asyncio.create_task(self._synthesize(sentence))
+        self._tasks.append(task)
+        await self._syntheses.put(task)
+
+    async def _generate(self) -> None:
+        buffer = ""
+        async for chunk in self.stream:
+            record_token_usage(chunk.model, chunk.usage)
+            if not chunk.choices or not (delta := chunk.choices[0].delta.content):
+                continue
+            await self._events.put(delta)
+            sentences, buffer = pop_sentences(
+                buffer + delta, max_chars=settings.tts_stream_max_chunk_chars
+            )
+            for sentence in sentences:
+                await self._dispatch(sentence)
+        for sentence in split_sentences(
+            buffer, max_chars=settings.tts_stream_max_chunk_chars
+        ):
+            await self._dispatch(sentence)
+        await self._syntheses.put(None)
+
+    async def _emit_audio(self) -> None:
+        index = 0
+        while (task := await self._syntheses.get()) is not None:
+            await self._events.put(SentenceAudio(index, await task))
+            index += 1
+
+    async def _run(self) -> None:
+        workers = [
+            asyncio.create_task(self._generate()),
+            asyncio.create_task(self._emit_audio()),
+        ]
+        self._tasks.extend(workers)
+        try:
+            await asyncio.gather(*workers)
+        except Exception as e:
+            await self._events.put(e)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await self._events.put(None)
+
+    async def __aiter__(self) -> AsyncIterator[SpeechEvent]:
+        """Run the pipeline and yield the text deltas and audio of the reply."""
+        runner = asyncio.create_task(self._run())
+        try:
+            while (event := await self._events.get()) is not None:
+                if isinstance(event, Exception):
+                    raise event
+                yield event
+        finally:
+            runner.cancel()
+            for task in self._tasks:
+                task.cancel()
+            await self.stream.close()
+
+
+async def encode_multipart(
+    pipeline: ChatSpeechPipeline, boundary: str
+) -> AsyncIterator[bytes]:
+    """
+    Encode the events of a pipeline as the parts of a `multipart/mixed` body.
+
+    Text deltas are sent as `text/plain` parts, and the audio of each sentence as an
+    `audio/mpeg` part with an `X-Sentence-Index` header. Errors after the response
+    has started are reported in an `application/json` part.
+    """
+    try:
+        async for event in pipeline:
+            if isinstance(event, SentenceAudio):
+                headers = {"X-Sentence-Index": str(event.index)}
+                yield multipart_part(
+                    boundary, AUDIO_MEDIA_TYPES["MP3"], event.audio, headers
+                )
+            else:
+                yield multipart_part(
+                    boundary, "text/plain; charset=utf-8", event.encode()
+                )
+    except Exception as e:
+        # The status code has already been sent, so report the error in-band
+        error = json.dumps({"detail": str(e)}).encode()
+        yield multipart_part(boundary, "application/json", error)
+    yield multipart_end(boundary)
+
+
+@router.post(
+    "/",
+    response_model=None,
+    responses={status.HTTP_200_OK: {"content": {"multipart/mixed": {}}}},
+)
+async def chat_speech(
+    params: ChatSpeechParameters,
+    openai_client: OpenAIClientDep,
+    tts_client: TTSClientDep,
+) -> StreamingResponse:
+    """
+    Generate a chat reply and stream it back together with its synthesized speech.
+
+    This combines `/chat-responses` and `/text-to-speech` in a single request. The
+    completion is streamed from OpenAI, and each sentence is sent to Google Cloud
+    Text-to-Speech as soon as it is complete, so synthesis overlaps with the rest of
+    the generation. The response is a `multipart/mixed` stream of `text/plain`
+    parts with the reply text, as it is generated, and `audio/mpeg` parts with the
+    audio of each sentence, in order.
+    """
+    try:
+        stream = await request_chat_completion(
+            openai_client,
+            **params.model_dump(exclude_none=True, exclude={"voice", "stream"}),
+            stream=True,
+        )
+    except Exception as e:
+        raise to_http_exception(e) from e
+    boundary = new_boundary()
+    return StreamingResponse(
+        encode_multipart(
+            ChatSpeechPipeline(stream, params.voice, tts_client), boundary
+        ),
+        media_type=f"multipart/mixed; boundary={boundary}",
+    )
@@ -0,0 +1,182 @@
+"""Endpoint and business logic related to spoken conversations over WebSocket."""
+
+from dataclasses import dataclass
+import io
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from google.cloud import texttospeech as tts
+from openai import AsyncClient
+from pydantic import ValidationError
+
+from drivel_server.api.deps import OpenAIClientDep, TTSClientDep
+from drivel_server.api.v1.endpoints.chat_replies import (
+    create_chat_completion,
+    fit_context,
+)
+from drivel_server.api.v1.endpoints.chat_speech import ChatSpeechPipeline, SentenceAudio
+from drivel_server.api.v1.endpoints.sessions import session_store
+from drivel_server.api.v1.endpoints.stt import transcribe
+from drivel_server.core.config import settings
+from drivel_server.core.errors import to_http_exception
+from drivel_server.core.resilience import HeldStream
+from drivel_server.core.sessions import Messages
+from drivel_server.core.uploads import upload_too_large
+from drivel_server.schemas.conversations import (
+    AudioEndMessage,
+    ClientMessage,
+    ConfigMessage,
+    TextMessage,
+)
+
+router = APIRouter()
+
+
+@dataclass(frozen=True)
+class ConversationClients:
+    """The upstream clients the turns of a conversation are made with."""
+
+    openai_client: AsyncClient
+    tts_client: tts.TextToSpeechAsyncClient
+
+
+class Conversation:
+    """
+    The turns of a conversation session over a WebSocket connection.
+
+    Messages are handled one at a time, in the order they are received. Messages
+    sent while a turn is in progress wait until it has finished.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        history: Messages,
+        clients: ConversationClients,
+    ) -> None:
+        self.websocket = websocket
+        self.session_id = session_id
+        self.history = history
+        self.openai_client = clients.openai_client
+        self.tts_client = clients.tts_client
+        self.config = ConfigMessage(type="config")
+        self.audio = bytearray()
+
+    async def run(self) -> None:
+        """Handle the messages of the client until it disconnects."""
+        while (message := await self.websocket.receive())[
+            "type"
+        ] == "websocket.receive":
+            try:
+                if message.get("bytes") is not None:
+                    self._add_audio(message["bytes"])
+                else:
+                    await self._handle(ClientMessage.validate_json(message["text"]))
+            except WebSocketDisconnect:
+                return
+            except Exception as e:
+                await self._send_error(e)
+
+    def _add_audio(self, data: bytes) -> None:
+        self.audio += data
+        if len(self.audio) > settings.stt_max_upload_bytes:
+            self.audio.clear()
+            raise upload_too_large(f"larger than {settings.stt_max_upload_bytes} bytes")
+
+    async def _handle(
+        self, message: ConfigMessage | AudioEndMessage | TextMessage
+    ) -> None:
+        if isinstance(message, ConfigMessage):
+            self.config = message
+        elif isinstance(message, TextMessage):
+            await self._reply(message.content)
+        else:
+            audio, self.audio = bytes(self.audio), bytearray()
+            transcription = await transcribe(
+                io.BytesIO(audio),
+                message.filename,
+                None,
+                self.config.stt,
+                self.openai_client,
+            )
+            await self.websocket.send_json(
+                {"type": "transcription", "text": transcription.text}
+            )
+            await self._reply(transcription.text)
+
+    async def _reply(self, content: str) -> None:
+        """Stream the reply to a user message and its speech, and save the turn."""
+        params = self.config.turn_parameters(content)
+        openai_params, _ = await fit_context(
+            params.to_openai_parameters(self.history), self.openai_client
+        )
+        stream = await create_chat_completion(openai_params, self.openai_client)
+        assert isinstance(stream, HeldStream)
+        reply = []
+        pipeline = ChatSpeechPipeline(stream, self.config.voice, self.tts_client)
+        async for event in pipeline:
+            if isinstance(event, SentenceAudio):
+                await self.websocket.send_json({"type": "audio", "index": event.index})
+                await self.websocket.send_bytes(event.audio)
+            else:
+                reply.append(event)
+                await self.websocket.send_json({"type": "reply", "delta": event})
+        self.history = [
+            *self.history,
+            params.user_message(),
+            {"role": "assistant", "content": "".join(reply)},
+        ]
+        await session_store.set(self.session_id, self.history)
+        await self.websocket.send_json({"type": "done"})
+
+    async def _send_error(self, e: Exception) -> None:
+        """Report a failed message, with the status code an HTTP request would get."""
+        if isinstance(e, ValidationError):
+            status_code, detail = status.HTTP_422_UNPROCESSABLE_ENTITY, str(e)
+        else:
+            error = to_http_exception(e)
+            status_code, detail = error.status_code, error.detail
+        await self.websocket.send_json(
+            {"type": "error", "status_code": status_code, "detail": detail}
+        )
+
+
+@router.websocket("/{session_id}")
+async def conversation(
+    websocket: WebSocket,
+    session_id: str,
+    openai_client: OpenAIClientDep,
+    tts_client: TTSClientDep,
+) -> None:
+    """
+    Hold a spoken conversation in a session over a single WebSocket connection.
+
+    The session is created with `POST /sessions`. The client sends JSON text
+    messages, described in `drivel_server.schemas.conversations`, and binary
+    messages with audio:
+
+    - `{"type": "config", ...}` sets the voice and the parameters of the
+      transcription and the replies for the following turns.
+    - Binary messages carry the user's speech, in any format Whisper accepts, and
+      `{"type": "audio_end"}` ends it and starts a turn.
+    - `{"type": "text", "content": ...}` starts a turn with a written message.
+
+    For each turn, the server sends `{"type": "transcription", "text": ...}` for
+    speech, then `{"type": "reply", "delta": ...}` as the reply is generated and
+    `{"type": "audio", "index": ...}` followed by a binary message with the MP3
+    audio of each sentence, in order, and finally `{"type": "done"}`. The turn is
+    then added to the session. A failed turn is reported with `{"type": "error",
+    "status_code": ..., "detail": ...}` and the connection stays open.
+
+    If the session does not exist, the connection is closed with code 1008.
+    """
+    history = await session_store.get(session_id)
+    await websocket.accept()
+    if history is None:
+        await websocket.close(
+            code=status.WS_1008_POLICY_VIOLATION,
+            reason=f"Session {session_id} does not exist or has expired",
+        )
+        return
+    clients = ConversationClients(openai_client, tts_client)
+    await Conversation(websocket, session_id, history, clients).run()
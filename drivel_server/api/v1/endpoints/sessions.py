@@ -0,0 +1,124 @@
+"""Endpoint and business logic related to conversation sessions."""
+
+import secrets
+
+from fastapi import APIRouter, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from openai.types.chat import ChatCompletion
+from openai.types.chat.chat_completion import Choice
+
+from drivel_server.api.deps import OpenAIClientDep
+from drivel_server.api.v1.endpoints.chat_replies import (
+    create_chat_completion,
+    fit_context,
+    stream_chat_completion,
+)
+from drivel_server.core.errors import to_http_exception
+from drivel_server.core.resilience import HeldStream
+from drivel_server.core.responses import json_response
+from drivel_server.core.sessions import Messages, create_session_store
+from drivel_server.core.sse import SSE_HEADERS
+from drivel_server.core.stats import register_stats
+from drivel_server.schemas.sessions import (
+    Session,
+    SessionParameters,
+    SessionTurnParameters,
+)
+
+router = APIRouter()
+
+session_store = create_session_store()
+register_stats("sessions", session_store.stats)
+
+
+async def get_history(session_id: str) -> Messages:
+    """Return the messages of a session, or raise a 404 if it does not exist."""
+    messages = await session_store.get(session_id)
+    if messages is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session {session_id} does not exist or has expired",
+        )
+    return messages
+
+
+@router.post("/", response_model=Session, status_code=status.HTTP_201_CREATED)
+async def create_session(params: SessionParameters) -> Session:
+    """
+    Start a conversation session with the given system message.
+
+    The returned `session_id` is used to add messages to the conversation. Sessions
+    expire `settings.session_ttl` seconds after their last message.
+    """
+    session = Session(
+        session_id=secrets.token_urlsafe(16),
+        messages=[{"role": "system", "content": params.system_message}],
+    )
+    await session_store.set(session.session_id, session.messages)
+    return session
+
+
+@router.get("/{session_id}", response_model=Session)
+async def get_session(session_id: str) -> Session:
+    """Return the message history of a session."""
+    return Session(session_id=session_id, messages=await get_history(session_id))
+
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_session(session_id: str) -> Response:
+    """Delete a session."""
+    await session_store.delete(session_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post(
+    "/{session_id}/messages",
+    response_model=list[Choice],
+    responses={
+        status.HTTP_200_OK: {
+            "content": {"text/event-stream": {}},
+            "description": "A stream of `chat.completion.chunk` events if `stream` "
+            "is set.",
+        }
+    },
+)
+async def add_message(
+    session_id: str, params: SessionTurnParameters, client: OpenAIClientDep
+) -> Response:
+    """
+    Add a user message to a session and return the generated reply.
+
+    Works like the chat-responses endpoint, except that only the new user message is
+    sent and the history is kept by the server. The user message and the reply are
+    added to the history once the reply has been generated, so a failed request can
+    simply be repeated. Concurrent messages to the same session are not supported.
+
+    The whole history is kept, but only the part of it that fits the token budget
+    is sent to OpenAI with each message.
+    """
+    history = await get_history(session_id)
+    user_message = params.user_message()
+
+    async def save_reply(reply: str) -> None:
+        await session_store.set(
+            session_id,
+            [*history, user_message, {"role": "assistant", "content": reply}],
+        )
+
+    try:
+        openai_params, headers = await fit_context(
+            params.to_openai_parameters(history), client
+        )
+        chat_completion = await create_chat_completion(openai_params, client)
+        if params.stream:
+            assert isinstance(chat_completion, HeldStream)
+            return StreamingResponse(
+                stream_chat_completion(chat_completion, on_complete=save_reply),
+                media_type="text/event-stream",
+                headers={**SSE_HEADERS, **headers},
+            )
+        assert isinstance(chat_completion, ChatCompletion)
+        await save_reply(chat_completion.choices[0].message.content or "")
+        return json_response(chat_completion.choices, headers)
+    except Exception as e:
+        raise to_http_exception(e) from e
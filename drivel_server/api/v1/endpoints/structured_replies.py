@@ -0,0 +1,54 @@
+"""Endpoint and business logic related to structured replies."""
+
+from fastapi import APIRouter, HTTPException, Response, status
+from openai.types.chat import ChatCompletion
+
+from drivel_server.api.deps import OpenAIClientDep
+from drivel_server.api.v1.endpoints.chat_replies import (
+    fit_context,
+    request_chat_completion,
+)
+from drivel_server.core.errors import to_http_exception
+from drivel_server.schemas.structured_replies import (
+    StructuredReply,
+    StructuredReplyParameters,
+)
+
+router = APIRouter()
+
+
+@router.post("/", response_model=StructuredReply)
+async def structured_responses(
+    params: StructuredReplyParameters, client: OpenAIClientDep, response: Response
+) -> StructuredReply:
+    """
+    Generate a reply, its translation and a correction of the user message at once.
+
+    This replaces three requests to `/chat-responses` with their own system
+    messages by a single OpenAI call, which uses structured outputs to return the
+    three as fields of a JSON object. The conversation is only sent, and billed,
+    once.
+
+    If the model refuses to reply, the status code is 422 and the detail is the
+    refusal. If the JSON object is cut off because `max_tokens` was reached, the
+    status code is 502. Other errors are reported as by `/chat-responses`.
+    """
+    try:
+        params, headers = await fit_context(params.with_instructions(), client)
+        completion = await request_chat_completion(client, **params.to_openai_kwargs())
+        assert isinstance(completion, ChatCompletion)
+        choice = completion.choices[0]
+        message = choice.message
+        if message.refusal:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=message.refusal
+            )
+        if choice.finish_reason == "length":
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail="The structured reply was truncated, increase max_tokens",
+            )
+        response.headers.update(headers)
+        return StructuredReply.model_validate_json(message.content or "")
+    except Exception as e:
+        raise to_http_exception(e) from e
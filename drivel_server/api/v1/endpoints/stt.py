@@ -1,36 +1,164 @@
 """Endpoint and business logic related to speech-to-text."""
 
-import io
+import asyncio
+from collections.abc import Awaitable
+from typing import BinaryIO
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, Response, UploadFile
+from openai import AsyncClient
 from openai.types.audio import Transcription
 
-from drivel_server.clients import OpenAIClientSingleton
+from drivel_server.api.deps import OpenAIClientDep
+from drivel_server.clients import openai_upstream
+from drivel_server.core.audio import audio_preprocessor
+from drivel_server.core.cache import TieredCache
+from drivel_server.core.config import settings
+from drivel_server.core.errors import to_http_exception
+from drivel_server.core.responses import json_response
+from drivel_server.core.singleflight import SingleFlight
+from drivel_server.core.stats import register_stats
+from drivel_server.core.uploads import (
+    LimitedUploadRoute,
+    audio_duration,
+    file_digest,
+    upload_too_large,
+)
 from drivel_server.schemas.stt import STTParameters
 
-router = APIRouter()
+router = APIRouter(route_class=LimitedUploadRoute)
+
+stt_cache = TieredCache(
+    max_bytes=settings.stt_cache_max_bytes, directory=settings.stt_cache_dir
+)
+stt_flight = SingleFlight()
+register_stats("stt_cache", stt_cache.stats)
+register_stats("stt_singleflight", stt_flight.stats)
+register_stats("stt_preprocessing", audio_preprocessor.stats)
+
+
+async def transcribe(
+    file: BinaryIO,
+    filename: str,
+    content_type: str | None,
+    params: STTParameters,
+    client: AsyncClient,
+) -> Transcription:
+    """Return the transcription of an audio file, see `transcribe_json`."""
+    return Transcription.model_validate_json(
+        await transcribe_json(file, filename, content_type, params, client)
+    )
+
+
+async def transcribe_json(
+    file: BinaryIO,
+    filename: str,
+    content_type: str | None,
+    params: STTParameters,
+    client: AsyncClient,
+) -> bytes:
+    """
+    Return the transcription of an audio file as the JSON returned by Whisper.
+
+    The transcription is looked up in `stt_cache` by the digest of the audio and
+    the parameters first, so re-submitted recordings are not transcribed again.
+    Identical files that arrive while one of them is being transcribed share a
+    single upstream call. The file is streamed to Whisper, so it is never copied in
+    memory unless `settings.stt_hedging` is enabled. If `settings.stt_preprocess`
+    is enabled, the audio is compacted before it is sent, see
+    `drivel_server.core.audio`.
+
+    The shared call streams the file of the caller that started it, so if that
+    caller is cancelled, e.g. because its client disconnected, it only returns
+    once the call has finished. The file, which the request owns, stays open
+    until then.
+
+    Raises:
+        HTTPException: With a 413 if the audio is longer than
+            `settings.stt_max_duration_seconds`.
+    """
+    key = params.cache_key(await asyncio.to_thread(file_digest, file))
+    if (cached := await stt_cache.get(key)) is not None:
+        return cached
+    duration = await asyncio.to_thread(audio_duration, file)
+    if duration is not None and duration > settings.stt_max_duration_seconds:
+        raise upload_too_large(
+            f"longer than {settings.stt_max_duration_seconds} seconds"
+        )
+    call: asyncio.Future[bytes] | None = None
+
+    def transcribe_upload() -> Awaitable[bytes]:
+        nonlocal call
+        call = asyncio.ensure_future(
+            _transcribe_and_cache((filename, file, content_type), params, client, key)
+        )
+        return call
+
+    try:
+        return await stt_flight.do(key, transcribe_upload)
+    except asyncio.CancelledError:
+        if call is not None:
+            # Callers that joined the call are still waiting for it
+            await asyncio.wait([call])
+        raise
+
+
+async def _transcribe_and_cache(
+    upload: tuple[str, BinaryIO, str | None],
+    params: STTParameters,
+    client: AsyncClient,
+    key: str,
+) -> bytes:
+    """Transcribe the upload with Whisper and cache the raw transcription."""
+    filename, file, content_type = upload
+    sent: tuple[str, BinaryIO | bytes, str | None] = upload
+    if settings.stt_preprocess and (
+        preprocessed := await audio_preprocessor.process(file)
+    ):
+        sent = ("audio.ogg", preprocessed.data, "audio/ogg")
+    elif settings.stt_hedging:
+        # Hedged requests send the upload twice at once, so it cannot be
+        # streamed from the file
+        sent = (filename, await asyncio.to_thread(file.read), content_type)
+    response = await openai_upstream.call(
+        "audio.transcriptions.create",
+        lambda: client.audio.transcriptions.with_raw_response.create(
+            file=sent, model=params.model, language=params.language
+        ),
+        hedge=settings.stt_hedging,
+    )
+    await stt_cache.set(key, response.content)
+    return response.content
 
 
 @router.post("/", response_model=Transcription)
 async def speech_to_text(
-    audio_file: UploadFile, params: STTParameters = Depends()
-) -> Transcription:
+    audio_file: UploadFile, client: OpenAIClientDep, params: STTParameters = Depends()
+) -> Response:
     """
     Process an audio file and return its speech-to-text transcription.
 
     This function takes an uploaded audio file, sends it to the OpenAI Whisper
-    and returns the transcription object.
+    and returns the transcription object. Identical uploads that arrive while one of
+    them is being transcribed share a single upstream call, and transcriptions of
+    uploads seen before are served from a cache.
+
+    The upload is streamed to Whisper from the temporary file it was spooled to, so it
+    is never copied unless `settings.stt_hedging` is enabled. Uploads
+    larger than `settings.stt_max_upload_bytes` or longer than
+    `settings.stt_max_duration_seconds` are rejected with a 413. If
+    `settings.stt_preprocess` is enabled, the audio is compacted before it is sent,
+    see `drivel_server.core.audio`.
     """
     try:
-        client = await OpenAIClientSingleton.get_instance()
-        audio = await audio_file.read()
-        buffer = io.BytesIO(audio)
-        buffer.name = audio_file.filename
-        return await client.audio.transcriptions.create(
-            file=buffer, model=params.model, language=params.language
+        transcription = await transcribe_json(
+            audio_file.file,
+            audio_file.filename or "audio",
+            audio_file.content_type,
+            params,
+            client,
         )
+        # The JSON of Whisper matches `Transcription`, so it is passed through
+        return json_response(transcription)
     except Exception as e:
         # Handle errors and exceptions
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
-        ) from e
+        raise to_http_exception(e) from e
@@ -1,39 +1,404 @@
 """Endpoint and business logic related to text-to-speech."""
 
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import Response
+import asyncio
+from collections.abc import AsyncIterator
+import json
+from typing import Annotated
+
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import Response, StreamingResponse
 from google.cloud import texttospeech as tts
 
-from drivel_server.clients import GoogleCloudClientSingleton
-from drivel_server.schemas.tts import TTSParameters
+from drivel_server.api.deps import TTSClientDep
+from drivel_server.clients import google_tts_upstream
+from drivel_server.core.archive import ArchiveCache
+from drivel_server.core.cache import TieredCache, etag_matches
+from drivel_server.core.config import settings
+from drivel_server.core.errors import to_http_exception
+from drivel_server.core.multipart import multipart_end, multipart_part, new_boundary
+from drivel_server.core.singleflight import SingleFlight
+from drivel_server.core.stats import register_stats
+from drivel_server.core.text import split_sentences
+from drivel_server.core.tickets import TicketStore
+from drivel_server.schemas.tts import (
+    AUDIO_MEDIA_TYPES,
+    AudioEncoding,
+    TTSBatchParameters,
+    TTSParameters,
+    VoiceParameters,
+)
 
 router = APIRouter()
 
+# Media ranges of the `Accept` header and the encodings they ask for. Wildcards
+# get the default encoding.
+ACCEPTED_ENCODINGS: dict[str, AudioEncoding] = {
+    "*/*": "MP3",
+    "audio/*": "MP3",
+    "audio/mpeg": "MP3",
+    "audio/mp3": "MP3",
+    "audio/ogg": "OGG_OPUS",
+    "audio/opus": "OGG_OPUS",
+    "audio/wav": "LINEAR16",
+    "audio/x-wav": "LINEAR16",
+}
+# Encodings whose audio can be split into chunks that are played back to back
+STREAMABLE_ENCODINGS: set[AudioEncoding] = {"MP3", "OGG_OPUS"}
 
-@router.post("/", response_model=None)
-async def text_to_speech(params: TTSParameters) -> Response:
-    """Process a text message and return its text-to-speech result."""
-    try:
-        client = await GoogleCloudClientSingleton.get_instance()
-        synthesis_input = tts.SynthesisInput(text=params.text)
+tts_cache = TieredCache(
+    max_bytes=settings.tts_cache_max_bytes, directory=settings.tts_cache_dir
+)
+tts_flight = SingleFlight()
+phrase_bank = ArchiveCache()
+speech_tickets = TicketStore(settings.tts_ticket_ttl, settings.tts_ticket_max_count)
+register_stats("tts_cache", tts_cache.stats)
+register_stats("tts_phrase_bank", phrase_bank.stats)
+register_stats("tts_singleflight", tts_flight.stats)
+register_stats("tts_tickets", speech_tickets.stats)
 
-        # Build the voice request, select the language code and voice
-        voice = tts.VoiceSelectionParams(
-            language_code=params.language_code, name=params.name
-        )
 
-        # Select the type of audio file you want returned
-        audio_config = tts.AudioConfig(
-            audio_encoding=tts.AudioEncoding.MP3, speaking_rate=params.speaking_rate
-        )
+def _quality(params: list[str]) -> float:
+    """Return the quality value among the parameters of a media range."""
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negotiate_encoding(
+    accept: str | None, supported: set[AudioEncoding] | None = None
+) -> AudioEncoding:
+    """
+    Return the audio encoding preferred by an `Accept` header.
+
+    The supported media range with the highest quality value wins, ties going to
+    the one listed first. If the header is missing or accepts none of the
+    supported encodings, MP3 is returned, so that clients which do not negotiate
+    keep getting what they always got.
+    """
+    best: AudioEncoding = "MP3"
+    best_quality = 0.0
+    for media_range in (accept or "").split(","):
+        media_type, *params = media_range.split(";")
+        encoding = ACCEPTED_ENCODINGS.get(media_type.strip().lower())
+        if encoding is None or (supported is not None and encoding not in supported):
+            continue
+        if (quality := _quality(params)) > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+async def synthesize(
+    params: TTSParameters, client: tts.TextToSpeechAsyncClient
+) -> bytes:
+    """
+    Return the synthesized audio for the given parameters.
+
+    The audio is looked up in the `phrase_bank` and `tts_cache` first, and only
+    synthesized by Google Cloud Text-to-Speech on a miss. Concurrent misses for the
+    same audio share a single upstream call.
+    """
+    key = params.cache_key()
+    if (audio := phrase_bank.get(key)) is not None:
+        return audio
+    if (audio := await tts_cache.get(key)) is not None:
+        return audio
+    return await tts_flight.do(key, lambda: _synthesize_and_cache(params, client, key))
+
+
+async def _synthesize_and_cache(
+    params: TTSParameters, client: tts.TextToSpeechAsyncClient, key: str
+) -> bytes:
+    """Synthesize the audio with Google Cloud Text-to-Speech and cache it."""
+    audio = await request_speech(params, client)
+    await tts_cache.set(key, audio)
+    return audio
+
+
+async def request_speech(
+    params: TTSParameters, client: tts.TextToSpeechAsyncClient
+) -> bytes:
+    """Synthesize the audio with Google Cloud Text-to-Speech, without caching it."""
+    synthesis_input = tts.SynthesisInput(text=params.text)
+
+    # Build the voice request, select the language code and voice
+    voice = tts.VoiceSelectionParams(
+        language_code=params.language_code, name=params.name
+    )
 
-        # Perform the text-to-speech request on the text input with the selected
-        # voice parameters and audio file type
-        response = await client.synthesize_speech(
+    # Select the type of audio file you want returned
+    audio_config = tts.AudioConfig(
+        audio_encoding=tts.AudioEncoding[params.encoding],
+        speaking_rate=params.speaking_rate,
+        # Zero selects the natural sample rate of the voice
+        sample_rate_hertz=params.sample_rate_hertz or 0,
+    )
+
+    # Perform the text-to-speech request on the text input with the selected
+    # voice parameters and audio file type
+    response = await google_tts_upstream.call(
+        "synthesize_speech",
+        lambda: client.synthesize_speech(
             input=synthesis_input, voice=voice, audio_config=audio_config
+        ),
+        hedge=settings.tts_hedging,
+    )
+    return response.audio_content
+
+
+@router.post(
+    "/",
+    response_model=None,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {media_type: {} for media_type in AUDIO_MEDIA_TYPES.values()}
+        }
+    },
+)
+async def text_to_speech(
+    params: TTSParameters,
+    client: TTSClientDep,
+    accept: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    Process a text message and return its text-to-speech result.
+
+    The audio is encoded as `audio_encoding`, or else in the format preferred by
+    the `Accept` header among `audio/mpeg`, `audio/ogg` and `audio/wav`.
+
+    The response carries an ETag derived from the normalized parameters. Clients
+    that send it back in `If-None-Match` get an empty 304 response instead of the
+    audio.
+    """
+    if params.audio_encoding is None:
+        params = params.model_copy(
+            update={"audio_encoding": negotiate_encoding(accept)}
+        )
+    headers = {"ETag": f'"{params.cache_key()}"', "Vary": "Accept"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    try:
+        audio = await synthesize(params, client)
+    except Exception as e:
+        raise to_http_exception(e) from e
+    return Response(content=audio, media_type=params.media_type, headers=headers)
+
+
+def prefetch_speech(
+    text: str, voice: VoiceParameters, client: tts.TextToSpeechAsyncClient
+) -> str:
+    """
+    Start synthesizing the MP3 audio of a text in the background.
+
+    Returns the ticket for which `GET /text-to-speech/tickets/{ticket_id}` returns
+    the audio.
+    """
+    params = TTSParameters(text=text, **voice.model_dump())
+    return speech_tickets.create(lambda: synthesize(params, client))
+
+
+@router.get(
+    "/tickets/{ticket_id}",
+    response_model=None,
+    responses={status.HTTP_200_OK: {"content": {AUDIO_MEDIA_TYPES["MP3"]: {}}}},
+)
+async def speech_ticket(ticket_id: str) -> Response:
+    """
+    Return the audio of a reply whose synthesis was started in the background.
+
+    Tickets are handed out by `/chat-responses` in the `X-Audio-Ticket` header
+    when `prefetch_speech` is set. If the synthesis has not finished yet, the
+    response waits for it. Tickets expire `settings.tts_ticket_ttl` seconds after
+    they were created, after which the status code is 404.
+    """
+    task = speech_tickets.get(ticket_id)
+    if task is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ticket {ticket_id} does not exist or has expired",
         )
-        return Response(content=response.audio_content, media_type="audio/mp3")
+    try:
+        audio = await asyncio.shield(task)
     except Exception as e:
+        raise to_http_exception(e) from e
+    return Response(content=audio, media_type=AUDIO_MEDIA_TYPES["MP3"])
+
+
+async def synthesize_chunks(
+    chunks: list[TTSParameters], client: tts.TextToSpeechAsyncClient
+) -> AsyncIterator[bytes]:
+    """
+    Synthesize the chunks concurrently and yield their audio in order.
+
+    At most `settings.tts_stream_concurrency` chunks are synthesized at once, with
+    earlier chunks taking precedence. Chunks that have not been consumed when the
+    generator is closed, e.g. because the client disconnected, are cancelled.
+    """
+    semaphore = asyncio.Semaphore(settings.tts_stream_concurrency)
+
+    async def bounded_synthesize(chunk: TTSParameters) -> bytes:
+        async with semaphore:
+            return await synthesize(chunk, client)
+
+    tasks = [asyncio.create_task(bounded_synthesize(chunk)) for chunk in chunks]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@router.post(
+    "/stream",
+    response_model=None,
+    responses={
+        status.HTTP_200_OK: {
+            "content": {
+                AUDIO_MEDIA_TYPES[encoding]: {} for encoding in STREAMABLE_ENCODINGS
+            }
+        }
+    },
+)
+async def text_to_speech_stream(
+    params: TTSParameters,
+    client: TTSClientDep,
+    accept: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """
+    Process a text message and stream its text-to-speech result.
+
+    The text is split into sentences, which are synthesized concurrently and
+    streamed back in order as soon as each one is ready. Playback can therefore
+    start after the first sentence is synthesized instead of the whole text. Each
+    sentence is cached on its own, so replies that share sentences share audio.
+
+    The audio is negotiated as for the non-streaming endpoint, except that
+    `LINEAR16` is rejected with a 422, since the WAV audio of the sentences cannot
+    be concatenated. `OGG_OPUS` audio is streamed as a chained Ogg stream.
+    """
+    if params.audio_encoding is None:
+        params = params.model_copy(
+            update={"audio_encoding": negotiate_encoding(accept, STREAMABLE_ENCODINGS)}
+        )
+    elif params.audio_encoding not in STREAMABLE_ENCODINGS:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
-        ) from e
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{params.audio_encoding} audio cannot be streamed",
+        )
+    chunks = [
+        params.model_copy(update={"text": sentence})
+        for sentence in split_sentences(
+            params.text, max_chars=settings.tts_stream_max_chunk_chars
+        )
+    ]
+    audio_chunks = synthesize_chunks(chunks, client)
+    try:
+        # Wait for the first chunk, so that failures still result in an error status
+        first_chunk = await anext(audio_chunks)
+    except Exception as e:
+        await audio_chunks.aclose()
+        raise to_http_exception(e) from e
+
+    async def stream() -> AsyncIterator[bytes]:
+        try:
+            yield first_chunk
+            async for chunk in audio_chunks:
+                yield chunk
+        finally:
+            await audio_chunks.aclose()
+
+    return StreamingResponse(
+        stream(), media_type=params.media_type, headers={"Vary": "Accept"}
+    )
+
+
+async def synthesize_batch(
+    items: list[TTSParameters], client: tts.TextToSpeechAsyncClient
+) -> AsyncIterator[tuple[list[int], TTSParameters, bytes | Exception]]:
+    """
+    Synthesize the items concurrently and yield their audio as soon as it is ready.
+
+    Items with the same cache key are synthesized once, and yielded together with
+    the indices of all of them. At most `settings.tts_batch_concurrency` items are
+    synthesized at once. A failed item is yielded with its exception instead of
+    failing the batch. Items that have not been consumed when the generator is
+    closed, e.g. because the client disconnected, are cancelled.
+    """
+    indices: dict[str, list[int]] = {}
+    unique: dict[str, TTSParameters] = {}
+    for i, item in enumerate(items):
+        key = item.cache_key()
+        indices.setdefault(key, []).append(i)
+        unique.setdefault(key, item)
+    semaphore = asyncio.Semaphore(settings.tts_batch_concurrency)
+
+    async def bounded_synthesize(key: str) -> tuple[str, bytes | Exception]:
+        async with semaphore:
+            try:
+                return key, await synthesize(unique[key], client)
+            except Exception as e:
+                return key, e
+
+    tasks = [asyncio.create_task(bounded_synthesize(key)) for key in unique]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, result = await next_done
+            yield indices[key], unique[key], result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def encode_batch(
+    results: AsyncIterator[tuple[list[int], TTSParameters, bytes | Exception]],
+    boundary: str,
+) -> AsyncIterator[bytes]:
+    """
+    Encode the results of a batch as the parts of a `multipart/mixed` body.
+
+    Each part has an `X-Item-Index` header with the comma-separated indices of the
+    items it answers. The audio of an item is sent in its media type, and a
+    failure as an `application/json` part with the `status_code` and `detail` the
+    item would have gotten from `/text-to-speech`.
+    """
+    async for indices, item, result in results:
+        headers = {"X-Item-Index": ", ".join(map(str, indices))}
+        if isinstance(result, Exception):
+            error = to_http_exception(result)
+            body = json.dumps(
+                {"status_code": error.status_code, "detail": error.detail}
+            ).encode()
+            yield multipart_part(boundary, "application/json", body, headers)
+        else:
+            yield multipart_part(boundary, item.media_type, result, headers)
+    yield multipart_end(boundary)
+
+
+@router.post(
+    "/batch",
+    response_model=None,
+    responses={status.HTTP_200_OK: {"content": {"multipart/mixed": {}}}},
+)
+async def text_to_speech_batch(
+    params: TTSBatchParameters, client: TTSClientDep
+) -> StreamingResponse:
+    """
+    Synthesize several texts in one request.
+
+    Identical items are synthesized only once, and the distinct ones concurrently.
+    The response is a `multipart/mixed` stream with one part per distinct item, in
+    the order they finish. The `X-Item-Index` header of a part tells which items
+    it answers. Items that fail are reported in their own `application/json` part,
+    while the rest of the batch is still synthesized.
+    """
+    boundary = new_boundary()
+    return StreamingResponse(
+        encode_batch(synthesize_batch(params.items, client), boundary),
+        media_type=f"multipart/mixed; boundary={boundary}",
+    )
@@ -0,0 +1,59 @@
+"""Endpoint and business logic related to the available voices."""
+
+from typing import Annotated
+
+from fastapi import APIRouter, Header, status
+from fastapi.responses import Response
+from google.cloud import texttospeech as tts
+
+from drivel_server.clients import GoogleCloudClientSingleton, google_tts_upstream
+from drivel_server.core.cache import etag_matches
+from drivel_server.core.stats import register_stats
+from drivel_server.core.voices import voice_catalog
+from drivel_server.schemas.voices import Voice, VoiceGender
+
+router = APIRouter()
+
+register_stats("voices", voice_catalog.stats)
+
+
+async def fetch_voices() -> list[Voice]:
+    """Return the voices of Google Cloud Text-to-Speech."""
+    client = await GoogleCloudClientSingleton.get_instance()
+    response = await google_tts_upstream.call("list_voices", client.list_voices)
+    return [
+        Voice(
+            name=voice.name,
+            language_codes=list(voice.language_codes),
+            ssml_gender=tts.SsmlVoiceGender(voice.ssml_gender).name,
+            natural_sample_rate_hertz=voice.natural_sample_rate_hertz,
+        )
+        for voice in response.voices
+    ]
+
+
+@router.get(
+    "/",
+    response_model=list[Voice],
+    responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not modified"}},
+)
+async def voices(
+    language_code: str | None = None,
+    gender: VoiceGender | None = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    List the voices that can be used for text-to-speech.
+
+    The voices can be filtered by a BCP-47 `language_code` and by `gender`. They
+    are served from a catalog that is refreshed in the background, so the list is
+    empty until it has been loaded.
+
+    The response carries an ETag that changes with the catalog. Clients that send
+    it back in `If-None-Match` get an empty 304 response instead of the list.
+    """
+    body, etag = voice_catalog.listing(language_code, gender)
+    headers = {"ETag": etag}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -3,23 +3,69 @@
 import asyncio
 
 from google.cloud import texttospeech as tts
-from openai import AsyncClient
+from google.cloud.texttospeech_v1.services.text_to_speech.transports import (
+    TextToSpeechGrpcAsyncIOTransport,
+)
+import grpc
+import httpx
+from openai import AsyncClient, DefaultAsyncHttpxClient
 
-from drivel_server.core.security import get_openai_secret
+from drivel_server.core.config import settings
+from drivel_server.core.limiter import AdaptiveLimiter
+from drivel_server.core.resilience import CircuitBreaker, RetryBudget, Upstream
+from drivel_server.core.security import Secrets, secrets_provider
+from drivel_server.core.stats import register_stats
 
 type OpenAISecrets = tuple[str, str, str]
 
 
+def _create_upstream(name: str) -> Upstream:
+    """Create the resilience layer of the calls to an upstream API from `settings`."""
+    upstream = Upstream(
+        name,
+        limiter=AdaptiveLimiter(
+            name,
+            initial_limit=settings.upstream_initial_limit,
+            min_limit=settings.upstream_min_limit,
+            max_limit=settings.upstream_max_limit,
+            max_queue=settings.upstream_max_queue,
+            max_wait=settings.upstream_max_wait_seconds,
+        ),
+        breaker=CircuitBreaker(
+            name,
+            failure_threshold=settings.upstream_circuit_failure_threshold,
+            reset_timeout=settings.upstream_circuit_reset_seconds,
+        ),
+        budget=RetryBudget(
+            ratio=settings.upstream_retry_budget_ratio,
+            capacity=settings.upstream_retry_budget_capacity,
+        ),
+        max_attempts=settings.upstream_max_attempts,
+        backoff_base=settings.upstream_backoff_base_seconds,
+        backoff_max=settings.upstream_backoff_max_seconds,
+    )
+    register_stats(f"{name}_limiter", upstream.limiter.stats)
+    register_stats(f"{name}_resilience", upstream.stats)
+    return upstream
+
+
+openai_upstream = _create_upstream("openai")
+google_tts_upstream = _create_upstream("google_tts")
+
+
 class OpenAIClientSingleton:
     """
     A singleton to manage and reuse an instance of an asynchronous OpenAI client.
 
     This class ensures that only one instance of the OpenAI client is created and reused
     throughout the application, promoting efficient resource use and consistency in API
-    calls.
+    calls. The instance is created when the application starts and closed when it
+    shuts down, see `drivel_server.main.lifespan`.
     """
 
-    _instance = None
+    _instance: AsyncClient | None = None
+    _http_client: httpx.AsyncClient | None = None
+    _lock = asyncio.Lock()
 
     @classmethod
     async def get_instance(cls) -> AsyncClient:
@@ -28,38 +74,129 @@ class OpenAIClientSingleton:
 
         If the instance does not exist, it creates a new one by asynchronously obtaining
         the necessary API secrets and initializes the AsyncClient with these secrets.
-        Otherwise, it returns the existing instance.
+        Otherwise, it returns the existing instance without taking the lock, so
+        requests do not contend for it once the client has been created at startup.
+        The connection pool and timeouts of the underlying HTTP client are configured
+        through `settings`.
 
         Returns:
             AsyncClient: The singleton instance of the OpenAI client.
         """
-        async with asyncio.Lock():
+        if cls._instance is not None:
+            return cls._instance
+        async with cls._lock:
             if cls._instance is None:
                 api_key, org_id, project_id = await cls._get_openai_secrets()
+                timeout = cls._timeout()
+                cls._http_client = DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.openai_max_connections,
+                        max_keepalive_connections=settings.openai_max_keepalive_connections,
+                        keepalive_expiry=settings.openai_keepalive_expiry,
+                    ),
+                    timeout=timeout,
+                    http2=settings.openai_http2,
+                )
                 cls._instance = AsyncClient(
-                    api_key=api_key, organization=org_id, project=project_id
+                    api_key=api_key,
+                    organization=org_id,
+                    project=project_id,
+                    base_url=settings.openai_base_url,
+                    timeout=timeout,
+                    # Retries are made by `openai_upstream` instead
+                    max_retries=0,
+                    http_client=cls._http_client,
                 )
         return cls._instance
 
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(
+            connect=settings.openai_connect_timeout,
+            read=settings.openai_read_timeout,
+            write=settings.openai_write_timeout,
+            pool=settings.openai_pool_timeout,
+        )
+
+    @classmethod
+    async def warm_up(cls) -> None:
+        """Make a cheap request to open a connection to the OpenAI API."""
+        client = await cls.get_instance()
+        await client.models.list()
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the client and its connection pool, if it has been created."""
+        async with cls._lock:
+            if cls._instance is not None:
+                await cls._instance.close()
+                cls._instance = None
+                cls._http_client = None
+
+    @classmethod
+    def pool_stats(cls) -> dict[str, int]:
+        """
+        Return the occupancy of the HTTP connection pool.
+
+        httpx does not expose pool statistics publicly, so these are read from the
+        internals of its transport and of httpcore. The counts are zero if the client
+        has not been created or if the internals have changed.
+        """
+        pool = getattr(getattr(cls._http_client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", [])
+        requests = getattr(pool, "_requests", [])
+        try:
+            idle = sum(conn.is_idle() for conn in connections)
+            queued = sum(request.is_queued() for request in requests)
+        except AttributeError:
+            connections, requests, idle, queued = [], [], 0, 0
+        return {
+            "max_connections": settings.openai_max_connections,
+            "connections": len(connections),
+            "idle_connections": idle,
+            "active_requests": len(requests) - queued,
+            "queued_requests": queued,
+        }
+
     @staticmethod
     async def _get_openai_secrets() -> OpenAISecrets:
         """
         Retrieves the OpenAI API key and orgID required for initializing the client.
 
-        This method concurrently fetches the 'api_key' and 'org_id' using an unspecified
-        `get_openai_secret` function, which is assumed to be an asynchronous function
-        that accesses some form of secure storage.
+        The secrets are served by `secrets_provider`, which caches them.
 
         Returns:
             OpenAISecrets: A tuple containing the OpenAI API key, organization ID and
                 project ID.
         """
         return await asyncio.gather(
-            get_openai_secret("api_key"),
-            get_openai_secret("org_id"),
-            get_openai_secret("proj_id"),
+            secrets_provider.get("api_key"),
+            secrets_provider.get("org_id"),
+            secrets_provider.get("proj_id"),
         )
 
+    @classmethod
+    async def update_credentials(cls, secrets: Secrets) -> None:
+        """
+        Switch the client to new OpenAI credentials.
+
+        The client is replaced by a copy with the new credentials sharing the same
+        HTTP client, so requests in flight with the old credentials complete
+        normally and the connection pool is kept.
+        """
+        async with cls._lock:
+            if cls._instance is not None:
+                cls._instance = cls._instance.with_options(
+                    api_key=secrets["api_key"],
+                    organization=secrets["org_id"],
+                    project=secrets["proj_id"],
+                )
+
+
+register_stats("openai_http_pool", OpenAIClientSingleton.pool_stats)
+register_stats("secrets", secrets_provider.stats)
+secrets_provider.subscribe(OpenAIClientSingleton.update_credentials)
+
 
 class GoogleCloudClientSingleton:
     """
@@ -67,10 +204,12 @@ class GoogleCloudClientSingleton:
 
     This class ensures that only one instance of the Google Cloud Text-to-Speech client
     is created and reused throughout the application, promoting efficient resource use
-    and consistency in API calls.
+    and consistency in API calls. The instance is created when the application starts
+    and closed when it shuts down, see `drivel_server.main.lifespan`.
     """
 
-    _instance = None
+    _instance: tts.TextToSpeechAsyncClient | None = None
+    _lock = asyncio.Lock()
 
     @classmethod
     async def get_instance(cls) -> tts.TextToSpeechAsyncClient:
@@ -78,17 +217,40 @@ class GoogleCloudClientSingleton:
         Retrieves the singleton instance of the Google Cloud Text-to-Speech client.
 
         If the instance does not exist, it creates a new one by initializing the
-        TextToSpeechAsyncClient. Otherwise, it returns the existing instance.
+        TextToSpeechAsyncClient. Otherwise, it returns the existing instance without
+        taking the lock. If `settings.tts_api_endpoint` is set, the client connects to
+        that address over an insecure channel.
 
         Returns:
             TextToSpeechAsyncClient: The singleton instance of the Google Cloud
             Text-to-Speech client.
-
-        Side Effects:
-            Prints a message indicating whether a new client was created or an existing
-            one is reused.
         """
-        async with asyncio.Lock():
+        if cls._instance is not None:
+            return cls._instance
+        async with cls._lock:
             if cls._instance is None:
-                cls._instance = tts.TextToSpeechAsyncClient()
+                cls._instance = cls._create_client()
         return cls._instance
+
+    @staticmethod
+    def _create_client() -> tts.TextToSpeechAsyncClient:
+        if settings.tts_api_endpoint is None:
+            return tts.TextToSpeechAsyncClient()
+        channel = grpc.aio.insecure_channel(settings.tts_api_endpoint)
+        return tts.TextToSpeechAsyncClient(
+            transport=TextToSpeechGrpcAsyncIOTransport(channel=channel)
+        )
+
+    @classmethod
+    async def warm_up(cls) -> None:
+        """Make a cheap request to open the gRPC channel to the TTS API."""
+        client = await cls.get_instance()
+        await client.list_voices(language_code="es-ES")
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the gRPC channel of the client, if it has been created."""
+        async with cls._lock:
+            if cls._instance is not None:
+                await cls._instance.transport.close()
+                cls._instance = None
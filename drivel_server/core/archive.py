@@ -0,0 +1,147 @@
+"""
+Read-only archives of byte values, served from a memory-mapped file.
+
+An archive stores values under keys that are hex-encoded SHA-256 digests, like the
+keys of the caches in `drivel_server.core.cache`. It is written once with
+`write_archive` and then opened with `Archive`, which maps the file into memory
+instead of reading it. The values are only paged in when they are read, and the
+pages are shared by all processes serving the same archive.
+
+The file starts with a header holding a magic number and the number of entries,
+followed by an index of fixed-size records sorted by key, and the values:
+
+    header:  magic (8 bytes) | entry count (uint32) | reserved (uint32)
+    index:   key digest (32 bytes) | value offset (uint64) | value length (uint64)
+    values:  concatenated values
+"""
+
+from collections.abc import Mapping
+import mmap
+import os
+from pathlib import Path
+import struct
+import tempfile
+
+MAGIC = b"DRVLARC1"
+HEADER = struct.Struct("<8sII")
+RECORD = struct.Struct("<32sQQ")
+
+
+class ArchiveError(Exception):
+    """Raised when a file is not a valid archive."""
+
+
+def write_archive(path: str | Path, entries: Mapping[str, bytes]) -> None:
+    """Write the entries to an archive, atomically replacing any existing file."""
+    path = Path(path)
+    keys = sorted(bytes.fromhex(key) for key in entries)
+    offset = HEADER.size + RECORD.size * len(keys)
+    index, values = [], []
+    for key in keys:
+        value = entries[key.hex()]
+        index.append(RECORD.pack(key, offset, len(value)))
+        values.append(value)
+        offset += len(value)
+
+    fd, tmp = tempfile.mkstemp(dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(keys), 0))
+            f.writelines(index)
+            f.writelines(values)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class Archive:
+    """
+    A memory-mapped archive, looked up by binary search of its index.
+
+    Raises:
+        ArchiveError: If the file is not a valid archive.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < HEADER.size:
+            raise ArchiveError(f"{path} is not an archive")
+        magic, self._count, _ = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or HEADER.size + RECORD.size * self._count > len(self._mmap):
+            raise ArchiveError(f"{path} is not an archive")
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return self._count
+
+    def _record(self, i: int) -> tuple[bytes, int, int]:
+        return RECORD.unpack_from(self._mmap, HEADER.size + RECORD.size * i)
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value for `key`, or None if the archive does not have it."""
+        try:
+            digest = bytes.fromhex(key)
+        except ValueError:
+            return None
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, offset, length = self._record(middle)
+            if record_key == digest:
+                return self._mmap[offset : offset + length]
+            if record_key < digest:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self._mmap.close()
+
+
+class ArchiveCache:
+    """
+    A read-only cache tier serving the entries of an archive, with hit counters.
+
+    Until an archive is opened, every lookup misses.
+    """
+
+    def __init__(self) -> None:
+        self.archive: Archive | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def open(self, path: str | Path) -> None:
+        """Serve the entries of the archive at `path`, replacing any open one."""
+        previous, self.archive = self.archive, Archive(path)
+        if previous is not None:
+            previous.close()
+
+    def close(self) -> None:
+        """Stop serving the archive and unmap it."""
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value for `key`, or None if it is not in the archive."""
+        if self.archive is None:
+            return None
+        value = self.archive.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of entries, hits and misses."""
+        return {
+            "entries": len(self.archive) if self.archive is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,202 @@
+"""
+Preprocessing of uploaded audio before transcription.
+
+Recordings from the app are often stereo, sampled at a high rate and surrounded by
+silence. None of that helps Whisper, but all of it costs upload bandwidth and
+transcription time. The preprocessing decodes the audio, downmixes it to mono,
+resamples it to 16 kHz, trims leading and trailing silence and re-encodes it as
+Ogg/Opus.
+
+The re-encoded audio is only used if it is smaller than the upload, and uploads
+larger than `settings.stt_preprocess_max_bytes` are not preprocessed, since they
+would have to be read into memory to be sent to the pool.
+
+Decoding and encoding are CPU bound, so they run in a process pool. PyAV and
+numpy are optional dependencies, installed with the `audio` extra, and are only
+needed if `settings.stt_preprocess` is enabled.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import io
+import logging
+from typing import TYPE_CHECKING, BinaryIO, NamedTuple
+
+from drivel_server.core.config import settings
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16_000
+WINDOW_SECONDS = 0.02
+OPUS_BIT_RATE = 24_000
+
+
+class PreprocessedAudio(NamedTuple):
+    """Preprocessed audio together with the size and duration before and after."""
+
+    data: bytes
+    original_bytes: int
+    original_seconds: float
+    seconds: float
+
+
+def _decode(data: bytes) -> "np.ndarray":
+    """Decode audio to 16 kHz mono signed 16-bit samples."""
+    import av
+    import numpy as np
+
+    resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+    chunks = []
+    with av.open(io.BytesIO(data)) as container:
+        for frame in container.decode(audio=0):
+            chunks.extend(f.to_ndarray().reshape(-1) for f in resampler.resample(frame))
+    chunks.extend(f.to_ndarray().reshape(-1) for f in resampler.resample(None))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+
+
+def _trim_silence(
+    samples: "np.ndarray", threshold_dbfs: float, padding_seconds: float
+) -> "np.ndarray":
+    """
+    Trim leading and trailing silence with an energy-based voice activity detector.
+
+    The samples are split into short windows, and windows whose RMS level is below
+    `threshold_dbfs` count as silence. Some padding is kept around the voiced part to
+    not cut off soft onsets and endings. If no window is voiced, the samples are
+    returned unchanged.
+    """
+    import numpy as np
+
+    window = int(SAMPLE_RATE * WINDOW_SECONDS)
+    n_windows = len(samples) // window
+    if n_windows == 0:
+        return samples
+    windows = samples[: n_windows * window].astype(np.float64).reshape(n_windows, -1)
+    rms = np.sqrt(np.mean(windows**2, axis=1)) / 32768
+    voiced = np.flatnonzero(rms > 10 ** (threshold_dbfs / 20))
+    if len(voiced) == 0:
+        return samples
+    padding = int(SAMPLE_RATE * padding_seconds)
+    start = max(voiced[0] * window - padding, 0)
+    end = min((voiced[-1] + 1) * window + padding, len(samples))
+    return samples[start:end]
+
+
+def _encode(samples: "np.ndarray") -> bytes:
+    """Encode 16 kHz mono samples as Ogg/Opus."""
+    import av
+
+    output = io.BytesIO()
+    with av.open(output, "w", format="ogg") as container:
+        stream = container.add_stream("libopus", rate=SAMPLE_RATE, layout="mono")
+        stream.bit_rate = OPUS_BIT_RATE
+        frame = av.AudioFrame.from_ndarray(
+            samples.reshape(1, -1), format="s16", layout="mono"
+        )
+        frame.sample_rate = SAMPLE_RATE
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return output.getvalue()
+
+
+def preprocess_audio(
+    data: bytes, threshold_dbfs: float, padding_seconds: float
+) -> PreprocessedAudio:
+    """Decode, downmix, resample, trim and re-encode the given audio."""
+    samples = _decode(data)
+    trimmed = _trim_silence(samples, threshold_dbfs, padding_seconds)
+    return PreprocessedAudio(
+        data=_encode(trimmed),
+        original_bytes=len(data),
+        original_seconds=len(samples) / SAMPLE_RATE,
+        seconds=len(trimmed) / SAMPLE_RATE,
+    )
+
+
+def _read_at_most(file: BinaryIO, max_bytes: int) -> bytes | None:
+    """Read a file if it is at most `max_bytes` long, and rewind it."""
+    file.seek(0)
+    data = file.read(max_bytes + 1)
+    file.seek(0)
+    return data if len(data) <= max_bytes else None
+
+
+class AudioPreprocessor:
+    """
+    Run `preprocess_audio` in a process pool and keep track of what it saves.
+
+    The pool is created on first use, so that nothing is started if preprocessing is
+    disabled.
+    """
+
+    def __init__(self) -> None:
+        self._executor: ProcessPoolExecutor | None = None
+        self.processed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.not_smaller = 0
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+
+    async def process(self, file: BinaryIO) -> PreprocessedAudio | None:
+        """
+        Preprocess an uploaded file, or return None to send the original upload.
+
+        The original upload is sent if it is too large to be preprocessed, if the
+        preprocessed audio is not smaller, or if preprocessing fails, e.g. because
+        the format cannot be decoded. Failures are logged.
+        """
+        data = await asyncio.to_thread(
+            _read_at_most, file, settings.stt_preprocess_max_bytes
+        )
+        if data is None:
+            self.skipped += 1
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.stt_preprocess_workers
+            )
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor,
+                preprocess_audio,
+                data,
+                settings.stt_silence_threshold_dbfs,
+                settings.stt_silence_padding_seconds,
+            )
+        except Exception:
+            self.failed += 1
+            logger.exception("Audio preprocessing failed, using the original upload")
+            return None
+        self.processed += 1
+        if len(result.data) >= result.original_bytes:
+            self.not_smaller += 1
+            return None
+        self.bytes_saved += result.original_bytes - len(result.data)
+        self.seconds_saved += result.original_seconds - result.seconds
+        return result
+
+    def shutdown(self) -> None:
+        """Shut down the process pool, if it has been started."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of processed and sent files and what they saved."""
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "not_smaller": self.not_smaller,
+            "bytes_saved": self.bytes_saved,
+            "milliseconds_saved": round(self.seconds_saved * 1000),
+        }
+
+
+audio_preprocessor = AudioPreprocessor()
@@ -0,0 +1,156 @@
+"""
+Content-addressed byte caches.
+
+The caches in this module store opaque `bytes` values under string keys, which
+are expected to be hex digests of the normalized request that produced the
+value. A `TieredCache` combines a byte-size bounded in-memory LRU with an
+optional on-disk tier, so that hot entries are served from memory while the
+long tail survives restarts of the process.
+"""
+
+import asyncio
+from collections import OrderedDict
+import os
+from pathlib import Path
+import tempfile
+
+
+class LRUCache:
+    """
+    An in-memory least-recently-used cache bounded by the total size in bytes.
+
+    Entries larger than the whole budget are never stored. When an insertion
+    pushes the total size above `max_bytes`, the least recently used entries
+    are evicted until it fits again.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        """Check whether `key` is cached, without marking it as recently used."""
+        return key in self._entries
+
+    def get(self, key: str) -> bytes | None:
+        """Return the value for `key` and mark it as recently used."""
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        """Store `value` under `key`, evicting old entries if needed."""
+        if len(value) > self.max_bytes:
+            return
+        if (old := self._entries.pop(key, None)) is not None:
+            self.size_bytes -= len(old)
+        self._entries[key] = value
+        self.size_bytes += len(value)
+        while self.size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+            self.evictions += 1
+
+
+class DiskCache:
+    """
+    A directory of files, one per key, used as the second cache tier.
+
+    Keys are sharded into sub-directories by their first two characters to keep
+    directory listings small. Files are written atomically so that a crash never
+    leaves a truncated entry behind. All file system access happens in a worker
+    thread to keep the event loop free.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _read(self, key: str) -> bytes | None:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    async def get(self, key: str) -> bytes | None:
+        """Read the entry for `key`, or return None if it does not exist."""
+        return await asyncio.to_thread(self._read, key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        """Write `value` to the entry for `key`."""
+        await asyncio.to_thread(self._write, key, value)
+
+
+class TieredCache:
+    """
+    A memory LRU backed by an optional disk tier, with hit and miss counters.
+
+    Lookups check memory first and fall back to disk. Disk hits are promoted to
+    the memory tier. Writes go to both tiers.
+    """
+
+    def __init__(self, max_bytes: int, directory: str | Path | None = None) -> None:
+        self.memory = LRUCache(max_bytes)
+        self.disk = DiskCache(directory) if directory is not None else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> bytes | None:
+        """Return the cached value for `key` from the fastest tier that has it."""
+        if (value := self.memory.get(key)) is not None:
+            self.memory_hits += 1
+            return value
+        if self.disk is not None and (value := await self.disk.get(key)) is not None:
+            self.disk_hits += 1
+            self.memory.set(key, value)
+            return value
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: bytes) -> None:
+        """Store `value` under `key` in all tiers."""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await self.disk.set(key, value)
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters and the current memory usage."""
+        return {
+            "hits": self.memory_hits + self.disk_hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.memory.evictions,
+            "entries": len(self.memory),
+            "size_bytes": self.memory.size_bytes,
+        }
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check whether an `If-None-Match` header value matches the given ETag."""
+    if if_none_match is None:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
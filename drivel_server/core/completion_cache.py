@@ -0,0 +1,193 @@
+"""
+Cache of chat completions.
+
+Translations and corrections of the same bot replies are requested over and over,
+so their completions are cached under the canonical digest of their parameters,
+see `OpenAIParameters.cache_key`. Only completions that are deterministic, or that
+the caller marks as cacheable, are cached, see `OpenAIParameters.is_cacheable`.
+
+Completions are stored as JSON in a `CompletionStore`. The default
+`MemoryCompletionStore` keeps them in the process with a time-to-live and
+least-recently-used eviction. `RedisCompletionStore` keeps them in Redis, or any
+server speaking its protocol, so that they are shared between instances. It
+requires the `redis` extra.
+"""
+
+from collections import OrderedDict
+import time
+from typing import Protocol
+
+from openai.types.chat import ChatCompletion
+
+from drivel_server.core.config import settings
+
+
+class CompletionStore(Protocol):
+    """The interface of completion stores."""
+
+    async def get(self, key: str) -> bytes | None:
+        """Return the stored completion, or None if it is not stored."""
+        ...
+
+    async def set(self, key: str, value: bytes) -> None:
+        """Store a completion."""
+        ...
+
+    async def close(self) -> None:
+        """Release the resources of the store."""
+        ...
+
+    def stats(self) -> dict[str, int]:
+        """Return counters describing the store."""
+        ...
+
+
+class MemoryCompletionStore:
+    """
+    An in-process completion store with a time-to-live and LRU eviction.
+
+    Completions expire `ttl` seconds after they were stored. When more than
+    `max_entries` completions are stored, the least recently used ones are evicted.
+    """
+
+    def __init__(self, ttl: float, max_entries: int) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    async def get(self, key: str) -> bytes | None:
+        """Return the stored completion, or None if it is not stored."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes) -> None:
+        """Store a completion."""
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        self._evict()
+
+    async def close(self) -> None:
+        """Release the resources of the store, of which there are none."""
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at <= now:
+                self.expirations += 1
+            elif len(self._entries) > self.max_entries:
+                self.evictions += 1
+            else:
+                break
+            del self._entries[key]
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of completions, and of expired and evicted ones."""
+        return {
+            "entries": len(self._entries),
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCompletionStore:
+    """
+    A completion store in Redis, where each completion is a string with an expiry.
+
+    Eviction of least recently used completions is left to the `maxmemory-policy`
+    of the Redis server.
+    """
+
+    def __init__(
+        self, url: str, ttl: float, prefix: str = "drivel:completion:"
+    ) -> None:
+        from redis.asyncio import Redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = Redis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        """Return the stored completion, or None if it is not stored."""
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes) -> None:
+        """Store a completion."""
+        await self._redis.set(self.prefix + key, value, px=int(self.ttl * 1000))
+
+    async def close(self) -> None:
+        """Close the connections to Redis."""
+        await self._redis.aclose()
+
+    def stats(self) -> dict[str, int]:
+        """Return no counters, since they are kept by Redis."""
+        return {}
+
+
+class CompletionCache:
+    """
+    A cache of chat completions, counting hits and the tokens they saved.
+
+    The tokens saved are the total tokens of the cached completions that were
+    served instead of being requested again.
+    """
+
+    def __init__(self, store: CompletionStore) -> None:
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    async def get(self, key: str) -> ChatCompletion | None:
+        """Return the cached completion, or None if it is not cached."""
+        value = await self.store.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        completion = ChatCompletion.model_validate_json(value)
+        self.hits += 1
+        if completion.usage is not None:
+            self.tokens_saved += completion.usage.total_tokens
+        return completion
+
+    async def set(self, key: str, completion: ChatCompletion) -> None:
+        """Cache a completion."""
+        await self.store.set(key, completion.model_dump_json().encode())
+
+    async def close(self) -> None:
+        """Close the store."""
+        await self.store.close()
+
+    def stats(self) -> dict[str, int]:
+        """Return the hits, misses and tokens saved, and the counters of the store."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tokens_saved": self.tokens_saved,
+            **self.store.stats(),
+        }
+
+
+def create_completion_cache() -> CompletionCache | None:
+    """Create the completion cache configured in `settings`, if it is enabled."""
+    if not settings.completion_cache:
+        return None
+    if settings.completion_cache_url is not None:
+        store = RedisCompletionStore(
+            settings.completion_cache_url, settings.completion_cache_ttl
+        )
+    else:
+        store = MemoryCompletionStore(
+            settings.completion_cache_ttl, settings.completion_cache_max_entries
+        )
+    return CompletionCache(store)
@@ -60,6 +60,12 @@ class Settings(BaseSettings):
     # below is used.
     env: Literal["dev", "prod"] = "dev"
 
+    # The OpenAI secrets are refreshed every `secrets_ttl` seconds. In production,
+    # the secrets folder is also watched for rotated secrets if `secrets_watch` is
+    # set. The OpenAI client switches to new credentials without a restart.
+    secrets_ttl: float = 5 * 60
+    secrets_watch: bool = True
+
     API_V1_STR: Final[str] = "/api/v1"
     project_name: str = "drivel-server"
 
@@ -68,6 +74,139 @@ class Settings(BaseSettings):
 
     stt_speech_rate_interval: tuple[float, float] = (0.25, 4.0)
 
+    # Uploads to speech-to-text are rejected if they exceed these limits. The
+    # size limit matches the maximum file size accepted by Whisper.
+    stt_max_upload_bytes: int = 25 * 1024 * 1024
+    stt_max_duration_seconds: float = 600.0
+
+    # Optionally downmix, resample, trim silence from and re-encode uploads before
+    # transcription, in a pool of worker processes. Requires the `audio` extra.
+    # Larger uploads are sent as they are, so that they are not read into memory.
+    stt_preprocess: bool = False
+    stt_preprocess_workers: int = 1
+    stt_preprocess_max_bytes: int = 5 * 1024 * 1024
+    stt_silence_threshold_dbfs: float = -45.0
+    stt_silence_padding_seconds: float = 0.25
+
+    # Transcriptions are cached in memory up to this many bytes, keyed by the
+    # digest of the audio and the transcription parameters. If a directory is
+    # given, entries are also persisted there.
+    stt_cache_max_bytes: int = 8 * 1024 * 1024
+    stt_cache_dir: str | None = None
+
+    # Make a cheap request with each upstream client at startup to open its
+    # connections before the first user request.
+    warm_up_clients: bool = False
+
+    # Connection pool and timeouts (in seconds) of the HTTP client used for the
+    # OpenAI API. HTTP/2 multiplexes concurrent requests over fewer connections.
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry: float = 30.0
+    openai_connect_timeout: float = 5.0
+    openai_read_timeout: float = 60.0
+    openai_write_timeout: float = 30.0
+    openai_pool_timeout: float = 10.0
+    openai_http2: bool = False
+
+    # Adaptive limits of the concurrent calls to each upstream API. A limit grows
+    # while calls succeed and shrinks when the upstream rate limits, times out or
+    # slows down. Calls beyond the limit wait in a queue of bounded length for at
+    # most `upstream_max_wait_seconds`, and are otherwise shed with a 503.
+    upstream_initial_limit: int = 20
+    upstream_min_limit: int = 1
+    upstream_max_limit: int = 200
+    upstream_max_queue: int = 100
+    upstream_max_wait_seconds: float = 2.0
+
+    # Calls to the upstream APIs that fail transiently are retried with jittered
+    # exponential backoff. Retries are limited to a share of all calls, so that
+    # they cannot multiply the load on a struggling upstream.
+    upstream_max_attempts: int = 3
+    upstream_retry_budget_ratio: float = 0.1
+    upstream_retry_budget_capacity: float = 10.0
+    upstream_backoff_base_seconds: float = 0.1
+    upstream_backoff_max_seconds: float = 2.0
+
+    # The calls to an upstream API fail fast for `upstream_circuit_reset_seconds`
+    # after this many consecutive transient failures.
+    upstream_circuit_failure_threshold: int = 5
+    upstream_circuit_reset_seconds: float = 30.0
+
+    # Send a second request if a TTS or STT call takes longer than the 95th
+    # percentile of recent calls, and use whichever response comes first. STT
+    # uploads are then read into memory, to be sent twice at once.
+    tts_hedging: bool = False
+    stt_hedging: bool = False
+
+    # Call the upstream APIs at these addresses instead of the public endpoints,
+    # e.g. the local fakes used by the benchmarks. The TTS API is then called
+    # over an insecure gRPC channel without credentials.
+    openai_base_url: str | None = None
+    tts_api_endpoint: str | None = None
+
+    # Conversation sessions expire this many seconds after their last turn. At
+    # most `session_max_count` sessions are kept in memory, evicting the least
+    # recently used. If `session_store_url` is set, sessions are kept in Redis
+    # instead, which requires the `redis` extra.
+    session_ttl: float = 60 * 60
+    session_max_count: int = 10_000
+    session_store_url: str | None = None
+
+    # Conversations longer than `context_max_tokens` prompt tokens are trimmed to
+    # fit, keeping the system message and the latest turns. If `context_summarize`
+    # is set, the dropped turns are replaced by a summary of at most
+    # `context_summary_max_tokens` tokens written by `context_summary_model`. The
+    # latest `context_summary_cache_size` summaries are cached.
+    context_max_tokens: int | None = None
+    context_summarize: bool = False
+    context_summary_model: ChatModel = "gpt-3.5-turbo"
+    context_summary_max_tokens: int = 200
+    context_summary_cache_size: int = 1000
+
+    # Deterministic or cacheable chat completions are cached for
+    # `completion_cache_ttl` seconds if `completion_cache` is set. At most
+    # `completion_cache_max_entries` are kept in memory, evicting the least
+    # recently used. If `completion_cache_url` is set, they are kept in Redis
+    # instead, which requires the `redis` extra.
+    completion_cache: bool = False
+    completion_cache_ttl: float = 24 * 60 * 60
+    completion_cache_max_entries: int = 10_000
+    completion_cache_url: str | None = None
+
+    # Synthesized audio is cached in memory up to this many bytes. If a
+    # directory is given, entries are also persisted there.
+    tts_cache_max_bytes: int = 64 * 1024 * 1024
+    tts_cache_dir: str | None = None
+
+    # The voices of Google are listed at startup and every
+    # `tts_voices_refresh_seconds`, to validate voice parameters without calling
+    # Google and to serve `/voices`.
+    tts_voice_catalog: bool = True
+    tts_voices_refresh_seconds: float = 24 * 60 * 60
+
+    # Phrases pre-synthesized into the archive at `tts_phrase_bank_path` are
+    # served without calling Google, see `drivel_server.phrase_bank`. If a
+    # manifest is given and the archive does not exist, it is built at startup.
+    tts_phrase_bank_path: str | None = None
+    tts_phrase_bank_manifest: str | None = None
+    tts_phrase_bank_concurrency: int = 8
+
+    # The audio of chat replies synthesized in the background is kept for
+    # `tts_ticket_ttl` seconds, for at most `tts_ticket_max_count` replies.
+    tts_ticket_ttl: float = 60.0
+    tts_ticket_max_count: int = 1000
+
+    # Streamed synthesis splits the text into chunks of at most this many
+    # characters and synthesizes up to `tts_stream_concurrency` of them at once.
+    tts_stream_max_chunk_chars: int = 200
+    tts_stream_concurrency: int = 4
+
+    # Batches of text-to-speech requests have at most this many items, of which
+    # up to `tts_batch_concurrency` are synthesized at once.
+    tts_batch_max_items: int = 50
+    tts_batch_concurrency: int = 8
+
     @computed_field
     @property
     def openai_api_key_file(self) -> str:
@@ -0,0 +1,262 @@
+"""
+Token-budgeted trimming of conversation histories.
+
+The cost and latency of a chat completion grow with the number of prompt tokens,
+so a long conversation gets slower and more expensive with every turn, until it no
+longer fits the context of the model. A `ContextWindow` keeps the prompt within a
+budget of tokens: the system message is always kept, and so are as many of the
+latest turns as fit. The older turns are dropped, or replaced by a summary of them.
+
+Summaries are cached per conversation prefix. When a conversation grows, the
+summary of the longest prefix summarized before is extended with the turns dropped
+since, so each turn is summarized once instead of with every request.
+"""
+
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+import functools
+import hashlib
+import json
+import logging
+
+from openai.types.chat import ChatCompletionMessageParam
+import tiktoken
+
+from drivel_server.core.sessions import Messages
+from drivel_server.core.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+type Summarizer = Callable[[str | None, Messages], Awaitable[str]]
+type TokenCounter = Callable[[str, str], int]
+
+# Tokens added by the chat format around each message, and to prime the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+# Encoding of models unknown to the installed version of tiktoken
+DEFAULT_ENCODING = "o200k_base"
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+@functools.cache
+def get_encoding(model: str) -> tiktoken.Encoding:
+    """
+    Return the tokenizer of a model, loading it on first use.
+
+    Loading an encoding the first time downloads it, unless it is in the tiktoken
+    cache, so it should be done before serving requests.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+@functools.lru_cache(maxsize=4096)
+def count_text_tokens(model: str, text: str) -> int:
+    """Return the number of tokens of a text, caching the counts of recent texts."""
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def message_text(message: ChatCompletionMessageParam) -> str:
+    """Return the text content of a message, joining the text of its parts."""
+    content = message.get("content")
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    return "".join(part.get("text", "") for part in content)
+
+
+def _prefix_digests(system: ChatCompletionMessageParam, turns: Messages) -> list[str]:
+    """Return a digest of the conversation up to and including each turn."""
+    digest = hashlib.sha256(json.dumps(system, sort_keys=True).encode()).digest()
+    digests = []
+    for turn in turns:
+        message = json.dumps(turn, sort_keys=True).encode()
+        digest = hashlib.sha256(digest + message).digest()
+        digests.append(digest.hex())
+    return digests
+
+
+@dataclass
+class FittedContext:
+    """The messages to send and their number of tokens before and after trimming."""
+
+    messages: Messages
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def tokens_saved(self) -> int:
+        """The number of prompt tokens removed by trimming."""
+        return self.tokens_before - self.tokens_after
+
+
+class ContextWindow:
+    """
+    Fit conversations into a budget of prompt tokens.
+
+    Example:
+        ```python
+        window = ContextWindow(4000)
+        context = await window.fit(params.messages, params.model)
+        ```
+
+    Args:
+        max_tokens: The budget of prompt tokens, or None to send conversations as
+            they are.
+        summary_max_tokens: The number of tokens to reserve for the summary of the
+            dropped turns, when they are summarized.
+        max_summaries: The number of summaries to cache.
+        count_text: Returns the number of tokens of a text for a model.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int | None,
+        *,
+        summary_max_tokens: int = 200,
+        max_summaries: int = 1000,
+        count_text: TokenCounter = count_text_tokens,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.max_summaries = max_summaries
+        self.count_text = count_text
+        self.trimmed = 0
+        self.tokens_saved = 0
+        self.summaries = 0
+        self.summary_hits = 0
+        self.summary_failures = 0
+        self._summaries: OrderedDict[str, str] = OrderedDict()
+        self._flight = SingleFlight()
+
+    def count_message(self, message: ChatCompletionMessageParam, model: str) -> int:
+        """Return the number of prompt tokens taken by a message."""
+        return TOKENS_PER_MESSAGE + self.count_text(model, message_text(message))
+
+    def count_tokens(self, messages: Messages, model: str) -> int:
+        """Return the number of prompt tokens taken by a conversation."""
+        return TOKENS_PER_REPLY + sum(self.count_message(m, model) for m in messages)
+
+    async def fit(
+        self, messages: Messages, model: str, summarize: Summarizer | None = None
+    ) -> FittedContext:
+        """
+        Return the conversation trimmed to the budget.
+
+        The first message, which is the system message, and the last message are
+        always kept, even if they do not fit on their own.
+
+        Args:
+            messages: The conversation, starting with the system message.
+            model: The model the conversation is sent to, whose tokenizer is used.
+            summarize: Returns a summary of turns, extending a previous summary if
+                one is given. If not given, or if it fails, the older turns are
+                dropped without a summary.
+        """
+        if self.max_tokens is None:
+            return FittedContext(messages, 0, 0)
+        tokens = self.count_tokens(messages, model)
+        if tokens <= self.max_tokens:
+            return FittedContext(messages, tokens, tokens)
+
+        system, turns = messages[0], messages[1:]
+        reserve = self.summary_max_tokens + TOKENS_PER_MESSAGE if summarize else 0
+        split = self._split(system, turns, model, reserve)
+        fitted = [system, *turns[split:]]
+        if summarize is not None and split > 0:
+            summary = await self._summary(system, turns[:split], summarize)
+            if summary is not None:
+                message = {"role": "system", "content": SUMMARY_PREFIX + summary}
+                fitted.insert(1, message)
+
+        context = FittedContext(fitted, tokens, self.count_tokens(fitted, model))
+        self.trimmed += 1
+        self.tokens_saved += context.tokens_saved
+        return context
+
+    def _split(
+        self,
+        system: ChatCompletionMessageParam,
+        turns: Messages,
+        model: str,
+        reserve: int,
+    ) -> int:
+        """Return the index of the oldest turn kept, keeping the latest that fit."""
+        available = (
+            self.max_tokens
+            - self.count_tokens([system], model)
+            - reserve
+            - self.count_message(turns[-1], model)
+        )
+        split = len(turns) - 1
+        while split > 0:
+            cost = self.count_message(turns[split - 1], model)
+            if cost > available:
+                break
+            available -= cost
+            split -= 1
+        return split
+
+    async def _summary(
+        self,
+        system: ChatCompletionMessageParam,
+        dropped: Messages,
+        summarize: Summarizer,
+    ) -> str | None:
+        """
+        Return the summary of the dropped turns, from the cache if possible.
+
+        If a shorter prefix of the conversation was summarized before, only the
+        turns after it are summarized, together with its summary.
+        """
+        digests = _prefix_digests(system, dropped)
+        summarized, previous = self._cached_prefix(digests)
+        if summarized == len(dropped):
+            self.summary_hits += 1
+            return previous
+        try:
+            summary = await self._flight.do(
+                digests[-1], lambda: summarize(previous, dropped[summarized:])
+            )
+        except Exception:
+            logger.exception("Summarizing the conversation failed, dropping turns")
+            self.summary_failures += 1
+            return None
+        self.summaries += 1
+        self._store(digests[-1], summary)
+        return summary
+
+    def _cached_prefix(self, digests: list[str]) -> tuple[int, str | None]:
+        """Return the length and summary of the longest prefix with a summary."""
+        for length in range(len(digests), 0, -1):
+            summary = self._summaries.get(digests[length - 1])
+            if summary is not None:
+                self._summaries.move_to_end(digests[length - 1])
+                return length, summary
+        return 0, None
+
+    def _store(self, digest: str, summary: str) -> None:
+        self._summaries[digest] = summary
+        self._summaries.move_to_end(digest)
+        while len(self._summaries) > self.max_summaries:
+            self._summaries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of trimmed requests, saved tokens and summaries."""
+        return {
+            "trimmed": self.trimmed,
+            "tokens_saved": self.tokens_saved,
+            "summaries": self.summaries,
+            "summary_hits": self.summary_hits,
+            "summary_failures": self.summary_failures,
+            "cached_summaries": len(self._summaries),
+        }
+
+
+def format_transcript(messages: Messages) -> str:
+    """Return the messages as lines of text prefixed with the role of the author."""
+    return "\n".join(f"{m['role']}: {message_text(m)}" for m in messages)
@@ -0,0 +1,110 @@
+"""
+Classification of failed upstream calls and their translation to HTTP errors.
+
+Endpoints convert any exception raised while calling an upstream API with
+`to_http_exception`. Calls not made because an upstream is overloaded or down, and
+calls rejected by a rate limit of the upstream are answered with a 503 or 429 and
+a `Retry-After` header, so that clients back off instead of retrying at once.
+Other failures result in a 500.
+"""
+
+import math
+
+from fastapi import HTTPException, status
+from google.api_core import exceptions as google_exceptions
+import openai
+
+DEFAULT_RETRY_AFTER = 1
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when a call is not made because the upstream cannot take it."""
+
+    def __init__(self, message: str, upstream: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class OverloadedError(UpstreamUnavailableError):
+    """Raised when a call is shed instead of being sent to an overloaded upstream."""
+
+    def __init__(self, upstream: str, retry_after: float) -> None:
+        super().__init__(
+            f"Too many concurrent calls to {upstream}, retry later",
+            upstream,
+            retry_after,
+        )
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Raised when a call fails fast because its upstream is considered down."""
+
+    def __init__(self, upstream: str, retry_after: float) -> None:
+        super().__init__(
+            f"{upstream} is unavailable, retry later", upstream, retry_after
+        )
+
+
+def is_rate_limited(e: BaseException) -> bool:
+    """Return whether an upstream call failed because of a rate limit."""
+    return isinstance(
+        e,
+        openai.RateLimitError
+        | google_exceptions.TooManyRequests
+        | google_exceptions.ResourceExhausted,
+    )
+
+
+def is_overload(e: BaseException) -> bool:
+    """Return whether an upstream call failed in a way that signals overload."""
+    return is_rate_limited(e) or isinstance(
+        e, openai.APITimeoutError | google_exceptions.DeadlineExceeded
+    )
+
+
+def is_retryable(e: BaseException) -> bool:
+    """
+    Return whether an upstream call failed transiently and can be retried.
+
+    Connection errors, timeouts and server errors are retryable. Rate limits are
+    not, since they are handled by the concurrency limiter and reported to the
+    client, which can retry after the delay the upstream asked for.
+    """
+    return isinstance(
+        e,
+        openai.APIConnectionError
+        | openai.InternalServerError
+        | google_exceptions.ServiceUnavailable
+        | google_exceptions.DeadlineExceeded
+        | google_exceptions.InternalServerError,
+    )
+
+
+def _retry_after(e: BaseException) -> float:
+    """Return the delay before retrying requested by the upstream, if any."""
+    if isinstance(e, openai.APIStatusError):
+        try:
+            return float(e.response.headers.get("retry-after", DEFAULT_RETRY_AFTER))
+        except ValueError:
+            pass
+    return DEFAULT_RETRY_AFTER
+
+
+def to_http_exception(e: Exception) -> HTTPException:
+    """Return the HTTP exception to respond with when an upstream call failed."""
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, UpstreamUnavailableError):
+        status_code, retry_after = status.HTTP_503_SERVICE_UNAVAILABLE, e.retry_after
+    elif is_rate_limited(e):
+        status_code, retry_after = status.HTTP_429_TOO_MANY_REQUESTS, _retry_after(e)
+    else:
+        return HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+    return HTTPException(
+        status_code=status_code,
+        detail=str(e),
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+    )
@@ -0,0 +1,193 @@
+"""
+Adaptive concurrency limiting of upstream calls.
+
+Each upstream API gets an `AdaptiveLimiter`, which bounds the number of calls in
+flight. The limit is adjusted with additive increase and multiplicative decrease
+(AIMD): it grows slowly while calls succeed with the limit fully used, and shrinks
+when the upstream signals overload, either by rate limiting or timing out calls, or
+by getting markedly slower than its usual latency.
+
+Calls beyond the limit wait in a bounded queue. A call is shed with `OverloadedError`
+right away if the queue is full or the expected wait exceeds the maximum wait, and
+after the maximum wait otherwise, so that requests fail fast instead of piling up
+during spikes.
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+import time
+
+from drivel_server.core.errors import OverloadedError, is_overload
+
+# Weight of the latest sample in the moving average of the latency
+SMOOTHING = 0.1
+# Growth of the minimum latency per sample, so that it follows lasting changes
+MIN_LATENCY_DRIFT = 0.01
+
+
+class AdaptiveLimiter:
+    """
+    An AIMD concurrency limit with a bounded, deadline-aware wait queue.
+
+    Example:
+        ```python
+        limiter = AdaptiveLimiter("openai", initial_limit=20)
+        async with limiter.acquire():
+            await client.chat.completions.create(...)
+        ```
+
+    Args:
+        upstream: The name of the upstream API, used in error messages.
+        initial_limit: The number of concurrent calls allowed at first.
+        min_limit: The lower bound of the limit.
+        max_limit: The upper bound of the limit.
+        max_queue: The number of calls allowed to wait for a free slot.
+        max_wait: The longest time in seconds a call waits for a free slot.
+        latency_tolerance: How many times slower than the minimum latency the
+            average latency can get before the limit is decreased.
+        backoff: The factor the limit is multiplied with when it is decreased.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        upstream: str,
+        *,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        max_queue: int = 100,
+        max_wait: float = 2.0,
+        latency_tolerance: float = 2.0,
+        backoff: float = 0.75,
+    ) -> None:
+        self.upstream = upstream
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.in_flight = 0
+        self.shed = 0
+        self.decreases = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        self._latency: float | None = None
+        self._min_latency: float | None = None
+        self._last_decrease = 0.0
+
+    @asynccontextmanager
+    async def acquire(self, *, observe_latency: bool = True) -> AsyncIterator[None]:
+        """
+        Wait for a free slot and hold it while the block runs.
+
+        The duration and outcome of the block are used to adjust the limit. Blocks
+        whose duration does not reflect the latency of the upstream, such as the
+        whole of a streamed response, should not be observed.
+
+        Raises:
+            OverloadedError: If the call is shed instead of getting a slot.
+        """
+        await self._admit()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_overload(e):
+                self._decrease(start)
+            raise
+        else:
+            self._observe(time.monotonic() - start if observe_latency else None, start)
+        finally:
+            self._release()
+
+    def _expected_wait(self) -> float:
+        """Estimate how long a call added to the queue would wait for a slot."""
+        if self._latency is None:
+            return 0.0
+        return (len(self._waiters) + 1) * self._latency / int(self.limit)
+
+    async def _admit(self) -> None:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        wait = self._expected_wait()
+        if len(self._waiters) >= self.max_queue or wait > self.max_wait:
+            self.shed += 1
+            raise OverloadedError(self.upstream, retry_after=wait)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            async with asyncio.timeout(self.max_wait):
+                await waiter
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        except TimeoutError:
+            self._abandon(waiter)
+            self.shed += 1
+            raise OverloadedError(self.upstream, self._expected_wait()) from None
+
+    def _abandon(self, waiter: asyncio.Future[None]) -> None:
+        """Stop waiting for a slot, passing it on if it was just handed over."""
+        if waiter.done() and not waiter.cancelled():
+            self._release()
+        elif waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        # Hand free slots over to the waiters directly, so that new calls cannot
+        # overtake them
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _observe(self, latency: float | None, start: float) -> None:
+        """
+        Update the latency estimates with a successful call and adjust the limit.
+
+        Calls without a latency leave the estimates as they are.
+        """
+        if latency is not None:
+            if self._latency is None or self._min_latency is None:
+                self._latency = self._min_latency = latency
+                return
+            self._latency += SMOOTHING * (latency - self._latency)
+            self._min_latency = min(
+                latency, self._min_latency * (1 + MIN_LATENCY_DRIFT)
+            )
+            if self._latency > self.latency_tolerance * self._min_latency:
+                self._decrease(start)
+                return
+        if self.in_flight >= int(self.limit):
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+
+    def _decrease(self, start: float) -> None:
+        """
+        Decrease the limit multiplicatively.
+
+        Calls that started before the last decrease are ignored, so that a burst of
+        failures from the same overload only decreases the limit once.
+        """
+        if start < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.limit = max(self.limit * self.backoff, self.min_limit)
+        self.decreases += 1
+
+    def stats(self) -> dict[str, int]:
+        """Return the current limit and usage, and the number of shed calls."""
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "shed": self.shed,
+            "decreases": self.decreases,
+            "latency_ms": round((self._latency or 0) * 1000),
+        }
@@ -0,0 +1,200 @@
+"""
+Prometheus metrics.
+
+Requests are instrumented by `MetricsMiddleware`, which records latency, the
+number of requests in flight and payload sizes per route. Calls to the upstream
+APIs are instrumented with `track_upstream` around each call site, so that time
+spent in our server can be told apart from time spent waiting on OpenAI or
+Google. The counters in the `drivel_server.core.stats` registry are exported as
+gauges as well.
+
+All metrics are served in the Prometheus text format by `metrics_response`.
+"""
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+import time
+
+from openai.types import CompletionUsage
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from drivel_server.core.stats import collect_stats
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = tuple(4**i for i in range(4, 13))
+
+REQUEST_LATENCY = Histogram(
+    "drivel_request_duration_seconds",
+    "Time from receiving a request until its response is fully sent.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "drivel_requests_in_flight", "Number of requests currently being handled."
+)
+PAYLOAD_SIZE = Histogram(
+    "drivel_payload_bytes",
+    "Size of request and response bodies.",
+    ["route", "direction"],
+    buckets=SIZE_BUCKETS,
+)
+REQUEST_ERRORS = Counter(
+    "drivel_request_errors_total",
+    "Unhandled exceptions raised while handling requests.",
+    ["route", "type"],
+)
+UPSTREAM_LATENCY = Histogram(
+    "drivel_upstream_duration_seconds",
+    "Duration of calls to upstream APIs.",
+    ["upstream", "operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "drivel_upstream_in_flight",
+    "Number of calls to upstream APIs currently in flight.",
+    ["upstream", "operation"],
+)
+UPSTREAM_ERRORS = Counter(
+    "drivel_upstream_errors_total",
+    "Failed calls to upstream APIs.",
+    ["upstream", "operation", "type"],
+)
+TOKENS = Counter(
+    "drivel_openai_tokens_total",
+    "Tokens used by OpenAI chat completions.",
+    ["model", "kind"],
+)
+
+
+@contextmanager
+def track_upstream(upstream: str, operation: str) -> Iterator[None]:
+    """
+    Record the duration and outcome of an upstream call made inside the block.
+
+    Example:
+        ```python
+        with track_upstream("openai", "chat.completions.create"):
+            completion = await client.chat.completions.create(...)
+        ```
+    """
+    in_flight = UPSTREAM_IN_FLIGHT.labels(upstream, operation)
+    in_flight.inc()
+    outcome = "success"
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        outcome = "error"
+        UPSTREAM_ERRORS.labels(upstream, operation, type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(upstream, operation, outcome).observe(
+            time.perf_counter() - start
+        )
+        in_flight.dec()
+
+
+def record_token_usage(model: str, usage: CompletionUsage | None) -> None:
+    """Count the prompt and completion tokens of a chat completion."""
+    if usage is None:
+        return
+    TOKENS.labels(model, "prompt").inc(usage.prompt_tokens)
+    TOKENS.labels(model, "completion").inc(usage.completion_tokens)
+
+
+class _Exchange:
+    """Wrap the receive and send callables of a request to count its payload."""
+
+    def __init__(self, receive: Receive, send: Send) -> None:
+        self._receive = receive
+        self._send = send
+        self.status = 500
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    async def receive(self) -> Message:
+        message = await self._receive()
+        self.request_bytes += len(message.get("body", b""))
+        return message
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            self.response_bytes += len(message.get("body", b""))
+        await self._send(message)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, in-flight requests and payload sizes.
+
+    Requests are labelled with the path template of the matched route, such as
+    `/api/v1/chat-responses/`, to keep the number of label values bounded. Requests
+    not matching any route are labelled `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle an ASGI request, recording its metrics."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        exchange = _Exchange(receive, send)
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, exchange.receive, exchange.send)
+        except Exception as e:
+            REQUEST_ERRORS.labels(_route(scope), type(e).__name__).inc()
+            raise
+        finally:
+            route = _route(scope)
+            REQUEST_LATENCY.labels(
+                scope["method"], route, str(exchange.status)
+            ).observe(time.perf_counter() - start)
+            PAYLOAD_SIZE.labels(route, "request").observe(exchange.request_bytes)
+            PAYLOAD_SIZE.labels(route, "response").observe(exchange.response_bytes)
+            REQUESTS_IN_FLIGHT.dec()
+
+
+def _route(scope: Scope) -> str:
+    return getattr(scope.get("route"), "path", "unmatched")
+
+
+class StatsCollector(Collector):
+    """Export the counters of the stats registry as Prometheus gauges."""
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        """Yield one gauge with a sample per component and counter."""
+        gauge = GaugeMetricFamily(
+            "drivel_component_stat",
+            "Counters of caches and other components, see /api/v1/stats.",
+            labels=["component", "stat"],
+        )
+        for component, stats in collect_stats().items():
+            for stat, value in stats.items():
+                gauge.add_metric([component, stat], value)
+        yield gauge
+
+
+REGISTRY.register(StatsCollector())
+
+
+def metrics_response() -> Response:
+    """Return all metrics in the Prometheus text format."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,31 @@
+"""Helpers for building `multipart/mixed` response bodies."""
+
+import secrets
+
+
+def new_boundary() -> str:
+    """Return a random multipart boundary."""
+    return secrets.token_hex(16)
+
+
+def multipart_part(
+    boundary: str, content_type: str, body: bytes, headers: dict[str, str] | None = None
+) -> bytes:
+    """
+    Encode a single part of a `multipart/mixed` body, including its delimiter.
+
+    Every part carries a `Content-Length` header, so that clients can read binary
+    bodies without scanning them for the boundary.
+    """
+    lines = [
+        f"--{boundary}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        *(f"{name}: {value}" for name, value in (headers or {}).items()),
+    ]
+    return "\r\n".join(lines).encode() + b"\r\n\r\n" + body + b"\r\n"
+
+
+def multipart_end(boundary: str) -> bytes:
+    """Return the delimiter closing a `multipart/mixed` body."""
+    return f"--{boundary}--\r\n".encode()
@@ -0,0 +1,389 @@
+"""
+Retries, hedging and circuit breaking of upstream calls.
+
+Every call to an upstream API goes through its `Upstream`, which combines:
+
+- a `CircuitBreaker`, which fails calls fast while the upstream appears to be
+  down, instead of letting every request wait for a timeout;
+- retries of transiently failed calls with jittered exponential backoff, limited
+  by a `RetryBudget` so that retries cannot multiply the load on an upstream that
+  is struggling;
+- optional hedging of idempotent calls: if a call takes longer than the 95th
+  percentile of recent calls, a second one is sent and the first response wins;
+- the `AdaptiveLimiter` of the upstream and its metrics.
+
+Streamed responses are opened with `Upstream.stream`, and hold their slot of the
+limiter until they are exhausted or closed.
+
+Example:
+    ```python
+    response = await google_tts_upstream.call(
+        "synthesize_speech", lambda: client.synthesize_speech(...), hedge=True
+    )
+    ```
+"""
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import AsyncExitStack, contextmanager
+from enum import IntEnum
+import random
+import statistics
+import time
+from typing import Generic, Protocol, TypeVar
+
+from drivel_server.core.errors import CircuitOpenError, is_retryable
+from drivel_server.core.limiter import AdaptiveLimiter
+from drivel_server.core.metrics import track_upstream
+
+T = TypeVar("T")
+T_co = TypeVar("T_co", covariant=True)
+
+# Hedging starts once this many latencies of an operation have been observed
+MIN_LATENCY_SAMPLES = 20
+
+
+class RetryBudget:
+    """
+    A token bucket limiting retries to a share of all calls.
+
+    Every call deposits `ratio` tokens and every retry or hedged call withdraws
+    one, so that in the long run at most `ratio` extra calls are made per call. The
+    bucket starts full and holds at most `capacity` tokens, which allows short
+    bursts of retries when traffic is low.
+    """
+
+    def __init__(self, ratio: float = 0.1, capacity: float = 10.0) -> None:
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = capacity
+
+    def deposit(self) -> None:
+        """Record a call."""
+        self.tokens = min(self.tokens + self.ratio, self.capacity)
+
+    def withdraw(self) -> bool:
+        """Take a token for a retry, returning whether one was available."""
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitState(IntEnum):
+    """The state of a circuit breaker, ordered by severity for the stats."""
+
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitBreaker:
+    """
+    Fail calls fast after consecutive transient failures of an upstream.
+
+    After `failure_threshold` consecutive calls failed with a retryable error, the
+    circuit opens and calls fail with `CircuitOpenError` for `reset_timeout`
+    seconds. Then a single trial call is let through: if it succeeds, the circuit
+    closes, otherwise it opens again. Calls that fail with a non-retryable error,
+    such as an invalid request, show that the upstream is up and count as
+    successes.
+    """
+
+    def __init__(
+        self, upstream: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> None:
+        self.upstream = upstream
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opens = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """
+        Record the outcome of the call made in the block.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, before the block runs.
+        """
+        self._before_call()
+        try:
+            yield
+        except Exception as e:
+            if is_retryable(e):
+                self._on_failure()
+            else:
+                self._on_success()
+            raise
+        except BaseException:
+            # Cancelled, so the outcome is unknown
+            self._trial_in_flight = False
+            raise
+        else:
+            self._on_success()
+
+    def _before_call(self) -> None:
+        if self.state == CircuitState.OPEN:
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                raise CircuitOpenError(self.upstream, retry_after=remaining)
+            self.state = CircuitState.HALF_OPEN
+        if self.state == CircuitState.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError(self.upstream, retry_after=1)
+            self._trial_in_flight = True
+
+    def _on_success(self) -> None:
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def _on_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if (
+            self.state == CircuitState.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            self.state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+            self.opens += 1
+
+
+class LatencyTracker:
+    """Keep the latencies of the latest successful calls of an operation."""
+
+    def __init__(self, size: int = 200) -> None:
+        self._latencies: deque[float] = deque(maxlen=size)
+
+    def add(self, latency: float) -> None:
+        """Record the latency of a successful call."""
+        self._latencies.append(latency)
+
+    def p95(self) -> float | None:
+        """Return the 95th percentile, or None if too few calls were recorded."""
+        if len(self._latencies) < MIN_LATENCY_SAMPLES:
+            return None
+        return statistics.quantiles(self._latencies, n=20)[-1]
+
+
+class ClosableStream(Protocol[T_co]):
+    """The interface of streamed responses, such as `openai.AsyncStream`."""
+
+    def __aiter__(self) -> AsyncIterator[T_co]:
+        """Iterate over the items of the stream."""
+        ...
+
+    async def close(self) -> None:
+        """Close the stream."""
+        ...
+
+
+class HeldStream(Generic[T]):
+    """
+    A streamed response that holds the slot of its call until it ends.
+
+    The slot is released, and the outcome of the call recorded, once the stream is
+    exhausted, fails or is closed. A stream that is not consumed to the end must
+    be closed.
+    """
+
+    def __init__(self, stream: ClosableStream[T], resources: AsyncExitStack) -> None:
+        self._stream = stream
+        self._resources: AsyncExitStack | None = resources
+
+    async def __aiter__(self) -> AsyncIterator[T]:
+        """Iterate over the items, releasing the slot once the stream ends."""
+        try:
+            async for item in self._stream:
+                yield item
+        except BaseException as e:
+            await self._release(e)
+            raise
+        await self._release()
+
+    async def close(self) -> None:
+        """Close the stream and release its slot."""
+        try:
+            await self._stream.close()
+        finally:
+            await self._release()
+
+    async def _release(self, error: BaseException | None = None) -> None:
+        resources, self._resources = self._resources, None
+        if resources is None:
+            return
+        if error is None:
+            await resources.aclose()
+        else:
+            await resources.__aexit__(type(error), error, error.__traceback__)
+
+
+class Upstream:
+    """
+    Make calls to an upstream API with retries, hedging and circuit breaking.
+
+    Args:
+        name: The name of the upstream, used in metrics and errors.
+        limiter: The concurrency limiter of the upstream.
+        breaker: The circuit breaker of the upstream.
+        budget: The retry budget of the upstream.
+        max_attempts: The maximum number of attempts of a call, including the
+            first one.
+        backoff_base: The delay in seconds before the first retry. It doubles
+            with each retry, and the actual delay is drawn uniformly below it.
+        backoff_max: The upper bound of the delay before a retry.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        name: str,
+        *,
+        limiter: AdaptiveLimiter,
+        breaker: CircuitBreaker,
+        budget: RetryBudget,
+        max_attempts: int = 3,
+        backoff_base: float = 0.1,
+        backoff_max: float = 2.0,
+    ) -> None:
+        self.name = name
+        self.limiter = limiter
+        self.breaker = breaker
+        self.budget = budget
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies: dict[str, LatencyTracker] = {}
+
+    async def call(
+        self, operation: str, fn: Callable[[], Awaitable[T]], *, hedge: bool = False
+    ) -> T:
+        """
+        Call `fn`, retrying it if it fails transiently and the budget allows.
+
+        `fn` is called once per attempt and must return a new awaitable each time.
+        Only hedge calls that are idempotent and safe to make twice at once.
+        """
+        if hedge:
+            return await self._retry(lambda: self._hedged_attempt(operation, fn))
+        return await self._retry(lambda: self._attempt(operation, fn))
+
+    async def stream(
+        self, operation: str, fn: Callable[[], Awaitable[ClosableStream[T]]]
+    ) -> HeldStream[T]:
+        """
+        Open a streamed response with `fn`, retrying like `call`.
+
+        The slot of the call is held until the stream ends, so that streams count
+        against the limit for as long as the upstream is generating them. The
+        duration of the whole stream is recorded in the metrics, but not used to
+        adjust the limit or to hedge calls, since it depends on the length of the
+        response rather than on the latency of the upstream.
+        """
+        return await self._retry(lambda: self._open_stream(operation, fn))
+
+    async def _retry(self, attempt_fn: Callable[[], Awaitable[T]]) -> T:
+        self.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                return await attempt_fn()
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            await asyncio.sleep(self._backoff(attempt))
+            self.retries += 1
+            attempt += 1
+
+    def _should_retry(self, e: Exception, attempt: int) -> bool:
+        return (
+            is_retryable(e) and attempt < self.max_attempts and self.budget.withdraw()
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        """Return a delay with full jitter before the given retry."""
+        ceiling = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+        return random.uniform(0, ceiling)  # noqa: S311
+
+    async def _attempt(self, operation: str, fn: Callable[[], Awaitable[T]]) -> T:
+        async with self.limiter.acquire():
+            with self.breaker.guard(), track_upstream(self.name, operation):
+                start = time.monotonic()
+                result = await fn()
+        self._latencies.setdefault(operation, LatencyTracker()).add(
+            time.monotonic() - start
+        )
+        return result
+
+    async def _open_stream(
+        self, operation: str, fn: Callable[[], Awaitable[ClosableStream[T]]]
+    ) -> HeldStream[T]:
+        async with AsyncExitStack() as resources:
+            await resources.enter_async_context(
+                self.limiter.acquire(observe_latency=False)
+            )
+            resources.enter_context(self.breaker.guard())
+            resources.enter_context(track_upstream(self.name, operation))
+            stream = await fn()
+            return HeldStream(stream, resources.pop_all())
+
+    async def _hedged_attempt(
+        self, operation: str, fn: Callable[[], Awaitable[T]]
+    ) -> T:
+        """
+        Make an attempt, and a second one if the first is slower than usual.
+
+        The first attempt to succeed wins and the other one is cancelled. If both
+        fail, the error of the first is raised.
+        """
+        tracker = self._latencies.get(operation)
+        delay = tracker.p95() if tracker else None
+        first = asyncio.create_task(self._attempt(operation, fn))
+        tasks = [first]
+        try:
+            if delay is None:
+                return await first
+            await asyncio.wait(tasks, timeout=delay)
+            if first.done() or not self.budget.withdraw():
+                return await first
+            self.hedges += 1
+            tasks.append(asyncio.create_task(self._attempt(operation, fn)))
+            return await self._first_success(tasks)
+        finally:
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    # Retrieve the error of the losing attempt, if any
+                    task.exception()
+                task.cancel()
+
+    async def _first_success(self, tasks: list[asyncio.Task[T]]) -> T:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is not tasks[0]:
+                        self.hedge_wins += 1
+                    return task.result()
+        return tasks[0].result()
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of retries and hedges, and the state of the circuit."""
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retry_budget": int(self.budget.tokens),
+            "circuit_state": self.breaker.state,
+            "circuit_opens": self.breaker.opens,
+        }
@@ -0,0 +1,48 @@
+"""
+Fast JSON responses for objects parsed from upstream responses.
+
+FastAPI validates the value returned by an endpoint against its `response_model`
+before serializing it, which repeats the validation the OpenAI SDK has already
+done on the same data. Endpoints returning such trusted objects return
+`json_response` instead, which serializes them with pydantic-core in a single
+pass without validating them. Raw JSON bytes of an upstream response are sent
+untouched. The `response_model` of the route still documents the schema.
+
+See `benchmarks.serialization` for the cost of each path.
+"""
+
+from collections.abc import Mapping
+import functools
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+@functools.cache
+def _list_adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])
+
+
+def dump_json(content: BaseModel | list[BaseModel] | bytes) -> bytes:
+    """Serialize trusted models to JSON without validating them."""
+    if isinstance(content, bytes):
+        return content
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    if not content:
+        return b"[]"
+    return _list_adapter(type(content[0])).dump_json(content)
+
+
+def json_response(
+    content: BaseModel | list[BaseModel] | bytes,
+    headers: Mapping[str, str] | None = None,
+) -> Response:
+    """
+    Return a JSON response of trusted models, or of raw JSON bytes.
+
+    The models of a list are expected to be of the same type.
+    """
+    return Response(
+        content=dump_json(content), media_type="application/json", headers=headers
+    )
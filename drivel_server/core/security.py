@@ -1,36 +1,182 @@
-"""Security related things, such as secrets."""
+"""
+Security related things, such as secrets.
 
+The OpenAI secrets are served by `secrets_provider`. In a production environment,
+they are read from the files mounted in `settings.SECRETS_FOLDER`. In a development
+environment, they are fetched from Google Secret Manager, with a single client
+shared by all fetches.
+
+The secrets are cached and refreshed in the background every `settings.secrets_ttl`
+seconds. In production, the secrets folder is also watched, so that rotated
+secrets are picked up as soon as they are mounted. Functions subscribed to the
+provider are called with the new secrets whenever they change, e.g. to swap the
+credentials of a client without a restart.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import contextlib
+import logging
+from pathlib import Path
+import time
 from typing import Literal
 
+from google.cloud import secretmanager
+import watchfiles
+
 from drivel_server.core.config import settings
 
+logger = logging.getLogger(__name__)
 
-async def get_openai_secret(name: Literal["api_key", "org_id", "proj_id"]) -> str:
-    """Get the OpenAI secret value.
+type SecretName = Literal["api_key", "org_id", "proj_id"]
+type Secrets = dict[SecretName, str]
+type SecretsListener = Callable[[Secrets], Awaitable[None]]
 
-    In a production environment, it is read from a file. In a development
-    environment, it is fetched from Google Secret Manager.
-    """
+SECRET_NAMES: tuple[SecretName, ...] = ("api_key", "org_id", "proj_id")
+
+
+def _secret_location(name: SecretName) -> tuple[str, str]:
+    """Return the file and the Secret Manager name of a secret."""
     match name:
         case "api_key":
-            file = settings.openai_api_key_file
-            gcp_secret_name = settings.GCP_SECRET_NAME_OPENAI_KEY
+            return settings.openai_api_key_file, settings.GCP_SECRET_NAME_OPENAI_KEY
         case "org_id":
-            file = settings.openai_organization_id_file
-            gcp_secret_name = settings.GCP_SECRET_NAME_OPENAI_ORGANIZATION_ID
+            return (
+                settings.openai_organization_id_file,
+                settings.GCP_SECRET_NAME_OPENAI_ORGANIZATION_ID,
+            )
         case "proj_id":
-            file = settings.openai_project_id_file
-            gcp_secret_name = settings.GCP_SECRET_NAME_OPENAI_PROJECT_ID
-
-    match settings.env:
-        case "prod":
-            with open(file, "r") as f:
-                return f.read().strip()
-        case "dev":
-            from google.cloud import secretmanager
-
-            client = secretmanager.SecretManagerServiceAsyncClient()
-            secret = await client.access_secret_version(
-                name=f"projects/{settings.GCP_PROJECT_NUMBER}/secrets/{gcp_secret_name}/versions/latest"
+            return (
+                settings.openai_project_id_file,
+                settings.GCP_SECRET_NAME_OPENAI_PROJECT_ID,
             )
-            return secret.payload.data.decode()
+
+
+class SecretsProvider:
+    """
+    A cache of the OpenAI secrets, refreshed in the background.
+
+    Example:
+        ```python
+        api_key = await secrets_provider.get("api_key")
+        ```
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self.refreshes = 0
+        self.changes = 0
+        self.failures = 0
+        self._secrets: Secrets = {}
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._listeners: list[SecretsListener] = []
+        self._client: secretmanager.SecretManagerServiceAsyncClient | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._stop = asyncio.Event()
+
+    def subscribe(self, listener: SecretsListener) -> None:
+        """Call `listener` with all secrets whenever one of them changes."""
+        self._listeners.append(listener)
+
+    async def get(self, name: SecretName) -> str:
+        """
+        Return the value of a secret.
+
+        The secrets are fetched on first use, and again if they have expired
+        because the background refresh is not running or failing. If that fetch
+        fails too, the expired values are returned.
+        """
+        if not self._secrets or time.monotonic() >= self._expires_at:
+            try:
+                await self.refresh()
+            except Exception:
+                if not self._secrets:
+                    raise
+                logger.exception("Refreshing the secrets failed, using cached ones")
+        return self._secrets[name]
+
+    async def refresh(self) -> None:
+        """Fetch all secrets and notify the subscribers if any of them changed."""
+        async with self._lock:
+            values = await asyncio.gather(*map(self._fetch, SECRET_NAMES))
+            secrets = dict(zip(SECRET_NAMES, values, strict=True))
+            changed = bool(self._secrets) and secrets != self._secrets
+            self._secrets = secrets
+            self._expires_at = time.monotonic() + self.ttl
+            self.refreshes += 1
+        if changed:
+            self.changes += 1
+            logger.info("The OpenAI secrets changed")
+            for listener in self._listeners:
+                await listener(secrets)
+
+    async def _fetch(self, name: SecretName) -> str:
+        file, gcp_secret_name = _secret_location(name)
+        match settings.env:
+            case "prod":
+                return (await asyncio.to_thread(Path(file).read_text)).strip()
+            case "dev":
+                if self._client is None:
+                    self._client = secretmanager.SecretManagerServiceAsyncClient()
+                secret = await self._client.access_secret_version(
+                    name=f"projects/{settings.GCP_PROJECT_NUMBER}/secrets/{gcp_secret_name}/versions/latest"
+                )
+                return secret.payload.data.decode()
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl)
+            await self._try_refresh()
+
+    async def _watch(self) -> None:
+        async for _ in watchfiles.awatch(
+            settings.SECRETS_FOLDER, stop_event=self._stop
+        ):
+            await self._try_refresh()
+
+    async def _try_refresh(self) -> None:
+        try:
+            await self.refresh()
+        except Exception:
+            self.failures += 1
+            logger.exception("Refreshing the secrets failed")
+
+    def start(self) -> None:
+        """
+        Start refreshing the secrets in the background.
+
+        In production, the secrets folder is watched as well if
+        `settings.secrets_watch` is set.
+        """
+        self._stop.clear()
+        self._tasks.append(asyncio.create_task(self._refresh_periodically()))
+        if (
+            settings.env == "prod"
+            and settings.secrets_watch
+            and Path(settings.SECRETS_FOLDER).is_dir()
+        ):
+            self._tasks.append(asyncio.create_task(self._watch()))
+
+    async def close(self) -> None:
+        """Stop the background refresh and close the Secret Manager client."""
+        self._stop.set()
+        for task in self._tasks:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks.clear()
+        if self._client is not None:
+            await self._client.transport.close()
+            self._client = None
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of refreshes, changes of the secrets and failures."""
+        return {
+            "refreshes": self.refreshes,
+            "changes": self.changes,
+            "failures": self.failures,
+        }
+
+
+secrets_provider = SecretsProvider(settings.secrets_ttl)
@@ -0,0 +1,155 @@
+"""
+Storage of conversation sessions.
+
+A session is the message history of a conversation, kept on the server so that
+clients only need to send the new turn. Stores implement the `SessionStore`
+protocol. The default `MemorySessionStore` keeps sessions in the process with a
+time-to-live and least-recently-used eviction. `RedisSessionStore` keeps them in
+Redis, or any server speaking its protocol, so that they are shared between
+instances and survive restarts. It requires the `redis` extra.
+"""
+
+from collections import OrderedDict
+import json
+import time
+from typing import Protocol
+
+from openai.types.chat import ChatCompletionMessageParam
+
+from drivel_server.core.config import settings
+
+type Messages = list[ChatCompletionMessageParam]
+
+
+class SessionStore(Protocol):
+    """The interface of session stores."""
+
+    async def get(self, session_id: str) -> Messages | None:
+        """Return the messages of a session, or None if it does not exist."""
+        ...
+
+    async def set(self, session_id: str, messages: Messages) -> None:
+        """Store the messages of a session, resetting its time-to-live."""
+        ...
+
+    async def delete(self, session_id: str) -> None:
+        """Delete a session, if it exists."""
+        ...
+
+    async def close(self) -> None:
+        """Release the resources of the store."""
+        ...
+
+    def stats(self) -> dict[str, int]:
+        """Return counters describing the store."""
+        ...
+
+
+class MemorySessionStore:
+    """
+    An in-process session store with a time-to-live and LRU eviction.
+
+    Sessions expire `ttl` seconds after they were last stored. When more than
+    `max_sessions` sessions are stored, the least recently used ones are evicted.
+    Expired sessions are removed lazily, when they are looked up or reach the end
+    of the LRU order.
+    """
+
+    def __init__(self, ttl: float, max_sessions: int) -> None:
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.evictions = 0
+        self.expirations = 0
+        self._sessions: OrderedDict[str, tuple[float, Messages]] = OrderedDict()
+
+    async def get(self, session_id: str) -> Messages | None:
+        """Return the messages of a session, or None if it does not exist."""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        expires_at, messages = entry
+        if expires_at <= time.monotonic():
+            del self._sessions[session_id]
+            self.expirations += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        return messages
+
+    async def set(self, session_id: str, messages: Messages) -> None:
+        """Store the messages of a session, resetting its time-to-live."""
+        self._sessions[session_id] = (time.monotonic() + self.ttl, messages)
+        self._sessions.move_to_end(session_id)
+        self._evict()
+
+    async def delete(self, session_id: str) -> None:
+        """Delete a session, if it exists."""
+        self._sessions.pop(session_id, None)
+
+    async def close(self) -> None:
+        """Release the resources of the store, of which there are none."""
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            session_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at <= now:
+                self.expirations += 1
+            elif len(self._sessions) > self.max_sessions:
+                self.evictions += 1
+            else:
+                break
+            del self._sessions[session_id]
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of sessions, and of expired and evicted sessions."""
+        return {
+            "sessions": len(self._sessions),
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+        }
+
+
+class RedisSessionStore:
+    """
+    A session store in Redis, where each session is a JSON string with an expiry.
+
+    Eviction of least recently used sessions is left to the `maxmemory-policy` of
+    the Redis server.
+    """
+
+    def __init__(self, url: str, ttl: float, prefix: str = "drivel:session:") -> None:
+        from redis.asyncio import Redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = Redis.from_url(url)
+
+    async def get(self, session_id: str) -> Messages | None:
+        """Return the messages of a session, or None if it does not exist."""
+        value = await self._redis.get(self.prefix + session_id)
+        return None if value is None else json.loads(value)
+
+    async def set(self, session_id: str, messages: Messages) -> None:
+        """Store the messages of a session, resetting its time-to-live."""
+        await self._redis.set(
+            self.prefix + session_id, json.dumps(messages), px=int(self.ttl * 1000)
+        )
+
+    async def delete(self, session_id: str) -> None:
+        """Delete a session, if it exists."""
+        await self._redis.delete(self.prefix + session_id)
+
+    async def close(self) -> None:
+        """Close the connections to Redis."""
+        await self._redis.aclose()
+
+    def stats(self) -> dict[str, int]:
+        """Return no counters, since they are kept by Redis."""
+        return {}
+
+
+def create_session_store() -> SessionStore:
+    """Create the session store configured in `settings`."""
+    if settings.session_store_url is not None:
+        return RedisSessionStore(settings.session_store_url, settings.session_ttl)
+    return MemorySessionStore(settings.session_ttl, settings.session_max_count)
@@ -0,0 +1,61 @@
+"""
+Coalescing of identical concurrent calls.
+
+When several requests need the result of the same upstream call at the same
+time, only the first one makes the call and the others wait for its result.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time and share its result with all callers.
+
+    Callers wait on the shared call through `asyncio.shield`, so a caller that is
+    cancelled, e.g. because its client disconnected, stops waiting without
+    cancelling the call for the other callers. The call always runs to completion.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the result of `fn()`, sharing it with concurrent callers of `key`.
+
+        Args:
+            key: Identifies calls that are interchangeable. It should be a digest of
+                everything that influences the result.
+            fn: Makes the call. It is only invoked if no call for `key` is running.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of calls made and the number of calls coalesced."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
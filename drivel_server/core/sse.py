@@ -0,0 +1,15 @@
+"""Helpers for Server-Sent Events responses."""
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(data: str, event: str | None = None) -> str:
+    """
+    Format a single Server-Sent Event.
+
+    Multi-line data is split over several `data:` fields, as required by the
+    specification, so that clients reassemble it with the original newlines.
+    """
+    lines = [f"event: {event}"] if event is not None else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,22 @@
+"""
+Registry of runtime counters.
+
+Components such as caches register a function returning their counters under a
+name. All registered counters are served together by the `/stats` endpoint.
+"""
+
+from collections.abc import Callable
+
+type StatsProvider = Callable[[], dict[str, int]]
+
+_providers: dict[str, StatsProvider] = {}
+
+
+def register_stats(name: str, provider: StatsProvider) -> None:
+    """Register a function returning the counters of the component `name`."""
+    _providers[name] = provider
+
+
+def collect_stats() -> dict[str, dict[str, int]]:
+    """Return the current counters of all registered components."""
+    return {name: provider() for name, provider in _providers.items()}
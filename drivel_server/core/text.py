@@ -0,0 +1,71 @@
+"""Text segmentation used to pipeline speech synthesis."""
+
+import re
+
+# A sentence ends with terminal punctuation, optionally followed by closing quotes
+# or brackets, and then whitespace.
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'»”)\]]*\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+")
+
+
+def _split_at_sentence_ends(text: str) -> list[str]:
+    """Split text after each sentence end. The last piece may be incomplete."""
+    pieces = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        pieces.append(text[start : match.end()])
+        start = match.end()
+    pieces.append(text[start:])
+    return pieces
+
+
+def _split_long(sentence: str, max_chars: int) -> list[str]:
+    """Split a sentence longer than `max_chars` at clause boundaries."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+    parts: list[str] = []
+    current = ""
+    for clause in _CLAUSE_END.split(sentence):
+        if current and len(current) + len(clause) + 1 > max_chars:
+            parts.append(current)
+            current = clause
+        else:
+            current = f"{current} {clause}" if current else clause
+    parts.append(current)
+    return parts
+
+
+def split_sentences(text: str, max_chars: int = 200) -> list[str]:
+    """
+    Split text into sentences, and overly long sentences into clauses.
+
+    The pieces are stripped and empty pieces are dropped, so joining them with a
+    space gives back the original text up to whitespace.
+    """
+    return [
+        part
+        for sentence in _split_at_sentence_ends(text)
+        if sentence.strip()
+        for part in _split_long(sentence.strip(), max_chars)
+    ]
+
+
+def pop_sentences(buffer: str, max_chars: int = 200) -> tuple[list[str], str]:
+    """
+    Split the complete sentences off the front of a growing text buffer.
+
+    This is meant for text that arrives incrementally. The last sentence in the
+    buffer may still be incomplete, so it is returned as the remainder to be
+    prepended to the next piece of text.
+
+    Returns:
+        A tuple of the complete sentences and the remaining text.
+    """
+    *complete, rest = _split_at_sentence_ends(buffer)
+    sentences = [
+        part
+        for sentence in complete
+        if sentence.strip()
+        for part in _split_long(sentence.strip(), max_chars)
+    ]
+    return sentences, rest
@@ -0,0 +1,90 @@
+"""
+Tickets for results computed in the background.
+
+A ticket is handed to the client in place of a result that is still being
+computed, e.g. the audio of a chat reply, and exchanged for the result later.
+The client can then start the work before it asks for the result, instead of
+paying for a round trip first.
+"""
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+import secrets
+import time
+from typing import Any
+
+
+class TicketStore:
+    """
+    Background tasks identified by random tickets, with a time-to-live.
+
+    Tickets expire `ttl` seconds after they were created, and at most
+    `max_tickets` are kept, dropping the oldest ones. The task of a dropped
+    ticket is cancelled if it has not finished yet. Expired tickets are removed
+    lazily, when they are looked up or a ticket is created.
+    """
+
+    def __init__(self, ttl: float, max_tickets: int) -> None:
+        self.ttl = ttl
+        self.max_tickets = max_tickets
+        self.created = 0
+        self.redeemed = 0
+        self.expirations = 0
+        self.evictions = 0
+        self._tickets: OrderedDict[str, tuple[float, asyncio.Task]] = OrderedDict()
+
+    def create(self, fn: Callable[[], Awaitable[Any]]) -> str:
+        """Start `fn()` in the background and return the ticket for its result."""
+        ticket_id = secrets.token_urlsafe(16)
+        task = asyncio.ensure_future(fn())
+        # Mark the exception as retrieved in case the ticket is never redeemed
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._tickets[ticket_id] = (time.monotonic() + self.ttl, task)
+        self.created += 1
+        self._evict()
+        return ticket_id
+
+    def get(self, ticket_id: str) -> asyncio.Task | None:
+        """Return the task of a ticket, or None if it does not exist."""
+        entry = self._tickets.get(ticket_id)
+        if entry is None:
+            return None
+        expires_at, task = entry
+        if expires_at <= time.monotonic():
+            self._drop(ticket_id)
+            self.expirations += 1
+            return None
+        self.redeemed += 1
+        return task
+
+    def _drop(self, ticket_id: str) -> None:
+        _, task = self._tickets.pop(ticket_id)
+        task.cancel()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._tickets:
+            ticket_id, (expires_at, _) = next(iter(self._tickets.items()))
+            if expires_at <= now:
+                self.expirations += 1
+            elif len(self._tickets) > self.max_tickets:
+                self.evictions += 1
+            else:
+                break
+            self._drop(ticket_id)
+
+    def close(self) -> None:
+        """Drop all tickets, cancelling the unfinished tasks."""
+        while self._tickets:
+            self._drop(next(iter(self._tickets)))
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of tickets, and of created, redeemed and dropped ones."""
+        return {
+            "tickets": len(self._tickets),
+            "created": self.created,
+            "redeemed": self.redeemed,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,124 @@
+"""
+Handling of uploaded audio files.
+
+Uploads are parsed by Starlette into spooled temporary files, which stay in
+memory while small and roll over to disk when large. The helpers in this module
+work on those files in chunks, so that no full in-memory copy of an upload is
+ever made, and reject uploads that exceed the configured limits early.
+"""
+
+from collections.abc import Callable, Coroutine
+import hashlib
+from typing import Any, BinaryIO
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+import mutagen
+from starlette.types import Message, Receive
+
+from drivel_server.core.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def _limited_receive(receive: Receive, max_bytes: int) -> Receive:
+    """Wrap an ASGI receive callable to fail once the body exceeds `max_bytes`."""
+    received = 0
+
+    async def limited_receive() -> Message:
+        nonlocal received
+        message = await receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise upload_too_large(f"larger than {max_bytes} bytes")
+        return message
+
+    return limited_receive
+
+
+def upload_too_large(reason: str) -> HTTPException:
+    """Return the exception used to reject an upload exceeding a limit."""
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"The uploaded file is {reason}",
+    )
+
+
+def _content_length(request: Request) -> int:
+    """
+    Return the `Content-Length` of a request, or 0 if it has none.
+
+    Raises:
+        HTTPException: With a 400 if the header is not a non-negative integer.
+    """
+    try:
+        content_length = int(request.headers.get("content-length", "0"))
+    except ValueError:
+        content_length = -1
+    if content_length < 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Content-Length header",
+        )
+    return content_length
+
+
+class LimitedUploadRoute(APIRoute):
+    """
+    A route rejecting request bodies larger than `settings.stt_max_upload_bytes`.
+
+    FastAPI parses the whole request body before the endpoint and its dependencies
+    run, so the limit has to be enforced while the body is received. Requests with a
+    too large `Content-Length` are rejected before anything is read, and chunked
+    requests as soon as the limit is crossed.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        """Return the route handler, wrapped to limit the size of the request body."""
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            max_bytes = settings.stt_max_upload_bytes
+            if _content_length(request) > max_bytes:
+                raise upload_too_large(f"larger than {max_bytes} bytes")
+            request = Request(
+                request.scope, _limited_receive(request.receive, max_bytes)
+            )
+            return await handler(request)
+
+        return limited_handler
+
+
+def file_digest(file: BinaryIO) -> str:
+    """
+    Return the SHA-256 digest of a file, read in chunks from the start.
+
+    The file position is reset to the start afterwards, so that the file can be
+    read again, e.g. when it is sent upstream.
+    """
+    file.seek(0)
+    digest = hashlib.sha256()
+    while chunk := file.read(CHUNK_SIZE):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def audio_duration(file: BinaryIO) -> float | None:
+    """
+    Return the duration of an audio file in seconds, or None if it is unknown.
+
+    Only the headers of the file are parsed, not the audio data. The file position
+    is reset to the start afterwards.
+    """
+    file.seek(0)
+    try:
+        audio = mutagen.File(file)
+    except mutagen.MutagenError:
+        audio = None
+    finally:
+        file.seek(0)
+    if audio is None or audio.info is None:
+        return None
+    return audio.info.length
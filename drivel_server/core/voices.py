@@ -0,0 +1,144 @@
+"""
+Catalog of the voices of Google Cloud Text-to-Speech.
+
+The catalog is loaded from `list_voices` at startup and refreshed in the
+background every `settings.tts_voices_refresh_seconds`. It indexes the voices by
+name, language and gender, so that voice parameters are validated without calling
+Google, and the filtered listings served by `/voices` are encoded once per
+version of the catalog.
+
+Until the catalog has been loaded, e.g. because Google could not be reached,
+every voice is accepted and left for Google to validate.
+"""
+
+import asyncio
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+import contextlib
+import hashlib
+import logging
+
+from pydantic import TypeAdapter
+
+from drivel_server.core.config import settings
+from drivel_server.schemas.voices import Voice, VoiceGender
+
+logger = logging.getLogger(__name__)
+
+VoiceList = TypeAdapter(list[Voice])
+
+
+class VoiceCatalog:
+    """
+    An index of the available voices, refreshed in the background.
+
+    Example:
+        ```python
+        voice_catalog.check("es-ES-Standard-B", "es-ES")
+        ```
+    """
+
+    def __init__(self, refresh_interval: float) -> None:
+        self.refresh_interval = refresh_interval
+        self.refreshes = 0
+        self.failures = 0
+        self.loaded = False
+        self._by_name: dict[str, Voice] = {}
+        self._by_language: dict[str, list[Voice]] = {}
+        self._listings: dict[tuple[str | None, VoiceGender | None], bytes] = {}
+        self._version = ""
+        self._task: asyncio.Task | None = None
+
+    def update(self, voices: list[Voice]) -> None:
+        """Replace the voices of the catalog and rebuild the index."""
+        voices = sorted(voices, key=lambda voice: voice.name)
+        by_language = defaultdict(list)
+        for voice in voices:
+            for language_code in voice.language_codes:
+                by_language[language_code].append(voice)
+        self._by_name = {voice.name: voice for voice in voices}
+        self._by_language = dict(by_language)
+        self._listings = {}
+        self._version = hashlib.sha256(VoiceList.dump_json(voices)).hexdigest()
+        self.loaded = True
+
+    def check(self, name: str, language_code: str) -> None:
+        """
+        Check that a voice exists and supports the language.
+
+        Raises:
+            ValueError: If the catalog is loaded and does not have the voice for
+                the language.
+        """
+        if not self.loaded:
+            return
+        voice = self._by_name.get(name)
+        if voice is None:
+            raise ValueError(f"voice '{name}' does not exist")
+        if language_code not in voice.language_codes:
+            raise ValueError(f"voice '{name}' does not support '{language_code}'")
+
+    def voices(
+        self, language_code: str | None = None, gender: VoiceGender | None = None
+    ) -> list[Voice]:
+        """Return the voices, optionally only those of a language and gender."""
+        if language_code is None:
+            voices = list(self._by_name.values())
+        else:
+            voices = self._by_language.get(language_code, [])
+        return [voice for voice in voices if gender in (None, voice.ssml_gender)]
+
+    def listing(
+        self, language_code: str | None = None, gender: VoiceGender | None = None
+    ) -> tuple[bytes, str]:
+        """
+        Return the JSON encoded voices of `voices` and their ETag.
+
+        The encoding is cached until the catalog changes.
+        """
+        key = (language_code, gender)
+        if (body := self._listings.get(key)) is None:
+            body = VoiceList.dump_json(self.voices(language_code, gender))
+            self._listings[key] = body
+        digest = hashlib.sha256(f"{self._version}:{key}".encode()).hexdigest()
+        return body, f'"{digest}"'
+
+    async def refresh(self, fetch: Callable[[], Awaitable[list[Voice]]]) -> None:
+        """Load the voices, keeping the previous ones if that fails."""
+        try:
+            self.update(await fetch())
+            self.refreshes += 1
+        except Exception:
+            self.failures += 1
+            logger.exception("Loading the voice catalog failed")
+
+    async def _refresh_periodically(
+        self, fetch: Callable[[], Awaitable[list[Voice]]]
+    ) -> None:
+        while True:
+            await self.refresh(fetch)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self, fetch: Callable[[], Awaitable[list[Voice]]]) -> None:
+        """Load the voices with `fetch` in the background, and refresh them."""
+        self._task = asyncio.create_task(self._refresh_periodically(fetch))
+
+    async def close(self) -> None:
+        """Stop refreshing the voices."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of voices and languages, refreshes and failures."""
+        return {
+            "voices": len(self._by_name),
+            "languages": len(self._by_language),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+        }
+
+
+voice_catalog = VoiceCatalog(settings.tts_voices_refresh_seconds)
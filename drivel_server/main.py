@@ -1,9 +1,94 @@
 """Entrypoint."""
 
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+import logging
+
 from fastapi import FastAPI
+from fastapi.responses import Response
 
 from drivel_server.api.v1.api import api_router
+from drivel_server.api.v1.endpoints.chat_replies import completion_cache
+from drivel_server.api.v1.endpoints.sessions import session_store
+from drivel_server.api.v1.endpoints.tts import phrase_bank, speech_tickets
+from drivel_server.api.v1.endpoints.voices import fetch_voices
+from drivel_server.clients import GoogleCloudClientSingleton, OpenAIClientSingleton
+from drivel_server.core.audio import audio_preprocessor
 from drivel_server.core.config import settings
+from drivel_server.core.context import get_encoding
+from drivel_server.core.metrics import MetricsMiddleware, metrics_response
+from drivel_server.core.security import secrets_provider
+from drivel_server.core.voices import voice_catalog
+from drivel_server.phrase_bank import load_phrase_bank
+
+logger = logging.getLogger(__name__)
+
+CLIENTS = (OpenAIClientSingleton, GoogleCloudClientSingleton)
+
+
+async def warm_up_clients() -> None:
+    """Make a cheap request with each client, logging the failures."""
+    results = await asyncio.gather(
+        *(client.warm_up() for client in CLIENTS), return_exceptions=True
+    )
+    for client, result in zip(CLIENTS, results, strict=True):
+        if isinstance(result, Exception):
+            logger.warning("Warm-up of %s failed: %s", client.__name__, result)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """
+    Create the upstream clients at startup and close them at shutdown.
 
-app = FastAPI(title=settings.project_name)
+    At shutdown, the audio preprocessing workers are stopped, and the session store,
+    completion cache and phrase bank are closed and the pending speech tickets
+    dropped as well.
+
+    Creating the clients before the first request keeps secret fetching and channel
+    setup off the critical path of the first user. If enabled, a cheap request is
+    also made with each client to open its connections. Warm-up failures are logged
+    but do not prevent the application from starting.
+
+    If conversations are trimmed to a token budget, the tokenizer of the default
+    model is loaded at startup too, since that may require downloading it. The
+    phrase bank is mapped into memory, after being built if necessary.
+
+    The OpenAI secrets are refreshed in the background while the application runs,
+    and so is the voice catalog if enabled. The catalog is loaded in the
+    background too, so that startup does not wait for Google.
+    """
+    await asyncio.gather(*(client.get_instance() for client in CLIENTS))
+    secrets_provider.start()
+    if settings.tts_voice_catalog:
+        voice_catalog.start(fetch_voices)
+    if settings.context_max_tokens is not None:
+        await asyncio.to_thread(get_encoding, settings.gpt_model)
+    if settings.tts_phrase_bank_path is not None:
+        await load_phrase_bank(
+            settings.tts_phrase_bank_path, settings.tts_phrase_bank_manifest
+        )
+    if settings.warm_up_clients:
+        await warm_up_clients()
+    yield
+    await secrets_provider.close()
+    await voice_catalog.close()
+    await asyncio.gather(*(client.close() for client in CLIENTS))
+    audio_preprocessor.shutdown()
+    await session_store.close()
+    if completion_cache is not None:
+        await completion_cache.close()
+    phrase_bank.close()
+    speech_tickets.close()
+
+
+app = FastAPI(title=settings.project_name, lifespan=lifespan)
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Expose metrics in the Prometheus text format."""
+    return metrics_response()
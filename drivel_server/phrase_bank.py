@@ -0,0 +1,113 @@
+"""
+Pre-synthesized speech of frequent phrases.
+
+The greetings, prompts and feedback phrases of the bots are the same for every
+user. A phrase bank holds their audio, synthesized once in bulk from a manifest of
+`TTSParameters`, in an archive that the text-to-speech endpoints serve from a
+memory map without calling Google. See `PhraseManifest` for the manifest format.
+
+The archive is built offline with:
+
+    python -m drivel_server.phrase_bank phrases.json phrase-bank.bin
+
+and served by setting `tts_phrase_bank_path`. If `tts_phrase_bank_manifest` is set
+as well, a missing archive is built at startup instead.
+"""
+
+import argparse
+import asyncio
+import logging
+from pathlib import Path
+
+from google.cloud import texttospeech as tts
+
+from drivel_server.api.v1.endpoints.tts import phrase_bank, request_speech
+from drivel_server.clients import GoogleCloudClientSingleton
+from drivel_server.core.archive import write_archive
+from drivel_server.core.config import settings
+from drivel_server.schemas.tts import PhraseManifest, TTSParameters
+
+logger = logging.getLogger(__name__)
+
+
+async def build_phrase_bank(
+    manifest: PhraseManifest,
+    path: str | Path,
+    client: tts.TextToSpeechAsyncClient,
+    concurrency: int = 8,
+) -> int:
+    """
+    Synthesize the phrases of a manifest and write them to an archive.
+
+    At most `concurrency` phrases are synthesized at once. The phrases are
+    synthesized by Google directly, so that they do not fill `tts_cache`. Phrases
+    that fail to synthesize are logged and left out of the archive, to be
+    synthesized on demand. Returns the number of audio files in the archive.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def synthesize_phrase(params: TTSParameters) -> bytes:
+        async with semaphore:
+            return await request_speech(params, client)
+
+    requests = manifest.requests()
+    results = await asyncio.gather(
+        *map(synthesize_phrase, requests), return_exceptions=True
+    )
+    entries = {}
+    for params, result in zip(requests, results, strict=True):
+        if isinstance(result, Exception):
+            logger.warning("Synthesis of phrase %r failed: %s", params.text, result)
+        else:
+            entries[params.cache_key()] = result
+    await asyncio.to_thread(write_archive, path, entries)
+    return len(entries)
+
+
+def read_manifest(path: str | Path) -> PhraseManifest:
+    """Read a manifest from a JSON file."""
+    return PhraseManifest.model_validate_json(Path(path).read_bytes())
+
+
+async def load_phrase_bank(path: str, manifest_path: str | None = None) -> None:
+    """Serve the archive at `path`, building it first if it is missing."""
+    if manifest_path is not None and not Path(path).exists():
+        count = await build_phrase_bank(
+            read_manifest(manifest_path),
+            path,
+            await GoogleCloudClientSingleton.get_instance(),
+            settings.tts_phrase_bank_concurrency,
+        )
+        logger.info("Built a phrase bank of %d phrases at %s", count, path)
+    phrase_bank.open(path)
+
+
+async def _build(manifest_path: str, path: str, concurrency: int) -> None:
+    client = await GoogleCloudClientSingleton.get_instance()
+    try:
+        count = await build_phrase_bank(
+            read_manifest(manifest_path), path, client, concurrency
+        )
+    finally:
+        await GoogleCloudClientSingleton.close()
+    logger.info("Wrote %d phrases to %s", count, path)
+
+
+def main() -> None:
+    """Build a phrase bank archive from a manifest."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("manifest", help="JSON file with the phrases to synthesize")
+    parser.add_argument("output", help="path of the archive to write")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.tts_phrase_bank_concurrency,
+        help="number of phrases synthesized at once",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_build(args.manifest, args.output, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
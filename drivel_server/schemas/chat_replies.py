@@ -1,10 +1,14 @@
 """Schemas used by the chat-responses endpoint."""
 
+import hashlib
+import json
+
 from openai.types.chat import ChatCompletionMessageParam
 from openai.types.chat_model import ChatModel
-from pydantic import BaseModel, ValidationInfo, field_validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 
 from drivel_server.core.config import settings
+from drivel_server.schemas.tts import VoiceParameters
 
 
 class OpenAIParameters(BaseModel):
@@ -30,12 +34,32 @@ class OpenAIParameters(BaseModel):
     - **n**: How many chat completion choices to generate for each input message. Note
         that you will be charged based on the number of generated tokens across all
         of the choices. Keep `n` as `1` to minimize costs.
+
+    - **temperature**: What sampling temperature to use, between 0 and 2. Defaults to
+        the OpenAI default. With a temperature of 0 the completion is deterministic,
+        and identical concurrent requests share a single upstream call.
+
+    - **stream**: If set, the response is streamed back as Server-Sent Events with one
+        `chat.completion.chunk` object per event, terminated by a `[DONE]` event.
+
+    - **cacheable**: If set, the completion may be served from, and is stored in, the
+        completion cache even if the temperature is not 0, when the cache is enabled.
+        Deterministic completions are always cacheable. Not forwarded to OpenAI.
+
+    - **prefetch_speech**: If given, the MP3 audio of the first choice is synthesized
+        with this voice in the background as soon as the completion arrives. The
+        ticket for the audio is returned in the `X-Audio-Ticket` header. Ignored if
+        `stream` is set. Not forwarded to OpenAI.
     """
 
     messages: list[ChatCompletionMessageParam]
     model: ChatModel = settings.gpt_model
     max_tokens: int = 150
     n: int = 1
+    temperature: float | None = None
+    stream: bool = False
+    cacheable: bool = Field(default=False, exclude=True)
+    prefetch_speech: VoiceParameters | None = Field(default=None, exclude=True)
     model_config = {
         "json_schema_extra": {
             "examples": [
@@ -70,3 +94,20 @@ class OpenAIParameters(BaseModel):
             message.get("role") == "user" for message in v
         ), f"{info.field_name} must contain at least one user message"
         return v
+
+    @property
+    def is_deterministic(self) -> bool:
+        """Whether identical requests are expected to get identical completions."""
+        return self.temperature == 0 and not self.stream
+
+    @property
+    def is_cacheable(self) -> bool:
+        """Whether the completion may be served from the completion cache."""
+        return not self.stream and (self.temperature == 0 or self.cacheable)
+
+    def cache_key(self) -> str:
+        """Return a canonical digest of all parameters that influence the completion."""
+        payload = json.dumps(
+            self.model_dump(mode="json", exclude_none=True), sort_keys=True
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
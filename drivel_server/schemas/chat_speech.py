@@ -0,0 +1,49 @@
+"""Schemas used by the chat-speech endpoint."""
+
+from pydantic import Field, field_validator
+
+from drivel_server.schemas.chat_replies import OpenAIParameters
+from drivel_server.schemas.tts import VoiceParameters
+
+
+class ChatSpeechParameters(OpenAIParameters):
+    """
+    Parameters for generating a chat reply and reading it out loud in one request.
+
+    ### Fields:
+    - **voice**: The voice settings used to synthesize the reply. See
+        `VoiceParameters`.
+
+    The remaining fields are forwarded to the OpenAI API as described in
+    `OpenAIParameters`. The completion is always streamed, and only a single choice
+    can be generated. Since the reply is streamed together with its speech, it is
+    never cached and `cacheable` and `prefetch_speech` cannot be set.
+    """
+
+    voice: VoiceParameters = Field(default_factory=VoiceParameters)
+
+    @field_validator("n")
+    @classmethod
+    def n_must_be_one(cls, v: int) -> int:
+        """Validate that only one choice is requested."""
+        if v != 1:
+            raise ValueError("n must be 1")
+        return v
+
+    @field_validator("cacheable")
+    @classmethod
+    def cacheable_must_be_false(cls, v: bool) -> bool:
+        """Validate that caching is not requested, since the reply is streamed."""
+        if v:
+            raise ValueError("cacheable is not supported")
+        return v
+
+    @field_validator("prefetch_speech")
+    @classmethod
+    def prefetch_speech_must_be_none(
+        cls, v: VoiceParameters | None
+    ) -> VoiceParameters | None:
+        """Validate that no prefetch is requested, since the speech is streamed."""
+        if v is not None:
+            raise ValueError("prefetch_speech is not supported, use voice instead")
+        return v
@@ -0,0 +1,71 @@
+"""Schemas of the messages sent by clients of the conversations endpoint."""
+
+from typing import Annotated, Literal
+
+from openai.types.chat_model import ChatModel
+from pydantic import BaseModel, Field, TypeAdapter
+
+from drivel_server.core.config import settings
+from drivel_server.schemas.sessions import SessionTurnParameters
+from drivel_server.schemas.stt import STTParameters
+from drivel_server.schemas.tts import VoiceParameters
+
+
+class ConfigMessage(BaseModel):
+    """
+    Set the parameters of the following turns of the conversation.
+
+    ### Fields:
+    - **stt**: The parameters of the transcription of the user's speech.
+    - **voice**: The voice the replies are read out with.
+    - **model**, **max_tokens**, **temperature**: The parameters of the replies,
+        as described in `OpenAIParameters`.
+    """
+
+    type: Literal["config"]
+    stt: STTParameters = Field(default_factory=STTParameters)
+    voice: VoiceParameters = Field(default_factory=VoiceParameters)
+    model: ChatModel = settings.gpt_model
+    max_tokens: int = 150
+    temperature: float | None = None
+
+    def turn_parameters(self, content: str) -> SessionTurnParameters:
+        """Return the parameters of a turn starting with the given user message."""
+        return SessionTurnParameters(
+            content=content,
+            model=self.model,
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            stream=True,
+        )
+
+
+class AudioEndMessage(BaseModel):
+    """
+    Mark the end of the user's speech sent in binary messages since the last turn.
+
+    ### Fields:
+    - **filename**: A file name whose extension tells the format of the audio.
+    """
+
+    type: Literal["audio_end"]
+    filename: str = "audio.webm"
+
+
+class TextMessage(BaseModel):
+    """
+    Start a turn with a written user message instead of speech.
+
+    ### Fields:
+    - **content**: The user message.
+    """
+
+    type: Literal["text"]
+    content: str
+
+
+ClientMessage = TypeAdapter(
+    Annotated[
+        ConfigMessage | AudioEndMessage | TextMessage, Field(discriminator="type")
+    ]
+)
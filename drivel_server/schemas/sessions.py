@@ -0,0 +1,85 @@
+"""Schemas used by the sessions endpoint."""
+
+from openai.types.chat import ChatCompletionMessageParam, ChatCompletionUserMessageParam
+from openai.types.chat_model import ChatModel
+from pydantic import BaseModel, field_validator
+
+from drivel_server.core.config import settings
+from drivel_server.schemas.chat_replies import OpenAIParameters
+
+
+class SessionParameters(BaseModel):
+    """
+    Parameters for starting a conversation session.
+
+    ### Fields:
+    - **system_message**: The system message the conversation starts with, e.g.
+        instructions on the language and level to practice.
+    """
+
+    system_message: str
+
+    @field_validator("system_message")
+    @classmethod
+    def system_message_must_not_be_empty(cls, v: str) -> str:
+        """Validate that the system message is not empty."""
+        if not v.strip():
+            raise ValueError("system_message must not be empty")
+        return v
+
+
+class Session(BaseModel):
+    """A conversation session and its message history."""
+
+    session_id: str
+    messages: list[ChatCompletionMessageParam]
+
+
+class SessionTurnParameters(BaseModel):
+    """
+    Parameters for adding a user message to a session and generating a reply.
+
+    ### Fields:
+    - **content**: The new user message. The history of the conversation is kept
+        by the server and must not be sent.
+
+    The remaining fields are forwarded to the OpenAI API as described in
+    `OpenAIParameters`. Only a single choice is generated, since it is added to the
+    history.
+    """
+
+    content: str
+    model: ChatModel = settings.gpt_model
+    max_tokens: int = 150
+    temperature: float | None = None
+    stream: bool = False
+
+    @field_validator("content")
+    @classmethod
+    def content_must_not_be_empty(cls, v: str) -> str:
+        """Validate that the user message is not empty."""
+        if not v.strip():
+            raise ValueError("content must not be empty")
+        return v
+
+    def user_message(self) -> ChatCompletionUserMessageParam:
+        """Return the new user message."""
+        return {"role": "user", "content": self.content}
+
+    def to_openai_parameters(
+        self, history: list[ChatCompletionMessageParam]
+    ) -> OpenAIParameters:
+        """
+        Return the parameters of the completion of the history and the new message.
+
+        The history is not validated again, since it was validated as it was built,
+        so the work per turn does not grow with the length of the conversation.
+        """
+        return OpenAIParameters.model_construct(
+            messages=[*history, self.user_message()],
+            model=self.model,
+            max_tokens=self.max_tokens,
+            n=1,
+            temperature=self.temperature,
+            stream=self.stream,
+        )
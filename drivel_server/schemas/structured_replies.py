@@ -0,0 +1,93 @@
+"""Schemas used by the structured-responses endpoint."""
+
+from openai.types.shared_params import ResponseFormatJSONSchema
+from pydantic import BaseModel, ConfigDict, field_validator
+
+from drivel_server.core.context import message_text
+from drivel_server.schemas.chat_replies import OpenAIParameters
+
+INSTRUCTIONS = (
+    "Besides your reply, translate your reply to {language}, and correct the "
+    "mistakes of the last user message. The correction is the corrected user "
+    "message, or null if it has no mistakes."
+)
+
+
+class StructuredReply(BaseModel):
+    """
+    A reply together with its translation and a correction of the user message.
+
+    ### Fields:
+    - **reply**: The reply to the conversation.
+    - **translation**: The reply translated to the requested language.
+    - **correction**: The last user message with its mistakes corrected, or null if
+        it has none.
+    """
+
+    model_config = ConfigDict(extra="forbid")
+
+    reply: str
+    translation: str
+    correction: str | None
+
+
+RESPONSE_FORMAT: ResponseFormatJSONSchema = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "structured_reply",
+        "strict": True,
+        "schema": StructuredReply.model_json_schema(),
+    },
+}
+
+
+class StructuredReplyParameters(OpenAIParameters):
+    """
+    Parameters for generating a reply, its translation and a correction at once.
+
+    ### Fields:
+    - **translation_language**: The language to translate the reply to.
+    - **max_tokens**: The maximum number of tokens of the JSON object, which holds
+      three texts and their keys. Defaults to 1000, since a reply that is cut off
+      is not valid JSON.
+
+    The remaining fields are forwarded to the OpenAI API as described in
+    `OpenAIParameters`. The system message should describe the conversation as for
+    a plain reply, since instructions for the translation and correction are added
+    to it. Only a single choice is generated, and it cannot be streamed.
+    """
+
+    translation_language: str = "English"
+    max_tokens: int = 1000
+
+    @field_validator("n")
+    @classmethod
+    def n_must_be_one(cls, v: int) -> int:
+        """Validate that only one choice is requested."""
+        if v != 1:
+            raise ValueError("n must be 1")
+        return v
+
+    @field_validator("stream")
+    @classmethod
+    def stream_must_be_false(cls, v: bool) -> bool:
+        """Validate that the reply is not streamed."""
+        if v:
+            raise ValueError("stream is not supported")
+        return v
+
+    def with_instructions(self) -> "StructuredReplyParameters":
+        """Return the parameters with the instructions added to the system message."""
+        system, *turns = self.messages
+        instructions = INSTRUCTIONS.format(language=self.translation_language)
+        content = f"{message_text(system)}\n\n{instructions}"
+        return self.model_copy(
+            update={"messages": [{"role": "system", "content": content}, *turns]}
+        )
+
+    def to_openai_kwargs(self) -> dict:
+        """Return the arguments of the chat completion request."""
+        return {
+            **self.model_dump(exclude_none=True, exclude={"translation_language"}),
+            "response_format": RESPONSE_FORMAT,
+        }
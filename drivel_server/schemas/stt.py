@@ -1,5 +1,7 @@
 """Schemas used by the text-to-speech endpoint."""
 
+import hashlib
+
 from fastapi import APIRouter
 from pydantic import BaseModel
 
@@ -22,3 +24,8 @@ class STTParameters(BaseModel):
 
     model: str = settings.stt_model
     language: str = "es"
+
+    def cache_key(self, audio_digest: str) -> str:
+        """Return a digest identifying the transcription of the given audio."""
+        payload = f"{audio_digest}:{self.model}:{self.language}"
+        return hashlib.sha256(payload.encode()).hexdigest()
@@ -1,41 +1,45 @@
 """Schemas used by the text-to-speech endpoint."""
 
+import hashlib
+import json
 import re
-from typing import Self
+from typing import Literal, Self
+import unicodedata
 
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 from drivel_server.core.config import settings
+from drivel_server.core.voices import voice_catalog
 
+type AudioEncoding = Literal["MP3", "OGG_OPUS", "LINEAR16"]
 
-class TTSParameters(BaseModel):
+# Media types of the audio encodings. LINEAR16 audio is returned in a WAV container.
+AUDIO_MEDIA_TYPES: dict[AudioEncoding, str] = {
+    "MP3": "audio/mpeg",
+    "OGG_OPUS": "audio/ogg; codecs=opus",
+    "LINEAR16": "audio/wav",
+}
+
+
+class VoiceParameters(BaseModel):
     """
-    Represents the parameters for configuring a Text-to-Speech (TTS) request.
+    Represents the voice settings of a Text-to-Speech (TTS) request.
 
     ### Fields:
-    - **text**: The input text string to be converted into speech. This field
-        is required and must be provided by the user.
-
     - **language_code**: Specifies the BCP-47 language code that indicates the
         language of the input text and the accent of the synthesized speech.
 
     - **name**: The name of the voice model to be used for the TTS conversion.
         This field allows for customization of the voice model.
+
+    - **speaking_rate**: Speaking rate of the synthesized speech, where 1.0 is the
+        normal native speed of the voice. It is rounded to two decimals.
     """
 
-    text: str
     language_code: str = "es-ES"
     name: str = "es-ES-Standard-B"
     speaking_rate: float = 1.0
 
-    @field_validator("text")
-    @classmethod
-    def text_must_not_be_empty(cls, v: str) -> str:
-        """Validate that 'text' is not empty."""
-        if v == "":
-            raise ValueError("text must not be empty")
-        return v
-
     @field_validator("language_code")
     @classmethod
     def language_code_must_follow_pattern(cls, v: str) -> str:
@@ -50,14 +54,14 @@ class TTSParameters(BaseModel):
     @field_validator("speaking_rate")
     @classmethod
     def speaking_rate_must_be_in_range(cls, v: float) -> float:
-        """Validate that 'speaking_rate' is between 0.25 and 4."""
+        """Validate that 'speaking_rate' is between 0.25 and 4, and round it."""
         if not (
             settings.stt_speech_rate_interval[0]
             <= v
             <= settings.stt_speech_rate_interval[1]
         ):
             raise ValueError("speaking_rate must be between 0.25 and 4")
-        return v
+        return round(v, 2)
 
     @model_validator(mode="after")
     def voice_name_must_start_with_language_code(self) -> Self:
@@ -67,3 +71,118 @@ class TTSParameters(BaseModel):
             f" '{self.language_code}'"
         )
         return self
+
+    @model_validator(mode="after")
+    def voice_must_exist(self) -> Self:
+        """Validate the voice against the voice catalog, once it has been loaded."""
+        voice_catalog.check(self.name, self.language_code)
+        return self
+
+
+class TTSParameters(VoiceParameters):
+    """
+    Represents the parameters for configuring a Text-to-Speech (TTS) request.
+
+    ### Fields:
+    - **text**: The input text string to be converted into speech. This field
+        is required and must be provided by the user. It is NFC-normalized and
+        stripped of surrounding whitespace.
+
+    - **audio_encoding**: The encoding of the synthesized audio: `MP3`,
+        `OGG_OPUS`, which is much smaller at speech bitrates, or uncompressed
+        `LINEAR16` in a WAV container. If not given, it is negotiated from the
+        `Accept` header, defaulting to `MP3`.
+
+    - **sample_rate_hertz**: The sample rate of the synthesized audio. If not
+        given, the natural sample rate of the voice is used.
+
+    The voice settings are described in `VoiceParameters`.
+    """
+
+    text: str
+    audio_encoding: AudioEncoding | None = None
+    sample_rate_hertz: int | None = Field(default=None, ge=8000, le=48000)
+
+    @field_validator("text")
+    @classmethod
+    def text_must_not_be_empty(cls, v: str) -> str:
+        """Validate that 'text' is not empty or only whitespace, and normalize it."""
+        v = unicodedata.normalize("NFC", v).strip()
+        if not v:
+            raise ValueError("text must not be empty")
+        return v
+
+    @property
+    def encoding(self) -> AudioEncoding:
+        """The encoding of the synthesized audio."""
+        return self.audio_encoding or "MP3"
+
+    @property
+    def media_type(self) -> str:
+        """The media type of the synthesized audio."""
+        return AUDIO_MEDIA_TYPES[self.encoding]
+
+    def cache_key(self) -> str:
+        """
+        Return a digest identifying the audio this request synthesizes.
+
+        The text and speaking rate are normalized by the validators, so requests
+        differing only in unicode representation, surrounding whitespace or
+        insignificant decimals of the rate share the same key, and are
+        synthesized from the same values.
+        """
+        normalized = {
+            "text": self.text,
+            "language_code": self.language_code,
+            "name": self.name,
+            "speaking_rate": self.speaking_rate,
+            "audio_encoding": self.encoding,
+        }
+        # Only added when set, so that the keys of audio cached before the sample
+        # rate could be chosen stay valid
+        if self.sample_rate_hertz is not None:
+            normalized["sample_rate_hertz"] = self.sample_rate_hertz
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class TTSBatchParameters(BaseModel):
+    """
+    Represents a batch of Text-to-Speech (TTS) requests.
+
+    ### Fields:
+    - **items**: The texts to synthesize, with their voice and audio settings as
+        described in `TTSParameters`. Items without an `audio_encoding` are
+        synthesized as `MP3`. At most `settings.tts_batch_max_items` items are
+        accepted.
+    """
+
+    items: list[TTSParameters] = Field(
+        min_length=1, max_length=settings.tts_batch_max_items
+    )
+
+
+class PhraseManifest(BaseModel):
+    """
+    The phrases to pre-synthesize into a phrase bank.
+
+    ### Fields:
+    - **phrases**: The text and voice settings of each phrase, as in requests to
+        the text-to-speech endpoint.
+
+    - **audio_encodings**: The encodings to synthesize the phrases in, unless a
+        phrase sets its own.
+    """
+
+    phrases: list[TTSParameters]
+    audio_encodings: list[AudioEncoding] = ["MP3"]
+
+    def requests(self) -> list[TTSParameters]:
+        """Return the parameters of every audio to synthesize."""
+        return [
+            phrase
+            if phrase.audio_encoding is not None
+            else phrase.model_copy(update={"audio_encoding": encoding})
+            for phrase in self.phrases
+            for encoding in self.audio_encodings
+        ]
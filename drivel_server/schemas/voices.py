@@ -0,0 +1,28 @@
+"""Schemas used by the voices endpoint."""
+
+from typing import Literal
+
+from pydantic import BaseModel
+
+type VoiceGender = Literal["MALE", "FEMALE", "NEUTRAL", "SSML_VOICE_GENDER_UNSPECIFIED"]
+
+
+class Voice(BaseModel):
+    """
+    A voice of Google Cloud Text-to-Speech.
+
+    ### Fields:
+    - **name**: The name to select the voice with, see `VoiceParameters`.
+
+    - **language_codes**: The BCP-47 language codes the voice supports.
+
+    - **ssml_gender**: The gender of the voice.
+
+    - **natural_sample_rate_hertz**: The sample rate the voice is synthesized at
+        when no other is requested.
+    """
+
+    name: str
+    language_codes: list[str]
+    ssml_gender: VoiceGender
+    natural_sample_rate_hertz: int
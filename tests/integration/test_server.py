@@ -1,9 +1,16 @@
 """Test server endpoints."""
 
+from collections.abc import AsyncIterator
+
+from fastapi import WebSocketDisconnect
 from fastapi.testclient import TestClient
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+import pytest
+from pytest_mock import MockerFixture
 
 from drivel_server.core.config import settings
 from drivel_server.main import app
+from drivel_server.schemas.tts import TTSParameters
 
 HEADERS = {"accept": "application/json", "Content-Type": "application/json"}
 
@@ -13,3 +20,304 @@ def test_root() -> None:
         response = client.get(settings.API_V1_STR)
         assert response.status_code == 200
         assert response.json() == {"Hello": "World"}
+
+
+def test_tts_not_modified() -> None:
+    body = {"text": "Hola, ¿qué tal?"}
+    etag = f'"{TTSParameters(**body).cache_key()}"'
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/text-to-speech/",
+            json=body,
+            headers={**HEADERS, "If-None-Match": etag},
+        )
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+
+def test_tts_negotiates_encoding() -> None:
+    body = {"text": "Hola, ¿qué tal?"}
+    etag = f'"{TTSParameters(**body, audio_encoding="OGG_OPUS").cache_key()}"'
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/text-to-speech/",
+            json=body,
+            headers={"Accept": "audio/ogg", "If-None-Match": etag},
+        )
+        assert response.status_code == 304
+        assert response.headers["Vary"] == "Accept"
+
+
+def test_tts_stream_rejects_linear16() -> None:
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/text-to-speech/stream",
+            json={"text": "Hola", "audio_encoding": "LINEAR16"},
+        )
+        assert response.status_code == 422
+
+
+def test_tts_stream_rejects_blank_text() -> None:
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/text-to-speech/stream", json={"text": "   "}
+        )
+        assert response.status_code == 422
+
+
+def test_voices_not_modified() -> None:
+    with TestClient(app) as client:
+        url = f"{settings.API_V1_STR}/voices/"
+        response = client.get(url, params={"language_code": "es-ES"})
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        response = client.get(
+            url, params={"language_code": "es-ES"}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+
+
+def test_stats() -> None:
+    with TestClient(app) as client:
+        response = client.get(f"{settings.API_V1_STR}/stats")
+        assert response.status_code == 200
+        assert "misses" in response.json()["tts_cache"]
+
+
+def test_metrics() -> None:
+    with TestClient(app) as client:
+        client.get(settings.API_V1_STR)
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert 'drivel_request_duration_seconds_count{method="GET"' in response.text
+        assert 'drivel_component_stat{component="tts_cache"' in response.text
+
+
+def test_openapi_documents_the_fast_responses() -> None:
+    paths = app.openapi()["paths"]
+    chat = paths[f"{settings.API_V1_STR}/chat-responses/"]["post"]["responses"]["200"]
+    assert chat["content"]["application/json"]["schema"]["items"] == {
+        "$ref": "#/components/schemas/Choice"
+    }
+    stt = paths[f"{settings.API_V1_STR}/speech-to-text/"]["post"]["responses"]["200"]
+    assert stt["content"]["application/json"]["schema"] == {
+        "$ref": "#/components/schemas/Transcription"
+    }
+
+
+def test_stt_rejects_large_upload(mocker: MockerFixture) -> None:
+    mocker.patch.object(settings, "stt_max_upload_bytes", 100)
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/speech-to-text/",
+            files={"audio_file": ("audio.mp3", b"0" * 1000, "audio/mpeg")},
+        )
+        assert response.status_code == 413
+
+
+def test_stt_caches_transcriptions(mocker: MockerFixture) -> None:
+    call = mocker.patch(
+        "drivel_server.api.v1.endpoints.stt.openai_upstream.call",
+        return_value=mocker.Mock(content=b'{"text": "Hola"}'),
+    )
+    files = {"audio_file": ("audio.mp3", b"retried recording", "audio/mpeg")}
+    with TestClient(app) as client:
+        for _ in range(2):
+            response = client.post(
+                f"{settings.API_V1_STR}/speech-to-text/", files=files
+            )
+            assert response.json()["text"] == "Hola"
+    assert call.call_count == 1
+
+
+def test_stt_rejects_malformed_content_length() -> None:
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/speech-to-text/",
+            content=b"0",
+            headers={"Content-Length": "abc"},
+        )
+        assert response.status_code == 400
+
+
+def test_session_lifecycle() -> None:
+    with TestClient(app) as client:
+        url = f"{settings.API_V1_STR}/sessions/"
+        response = client.post(url, json={"system_message": "Habla en español."})
+        assert response.status_code == 201
+        session_id = response.json()["session_id"]
+        response = client.get(f"{url}{session_id}")
+        assert response.json()["messages"] == [
+            {"role": "system", "content": "Habla en español."}
+        ]
+        assert client.delete(f"{url}{session_id}").status_code == 204
+        assert client.get(f"{url}{session_id}").status_code == 404
+
+
+def test_structured_responses(mocker: MockerFixture, chat_default_input: dict) -> None:
+    content = '{"reply": "2", "translation": "två", "correction": null}'
+    completion = ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+        }
+    )
+    request = mocker.patch(
+        "drivel_server.api.v1.endpoints.structured_replies.request_chat_completion",
+        return_value=completion,
+    )
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/structured-responses/",
+            json={**chat_default_input, "translation_language": "Swedish"},
+            headers=HEADERS,
+        )
+    assert response.status_code == 200
+    assert response.json() == {"reply": "2", "translation": "två", "correction": None}
+    assert request.call_args.kwargs["response_format"]["type"] == "json_schema"
+    assert request.call_args.kwargs["max_tokens"] == 1000
+
+
+def test_structured_responses_reject_truncated_reply(
+    mocker: MockerFixture, chat_default_input: dict
+) -> None:
+    completion = ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "length",
+                    "message": {"role": "assistant", "content": '{"reply": "2", "tr'},
+                }
+            ],
+        }
+    )
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.structured_replies.request_chat_completion",
+        return_value=completion,
+    )
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/structured-responses/",
+            json=chat_default_input,
+            headers=HEADERS,
+        )
+    assert response.status_code == 502
+    assert "truncated" in response.json()["detail"]
+
+
+def test_chat_reply_speech_is_prefetched(
+    mocker: MockerFixture, chat_default_input: dict
+) -> None:
+    completion = ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "Dos."},
+                }
+            ],
+        }
+    )
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.chat_replies.create_chat_completion",
+        return_value=completion,
+    )
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.tts.synthesize",
+        side_effect=lambda params, _: params.text.encode(),
+    )
+    with TestClient(app) as client:
+        response = client.post(
+            f"{settings.API_V1_STR}/chat-responses/",
+            json={**chat_default_input, "prefetch_speech": {}},
+            headers=HEADERS,
+        )
+        ticket_id = response.headers["X-Audio-Ticket"]
+        response = client.get(
+            f"{settings.API_V1_STR}/text-to-speech/tickets/{ticket_id}"
+        )
+        assert response.content == b"Dos."
+        assert response.headers["content-type"] == "audio/mpeg"
+        response = client.get(f"{settings.API_V1_STR}/text-to-speech/tickets/unknown")
+        assert response.status_code == 404
+
+
+class FakeChatStream:
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        """Yield one completion chunk per delta."""
+        for delta in ["Hola. ", "¿Qué tal?"]:
+            yield ChatCompletionChunk.model_validate(
+                {
+                    "id": "chatcmpl-1",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "gpt-4o",
+                    "choices": [{"index": 0, "delta": {"content": delta}}],
+                }
+            )
+
+    async def close(self) -> None:
+        pass
+
+
+def test_conversation_text_turn(mocker: MockerFixture) -> None:
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.conversations.create_chat_completion",
+        return_value=FakeChatStream(),
+    )
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.chat_speech.synthesize",
+        side_effect=lambda params, _: params.text.encode(),
+    )
+    mocker.patch("drivel_server.api.v1.endpoints.conversations.HeldStream", object)
+    with TestClient(app) as client:
+        url = f"{settings.API_V1_STR}/sessions/"
+        session_id = client.post(url, json={"system_message": "Habla."}).json()[
+            "session_id"
+        ]
+        ws_url = f"{settings.API_V1_STR}/conversations/{session_id}"
+        with client.websocket_connect(ws_url) as websocket:
+            websocket.send_json({"type": "text", "content": "Hola"})
+            events = []
+            while (event := websocket.receive_json())["type"] != "done":
+                events.append(event)
+                if event["type"] == "audio":
+                    events.append(websocket.receive_bytes())
+        assert events == [
+            {"type": "reply", "delta": "Hola. "},
+            {"type": "reply", "delta": "¿Qué tal?"},
+            {"type": "audio", "index": 0},
+            b"Hola.",
+            {"type": "audio", "index": 1},
+            "¿Qué tal?".encode(),
+        ]
+        messages = client.get(f"{url}{session_id}").json()["messages"]
+        assert messages[-1] == {"role": "assistant", "content": "Hola. ¿Qué tal?"}
+
+
+def test_conversation_unknown_session() -> None:
+    url = f"{settings.API_V1_STR}/conversations/unknown"
+    with TestClient(app) as client, client.websocket_connect(url) as websocket:
+        with pytest.raises(WebSocketDisconnect) as e:
+            websocket.receive_json()
+        assert e.value.code == 1008
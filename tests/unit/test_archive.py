@@ -0,0 +1,44 @@
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from drivel_server.core.archive import (
+    Archive,
+    ArchiveCache,
+    ArchiveError,
+    write_archive,
+)
+
+
+def key(value: bytes) -> str:
+    return hashlib.sha256(value).hexdigest()
+
+
+def test_archive_round_trip(tmp_path: Path) -> None:
+    entries = {key(value): value for value in (b"a", b"bb", b"", b"dddd")}
+    write_archive(tmp_path / "archive", entries)
+    archive = Archive(tmp_path / "archive")
+    assert len(archive) == 4
+    for k, value in entries.items():
+        assert archive.get(k) == value
+    assert archive.get(key(b"missing")) is None
+    assert archive.get("not hex") is None
+    archive.close()
+
+
+def test_invalid_archive_is_rejected(tmp_path: Path) -> None:
+    (tmp_path / "archive").write_bytes(b"not an archive at all")
+    with pytest.raises(ArchiveError):
+        Archive(tmp_path / "archive")
+
+
+def test_archive_cache_counts_hits(tmp_path: Path) -> None:
+    cache = ArchiveCache()
+    assert cache.get(key(b"a")) is None
+    write_archive(tmp_path / "archive", {key(b"a"): b"a"})
+    cache.open(tmp_path / "archive")
+    assert cache.get(key(b"a")) == b"a"
+    assert cache.get(key(b"b")) is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+    cache.close()
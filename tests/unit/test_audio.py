@@ -0,0 +1,70 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+from pathlib import Path
+
+import av
+import numpy as np
+from pytest_mock import MockerFixture
+
+from drivel_server.core.audio import (
+    SAMPLE_RATE,
+    AudioPreprocessor,
+    PreprocessedAudio,
+    _trim_silence,
+    preprocess_audio,
+)
+
+AUDIO_PATH = (
+    Path(__file__).parents[1] / "data" / "audio" / "me_gusta_aprender_idiomas.mp3"
+)
+
+
+def test_trim_silence_keeps_padded_voiced_part() -> None:
+    silence = np.zeros(SAMPLE_RATE, dtype=np.int16)
+    tone = (10_000 * np.sin(np.arange(SAMPLE_RATE) / 5)).astype(np.int16)
+    samples = np.concatenate([silence, tone, silence])
+    trimmed = _trim_silence(samples, threshold_dbfs=-45, padding_seconds=0.1)
+    assert len(trimmed) == int(1.2 * SAMPLE_RATE)
+
+
+def test_trim_silence_keeps_all_silent_audio() -> None:
+    samples = np.zeros(SAMPLE_RATE, dtype=np.int16)
+    assert len(_trim_silence(samples, threshold_dbfs=-45, padding_seconds=0.1)) == (
+        SAMPLE_RATE
+    )
+
+
+def test_preprocess_audio_outputs_mono_16khz_opus() -> None:
+    data = AUDIO_PATH.read_bytes()
+    result = preprocess_audio(data, threshold_dbfs=-45, padding_seconds=0.25)
+    assert result.original_bytes == len(data)
+    assert 0 < result.seconds <= result.original_seconds
+    with av.open(io.BytesIO(result.data)) as container:
+        stream = container.streams.audio[0]
+        assert stream.codec_context.name == "opus"
+        assert stream.codec_context.channels == 1
+
+
+def test_large_uploads_are_not_preprocessed(mocker: MockerFixture) -> None:
+    mocker.patch("drivel_server.core.audio.settings.stt_preprocess_max_bytes", 3)
+    preprocessor = AudioPreprocessor()
+    file = io.BytesIO(b"abcd")
+    assert asyncio.run(preprocessor.process(file)) is None
+    assert file.tell() == 0
+    assert preprocessor.stats()["skipped"] == 1
+
+
+def test_original_upload_is_kept_if_it_is_smaller(mocker: MockerFixture) -> None:
+    mocker.patch(
+        "drivel_server.core.audio.preprocess_audio",
+        return_value=PreprocessedAudio(b"opus-data", 4, 1.0, 1.0),
+    )
+    preprocessor = AudioPreprocessor()
+    preprocessor._executor = ThreadPoolExecutor(1)  # type: ignore[assignment]
+    try:
+        assert asyncio.run(preprocessor.process(io.BytesIO(b"abcd"))) is None
+    finally:
+        preprocessor.shutdown()
+    assert preprocessor.stats()["not_smaller"] == 1
+    assert preprocessor.stats()["bytes_saved"] == 0
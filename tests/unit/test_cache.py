@@ -0,0 +1,68 @@
+import asyncio
+from pathlib import Path
+
+from drivel_server.core.cache import LRUCache, TieredCache, etag_matches
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    cache = LRUCache(max_bytes=10)
+    cache.set("a", b"aaaa")
+    cache.set("b", b"bbbb")
+    cache.get("a")
+    cache.set("c", b"cccc")
+    assert "a" in cache
+    assert "b" not in cache
+    assert cache.size_bytes == 8
+    assert cache.evictions == 1
+
+
+def test_lru_cache_skips_values_larger_than_budget() -> None:
+    cache = LRUCache(max_bytes=3)
+    cache.set("a", b"aaaa")
+    assert len(cache) == 0
+    assert cache.size_bytes == 0
+
+
+def test_lru_cache_replaces_existing_key() -> None:
+    cache = LRUCache(max_bytes=10)
+    cache.set("a", b"aaaa")
+    cache.set("a", b"aa")
+    assert cache.get("a") == b"aa"
+    assert cache.size_bytes == 2
+
+
+def test_tiered_cache_counts_hits_and_misses() -> None:
+    cache = TieredCache(max_bytes=10)
+
+    async def run() -> None:
+        assert await cache.get("a") is None
+        await cache.set("a", b"audio")
+        assert await cache.get("a") == b"audio"
+
+    asyncio.run(run())
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["size_bytes"] == 5
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path: Path) -> None:
+    async def run() -> TieredCache:
+        await TieredCache(max_bytes=10, directory=tmp_path).set("abcd", b"audio")
+        cache = TieredCache(max_bytes=10, directory=tmp_path)
+        assert await cache.get("abcd") == b"audio"
+        assert await cache.get("abcd") == b"audio"
+        return cache
+
+    cache = asyncio.run(run())
+    assert (tmp_path / "ab" / "abcd").read_bytes() == b"audio"
+    assert cache.disk_hits == 1
+    assert cache.memory_hits == 1
+
+
+def test_etag_matches() -> None:
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches(None, '"b"')
@@ -0,0 +1,93 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+from openai.types.chat import ChatCompletionChunk
+from pydantic import ValidationError
+import pytest
+from pytest_mock import MockerFixture
+
+from drivel_server.api.v1.endpoints.chat_speech import (
+    ChatSpeechPipeline,
+    SentenceAudio,
+    encode_multipart,
+)
+from drivel_server.schemas.chat_speech import ChatSpeechParameters
+from drivel_server.schemas.tts import TTSParameters, VoiceParameters
+
+
+class FakeStream:
+    def __init__(self, deltas: list[str]) -> None:
+        self.deltas = deltas
+        self.closed = False
+
+    async def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        """Yield one completion chunk per delta."""
+        for delta in self.deltas:
+            yield ChatCompletionChunk.model_validate(
+                {
+                    "id": "chatcmpl-1",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "gpt-4o",
+                    "choices": [{"index": 0, "delta": {"content": delta}}],
+                }
+            )
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+async def fake_synthesize(params: TTSParameters, _: object) -> bytes:
+    return f"<{params.text}>".encode()
+
+
+def test_chat_speech_pipeline_interleaves_text_and_audio(mocker: MockerFixture) -> None:
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.chat_speech.synthesize", fake_synthesize
+    )
+    stream = FakeStream(["Hola. ", "¿Qué", " tal?"])
+    pipeline = ChatSpeechPipeline(stream, VoiceParameters(), None)  # type: ignore[arg-type]
+
+    async def collect() -> bytes:
+        return b"".join([part async for part in encode_multipart(pipeline, "b")])
+
+    body = asyncio.run(collect())
+    assert body.endswith(b"--b--\r\n")
+    assert body.count(b"Content-Type: text/plain") == 3
+    assert body.count(b"Content-Type: audio/mpeg") == 2
+    assert b"X-Sentence-Index: 0\r\n\r\n<Hola.>" in body
+    assert b"X-Sentence-Index: 1\r\n\r\n<\xc2\xbfQu\xc3\xa9 tal?>" in body
+    assert stream.closed
+
+
+def test_chat_speech_pipeline_splits_a_long_last_sentence(
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.chat_speech.synthesize", fake_synthesize
+    )
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.chat_speech.settings.tts_stream_max_chunk_chars",
+        12,
+    )
+    stream = FakeStream(["Hola, ¿qué tal, ", "amigo mío"])
+    pipeline = ChatSpeechPipeline(stream, VoiceParameters(), None)  # type: ignore[arg-type]
+
+    async def collect() -> list[bytes]:
+        return [
+            event.audio async for event in pipeline if isinstance(event, SentenceAudio)
+        ]
+
+    assert asyncio.run(collect()) == [
+        "<Hola,>".encode(),
+        "<¿qué tal,>".encode(),
+        "<amigo mío>".encode(),
+    ]
+
+
+@pytest.mark.parametrize(
+    "field", [{"cacheable": True}, {"prefetch_speech": {"name": "es-ES-Standard-B"}}]
+)
+def test_chat_speech_rejects_unsupported_fields(field: dict) -> None:
+    with pytest.raises(ValidationError):
+        ChatSpeechParameters(messages=[{"role": "user", "content": "Hola"}], **field)
@@ -0,0 +1,56 @@
+import asyncio
+import contextlib
+
+import httpx
+from pytest_mock import MockerFixture
+
+from drivel_server.clients import GoogleCloudClientSingleton, OpenAIClientSingleton
+from drivel_server.core.config import settings
+
+
+def test_existing_clients_are_returned_without_the_lock(mocker: MockerFixture) -> None:
+    async def run() -> None:
+        for singleton in (OpenAIClientSingleton, GoogleCloudClientSingleton):
+            client = object()
+            lock = asyncio.Lock()
+            mocker.patch.object(singleton, "_instance", client)
+            mocker.patch.object(singleton, "_lock", lock)
+            async with lock:
+                instance = await asyncio.wait_for(singleton.get_instance(), 1)
+            assert instance is client
+
+    asyncio.run(run())
+
+
+async def _serve_empty_responses(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    with contextlib.suppress(asyncio.IncompleteReadError):
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+
+
+def test_pool_stats_read_the_pool_of_httpx(mocker: MockerFixture) -> None:
+    # The stats read internals of httpx and httpcore, which may change in any
+    # release, so this checks them against the locked versions
+    async def run() -> dict[str, int]:
+        server = await asyncio.start_server(_serve_empty_responses, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server, httpx.AsyncClient() as client:
+            mocker.patch.object(OpenAIClientSingleton, "_http_client", client)
+            await client.get(f"http://127.0.0.1:{port}/")
+            return OpenAIClientSingleton.pool_stats()
+
+    stats = asyncio.run(run())
+    assert stats["connections"] == 1
+    assert stats["idle_connections"] == 1
+    assert stats["active_requests"] == 0
+    assert stats["queued_requests"] == 0
+
+
+def test_pool_stats_are_zero_without_a_pool(mocker: MockerFixture) -> None:
+    mocker.patch.object(OpenAIClientSingleton, "_http_client", object())
+    stats = OpenAIClientSingleton.pool_stats()
+    assert stats.pop("max_connections") == settings.openai_max_connections
+    assert set(stats.values()) == {0}
@@ -0,0 +1,93 @@
+import asyncio
+
+from openai.types.chat import ChatCompletion
+from pytest_mock import MockerFixture
+
+from drivel_server.core.completion_cache import CompletionCache, MemoryCompletionStore
+from drivel_server.schemas.chat_replies import OpenAIParameters
+
+MESSAGES = [
+    {"role": "system", "content": "Translate to English."},
+    {"role": "user", "content": "¿Qué tal?"},
+]
+
+
+def completion() -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "How are you?"},
+                }
+            ],
+            "usage": {"prompt_tokens": 20, "completion_tokens": 4, "total_tokens": 24},
+        }
+    )
+
+
+def test_hits_count_the_tokens_saved() -> None:
+    cache = CompletionCache(MemoryCompletionStore(ttl=60, max_entries=10))
+
+    async def run() -> None:
+        assert await cache.get("a") is None
+        await cache.set("a", completion())
+        assert await cache.get("a") == completion()
+        await cache.get("a")
+
+    asyncio.run(run())
+    assert cache.stats() == {
+        "hits": 2,
+        "misses": 1,
+        "tokens_saved": 48,
+        "entries": 1,
+        "expirations": 0,
+        "evictions": 0,
+    }
+
+
+def test_least_recently_used_completions_are_evicted() -> None:
+    store = MemoryCompletionStore(ttl=60, max_entries=2)
+
+    async def run() -> None:
+        await store.set("a", b"a")
+        await store.set("b", b"b")
+        await store.get("a")
+        await store.set("c", b"c")
+        assert await store.get("a") == b"a"
+        assert await store.get("b") is None
+
+    asyncio.run(run())
+    assert store.stats()["evictions"] == 1
+
+
+def test_completions_expire(mocker: MockerFixture) -> None:
+    store = MemoryCompletionStore(ttl=60, max_entries=10)
+    monotonic = mocker.patch("drivel_server.core.completion_cache.time.monotonic")
+    monotonic.return_value = 0
+    asyncio.run(store.set("a", b"a"))
+    monotonic.return_value = 61
+    assert asyncio.run(store.get("a")) is None
+    assert store.stats()["expirations"] == 1
+
+
+def test_only_deterministic_or_marked_requests_are_cacheable() -> None:
+    assert OpenAIParameters(messages=MESSAGES, temperature=0).is_cacheable
+    assert not OpenAIParameters(messages=MESSAGES).is_cacheable
+    marked = OpenAIParameters(messages=MESSAGES, temperature=0.7, cacheable=True)
+    assert marked.is_cacheable
+    assert "cacheable" not in marked.model_dump()
+    assert not OpenAIParameters(
+        messages=MESSAGES, temperature=0, stream=True
+    ).is_cacheable
+
+
+def test_marking_a_request_cacheable_does_not_change_its_key() -> None:
+    params = OpenAIParameters(messages=MESSAGES, temperature=0.7)
+    marked = params.model_copy(update={"cacheable": True})
+    assert params.cache_key() == marked.cache_key()
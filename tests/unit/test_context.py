@@ -0,0 +1,94 @@
+import asyncio
+
+from drivel_server.core.context import SUMMARY_PREFIX, ContextWindow
+from drivel_server.core.sessions import Messages
+
+SYSTEM = {"role": "system", "content": "Be brief."}
+
+
+def count_words(_: str, text: str) -> int:
+    return len(text.split())
+
+
+def conversation(turns: int) -> Messages:
+    return [
+        SYSTEM,
+        *(
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i}"}
+            for i in range(turns)
+        ),
+    ]
+
+
+def test_short_conversations_are_kept() -> None:
+    window = ContextWindow(100, count_text=count_words)
+    messages = conversation(3)
+    context = asyncio.run(window.fit(messages, "gpt-4o"))
+    assert context.messages == messages
+    assert context.tokens_saved == 0
+    assert window.stats()["trimmed"] == 0
+
+
+def test_system_message_and_latest_turns_are_kept() -> None:
+    # Each turn takes 5 tokens, the system message 5 and the reply priming 3
+    window = ContextWindow(23, count_text=count_words)
+    messages = conversation(6)
+    context = asyncio.run(window.fit(messages, "gpt-4o"))
+    assert context.messages == [SYSTEM, *messages[-3:]]
+    assert context.tokens_after == 23
+    assert context.tokens_saved == 15
+    assert window.stats()["tokens_saved"] == 15
+
+
+def test_last_message_is_kept_even_if_it_does_not_fit() -> None:
+    window = ContextWindow(5, count_text=count_words)
+    messages = conversation(2)
+    context = asyncio.run(window.fit(messages, "gpt-4o"))
+    assert context.messages == [SYSTEM, messages[-1]]
+
+
+def test_dropped_turns_are_summarized_incrementally() -> None:
+    window = ContextWindow(30, summary_max_tokens=5, count_text=count_words)
+    calls = []
+
+    async def summarize(summary: str | None, turns: Messages) -> str:
+        calls.append((summary, [turn["content"] for turn in turns]))
+        return f"summary of {len(turns)}"
+
+    async def run() -> list[Messages]:
+        fitted = []
+        for turns in (6, 6, 8):
+            context = await window.fit(conversation(turns), "gpt-4o", summarize)
+            fitted.append(context.messages)
+        return fitted
+
+    first, second, third = asyncio.run(run())
+    assert first[1] == {"role": "system", "content": SUMMARY_PREFIX + "summary of 4"}
+    assert first[2:] == conversation(6)[-2:]
+    assert first == second
+    assert calls == [
+        (None, ["turn 0", "turn 1", "turn 2", "turn 3"]),
+        ("summary of 4", ["turn 4", "turn 5"]),
+    ]
+    assert third[2:] == conversation(8)[-2:]
+    assert window.stats()["summary_hits"] == 1
+
+
+def test_failed_summary_drops_turns() -> None:
+    window = ContextWindow(30, summary_max_tokens=5, count_text=count_words)
+
+    async def summarize(summary: str | None, turns: Messages) -> str:
+        raise RuntimeError(summary, turns)
+
+    context = asyncio.run(window.fit(conversation(6), "gpt-4o", summarize))
+    assert context.messages == [SYSTEM, *conversation(6)[-2:]]
+    assert window.stats()["summary_failures"] == 1
+
+
+def test_disabled_window_counts_nothing() -> None:
+    def count(_: str, text: str) -> int:
+        raise AssertionError(text)
+
+    window = ContextWindow(None, count_text=count)
+    messages = conversation(2)
+    assert asyncio.run(window.fit(messages, "gpt-4o")).messages is messages
@@ -0,0 +1,26 @@
+import httpx
+import openai
+
+from drivel_server.core.errors import OverloadedError, to_http_exception
+
+
+def test_overloaded_is_service_unavailable() -> None:
+    exception = to_http_exception(OverloadedError("openai", retry_after=2.5))
+    assert exception.status_code == 503
+    assert exception.headers == {"Retry-After": "3"}
+
+
+def test_upstream_rate_limit_is_too_many_requests() -> None:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": "7"}, request=request)
+    error = openai.RateLimitError("Rate limited", response=response, body=None)
+    exception = to_http_exception(error)
+    assert exception.status_code == 429
+    assert exception.headers == {"Retry-After": "7"}
+
+
+def test_other_errors_are_internal_server_errors() -> None:
+    exception = to_http_exception(ValueError("boom"))
+    assert exception.status_code == 500
+    assert exception.detail == "boom"
+    assert exception.headers is None
@@ -0,0 +1,77 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from drivel_server.core.errors import OverloadedError
+from drivel_server.core.limiter import AdaptiveLimiter
+
+
+async def _hold(limiter: AdaptiveLimiter, seconds: float) -> None:
+    async with limiter.acquire():
+        await asyncio.sleep(seconds)
+
+
+def test_calls_beyond_the_limit_wait() -> None:
+    limiter = AdaptiveLimiter("test", initial_limit=2, max_wait=1)
+
+    async def run() -> int:
+        tasks = [asyncio.create_task(_hold(limiter, 0.02)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        queued = limiter.stats()["queued"]
+        await asyncio.gather(*tasks)
+        return queued
+
+    assert asyncio.run(run()) == 1
+    assert limiter.stats()["in_flight"] == 0
+    assert limiter.stats()["shed"] == 0
+
+
+def test_calls_are_shed_when_the_queue_is_full() -> None:
+    limiter = AdaptiveLimiter("test", initial_limit=1, max_queue=1)
+
+    async def run() -> None:
+        tasks = [asyncio.create_task(_hold(limiter, 0.02)) for _ in range(2)]
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(OverloadedError):
+                await _hold(limiter, 0)
+        finally:
+            await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert limiter.stats()["shed"] == 1
+
+
+def test_calls_are_shed_after_the_maximum_wait() -> None:
+    limiter = AdaptiveLimiter("test", initial_limit=1, max_wait=0.01)
+
+    async def run() -> None:
+        task = asyncio.create_task(_hold(limiter, 0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError):
+            await _hold(limiter, 0)
+        await task
+
+    asyncio.run(run())
+    assert limiter.stats()["shed"] == 1
+    assert limiter.stats()["queued"] == 0
+
+
+def test_limit_decreases_on_timeouts() -> None:
+    limiter = AdaptiveLimiter("test", initial_limit=8, backoff=0.5)
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+    async def fail() -> None:
+        async with limiter.acquire():
+            await asyncio.sleep(0.01)
+            raise openai.APITimeoutError(request)
+
+    async def run() -> None:
+        # Simultaneous failures only decrease the limit once
+        await asyncio.gather(fail(), fail(), return_exceptions=True)
+
+    asyncio.run(run())
+    assert limiter.stats()["limit"] == 4
+    assert limiter.stats()["decreases"] == 1
@@ -0,0 +1,35 @@
+from prometheus_client import REGISTRY
+import pytest
+
+from drivel_server.core.metrics import track_upstream
+
+
+def _sample(name: str, labels: dict[str, str]) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_track_upstream_records_success() -> None:
+    labels = {"upstream": "test", "operation": "ok", "outcome": "success"}
+    before = _sample("drivel_upstream_duration_seconds_count", labels)
+    with track_upstream("test", "ok"):
+        pass
+    assert _sample("drivel_upstream_duration_seconds_count", labels) == before + 1
+    assert (
+        _sample("drivel_upstream_in_flight", {"upstream": "test", "operation": "ok"})
+        == 0
+    )
+
+
+def test_track_upstream_records_errors() -> None:
+    labels = {"upstream": "test", "operation": "fail", "type": "ValueError"}
+    before = _sample("drivel_upstream_errors_total", labels)
+    with pytest.raises(ValueError, match="boom"), track_upstream("test", "fail"):
+        raise ValueError("boom")
+    assert _sample("drivel_upstream_errors_total", labels) == before + 1
+    assert (
+        _sample(
+            "drivel_upstream_duration_seconds_count",
+            {"upstream": "test", "operation": "fail", "outcome": "error"},
+        )
+        == 1
+    )
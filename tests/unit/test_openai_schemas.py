@@ -70,6 +70,7 @@ def test_openai_parameters_default_values() -> None:
     assert params.model == "gpt-4o"
     assert params.max_tokens == 150
     assert params.n == 1
+    assert params.stream is False
 
 
 # Test incorrect field types
@@ -82,3 +83,16 @@ def test_openai_parameters_incorrect_types() -> None:
     }
     with pytest.raises(ValidationError):
         OpenAIParameters(**incorrect_input)
+
+
+# Test that only greedy sampling is considered deterministic
+def test_openai_parameters_is_deterministic() -> None:
+    messages = [
+        ChatCompletionSystemMessageParam({"content": "System", "role": "system"}),
+        ChatCompletionUserMessageParam({"content": "User", "role": "user"}),
+    ]
+    assert not OpenAIParameters(messages=messages).is_deterministic
+    assert OpenAIParameters(messages=messages, temperature=0).is_deterministic
+    assert not OpenAIParameters(
+        messages=messages, temperature=0, stream=True
+    ).is_deterministic
@@ -0,0 +1,64 @@
+import asyncio
+from pathlib import Path
+
+from pytest_mock import MockerFixture
+
+from drivel_server.api.v1.endpoints import tts
+from drivel_server.phrase_bank import build_phrase_bank
+from drivel_server.schemas.tts import PhraseManifest, TTSParameters
+
+
+def test_manifest_expands_phrases_to_encodings() -> None:
+    manifest = PhraseManifest(
+        phrases=[
+            TTSParameters(text="Hola"),
+            TTSParameters(text="Adiós", audio_encoding="LINEAR16"),
+        ],
+        audio_encodings=["MP3", "OGG_OPUS"],
+    )
+    requests = [(p.text, p.audio_encoding) for p in manifest.requests()]
+    assert requests == [
+        ("Hola", "MP3"),
+        ("Hola", "OGG_OPUS"),
+        ("Adiós", "LINEAR16"),
+        ("Adiós", "LINEAR16"),
+    ]
+
+
+def test_phrase_bank_is_served_without_upstream_calls(
+    tmp_path: Path, mocker: MockerFixture
+) -> None:
+    upstream = mocker.patch(
+        "drivel_server.phrase_bank.request_speech",
+        side_effect=lambda p, _: p.text.encode(),
+    )
+    cached = mocker.patch.object(tts, "_synthesize_and_cache")
+    manifest = PhraseManifest(phrases=[TTSParameters(text="¡Hola!")])
+    path = tmp_path / "phrase-bank.bin"
+    assert asyncio.run(build_phrase_bank(manifest, path, None)) == 1  # type: ignore[arg-type]
+    assert upstream.call_count == 1
+    # The phrases do not go through the cache
+    assert cached.call_count == 0
+
+    tts.phrase_bank.open(path)
+    try:
+        audio = asyncio.run(tts.synthesize(TTSParameters(text=" ¡Hola!"), None))  # type: ignore[arg-type]
+    finally:
+        tts.phrase_bank.close()
+    assert audio == "¡Hola!".encode()
+    assert cached.call_count == 0
+    assert tts.phrase_bank.hits == 1
+
+
+def test_failed_phrases_are_left_out(tmp_path: Path, mocker: MockerFixture) -> None:
+    async def request_speech(params: TTSParameters, _: object) -> bytes:
+        if params.text == "Adiós":
+            raise RuntimeError("boom")
+        return params.text.encode()
+
+    mocker.patch("drivel_server.phrase_bank.request_speech", request_speech)
+    manifest = PhraseManifest(
+        phrases=[TTSParameters(text="Hola"), TTSParameters(text="Adiós")]
+    )
+    path = tmp_path / "phrase-bank.bin"
+    assert asyncio.run(build_phrase_bank(manifest, path, None)) == 1  # type: ignore[arg-type]
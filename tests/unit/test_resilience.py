@@ -0,0 +1,142 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+import httpx
+import openai
+import pytest
+
+from drivel_server.core.errors import CircuitOpenError
+from drivel_server.core.limiter import AdaptiveLimiter
+from drivel_server.core.resilience import (
+    CircuitBreaker,
+    CircuitState,
+    RetryBudget,
+    Upstream,
+)
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _upstream(budget: RetryBudget | None = None, threshold: int = 5) -> Upstream:
+    return Upstream(
+        "test",
+        limiter=AdaptiveLimiter("test"),
+        breaker=CircuitBreaker("test", failure_threshold=threshold),
+        budget=budget or RetryBudget(),
+        backoff_base=0,
+    )
+
+
+def _flaky(failures: int) -> tuple[list[int], Callable[[], Awaitable[str]]]:
+    calls = []
+
+    async def fn() -> str:
+        calls.append(1)
+        if len(calls) <= failures:
+            raise openai.APIConnectionError(request=REQUEST)
+        return "ok"
+
+    return calls, fn
+
+
+def test_transient_failures_are_retried() -> None:
+    upstream = _upstream()
+    calls, fn = _flaky(failures=2)
+    assert asyncio.run(upstream.call("op", fn)) == "ok"
+    assert len(calls) == 3
+    assert upstream.stats()["retries"] == 2
+
+
+def test_other_failures_are_not_retried() -> None:
+    upstream = _upstream()
+
+    async def fn() -> str:
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        asyncio.run(upstream.call("op", fn))
+    assert upstream.stats()["retries"] == 0
+
+
+def test_retries_are_limited_by_the_budget() -> None:
+    upstream = _upstream(budget=RetryBudget(ratio=0, capacity=1))
+    calls, fn = _flaky(failures=5)
+    with pytest.raises(openai.APIConnectionError):
+        asyncio.run(upstream.call("op", fn))
+    assert len(calls) == 2
+
+
+def test_circuit_opens_after_consecutive_failures() -> None:
+    upstream = _upstream(budget=RetryBudget(ratio=0, capacity=0), threshold=2)
+    calls, fn = _flaky(failures=5)
+    for _ in range(2):
+        with pytest.raises(openai.APIConnectionError):
+            asyncio.run(upstream.call("op", fn))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(upstream.call("op", fn))
+    assert len(calls) == 2
+    assert upstream.breaker.state == CircuitState.OPEN
+
+
+def test_circuit_closes_after_a_successful_trial() -> None:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    with pytest.raises(openai.APIConnectionError), breaker.guard():
+        raise openai.APIConnectionError(request=REQUEST)
+    assert breaker.state == CircuitState.OPEN
+    with breaker.guard():
+        assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_slow_calls_are_hedged() -> None:
+    upstream = _upstream()
+    delays = iter([0.001] * 20 + [1, 0.001])
+
+    async def fn() -> float:
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+
+    async def run() -> list[float]:
+        return [await upstream.call("op", fn, hedge=True) for _ in range(21)]
+
+    assert asyncio.run(run())[-1] == 0.001
+    assert upstream.stats()["hedges"] == 1
+    assert upstream.stats()["hedge_wins"] == 1
+
+
+class FakeStream:
+    def __init__(self, items: list[str]) -> None:
+        self.items = items
+        self.closed = False
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        """Yield the items."""
+        for item in self.items:
+            yield item
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+def test_streams_hold_their_slot_until_they_end() -> None:
+    upstream = _upstream()
+
+    async def run() -> None:
+        exhausted = await upstream.stream("op", lambda: _value(FakeStream(["a"])))
+        closed = await upstream.stream("op", lambda: _value(FakeStream(["a", "b"])))
+        assert upstream.limiter.in_flight == 2
+        assert [item async for item in exhausted] == ["a"]
+        assert upstream.limiter.in_flight == 1
+        async for _ in closed:
+            break
+        await closed.close()
+        assert upstream.limiter.in_flight == 0
+
+    asyncio.run(run())
+    # Streams take as long as their output, which says nothing about the latency
+    assert upstream.limiter.stats()["latency_ms"] == 0
+
+
+async def _value(value: FakeStream) -> FakeStream:
+    return value
@@ -0,0 +1,26 @@
+import json
+
+from openai.types.audio import Transcription
+from openai.types.chat.chat_completion import Choice
+
+from drivel_server.core.responses import dump_json, json_response
+
+
+def test_trusted_models_are_serialized_without_validation() -> None:
+    choice = Choice.model_construct(
+        index=0,
+        finish_reason="stop",
+        logprobs=None,
+        message={"role": "assistant", "content": "Hola"},
+    )
+    assert json.loads(dump_json([choice]))[0]["message"]["content"] == "Hola"
+    assert dump_json([]) == b"[]"
+    assert json.loads(dump_json(Transcription(text="Hola")))["text"] == "Hola"
+
+
+def test_raw_json_is_passed_through() -> None:
+    raw = b'{"text": "Hola", "extra": 1}'
+    response = json_response(raw, {"X-Context-Tokens-Saved": "0"})
+    assert response.body == raw
+    assert response.media_type == "application/json"
+    assert response.headers["X-Context-Tokens-Saved"] == "0"
@@ -0,0 +1,74 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from drivel_server.core.security import SecretsProvider
+
+
+@pytest.fixture()
+def secrets_folder(tmp_path: Path, mocker: MockerFixture) -> Path:
+    settings = mocker.patch("drivel_server.core.security.settings")
+    settings.env = "prod"
+    for name in ("api_key", "org_id", "proj_id"):
+        (tmp_path / name).write_text(f"{name}-1\n")
+    settings.openai_api_key_file = str(tmp_path / "api_key")
+    settings.openai_organization_id_file = str(tmp_path / "org_id")
+    settings.openai_project_id_file = str(tmp_path / "proj_id")
+    return tmp_path
+
+
+def test_secrets_are_read_once_until_they_expire(
+    secrets_folder: Path, mocker: MockerFixture
+) -> None:
+    provider = SecretsProvider(ttl=60)
+    monotonic = mocker.patch("drivel_server.core.security.time.monotonic")
+    monotonic.return_value = 0
+
+    async def run() -> None:
+        assert await provider.get("api_key") == "api_key-1"
+        (secrets_folder / "api_key").write_text("api_key-2")
+        assert await provider.get("api_key") == "api_key-1"
+        monotonic.return_value = 61
+        assert await provider.get("api_key") == "api_key-2"
+
+    asyncio.run(run())
+    assert provider.stats() == {"refreshes": 2, "changes": 1, "failures": 0}
+
+
+def test_subscribers_are_notified_of_changes(secrets_folder: Path) -> None:
+    provider = SecretsProvider(ttl=60)
+    notified = []
+
+    async def listener(secrets: dict[str, str]) -> None:
+        notified.append(secrets)
+
+    provider.subscribe(listener)
+
+    async def run() -> None:
+        await provider.refresh()
+        await provider.refresh()
+        (secrets_folder / "org_id").write_text("org_id-2")
+        await provider.refresh()
+
+    asyncio.run(run())
+    assert notified == [
+        {"api_key": "api_key-1", "org_id": "org_id-2", "proj_id": "proj_id-1"}
+    ]
+
+
+def test_stale_secrets_are_used_if_a_refresh_fails(
+    secrets_folder: Path, mocker: MockerFixture
+) -> None:
+    provider = SecretsProvider(ttl=60)
+    monotonic = mocker.patch("drivel_server.core.security.time.monotonic")
+    monotonic.return_value = 0
+
+    async def run() -> None:
+        await provider.refresh()
+        (secrets_folder / "proj_id").unlink()
+        monotonic.return_value = 61
+        assert await provider.get("proj_id") == "proj_id-1"
+
+    asyncio.run(run())
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from drivel_server.core.sessions import MemorySessionStore
+from drivel_server.schemas.sessions import SessionTurnParameters
+
+SYSTEM = {"role": "system", "content": "You are a helpful assistant."}
+
+
+def test_sessions_are_stored_and_deleted() -> None:
+    store = MemorySessionStore(ttl=60, max_sessions=10)
+
+    async def run() -> None:
+        await store.set("a", [SYSTEM])
+        assert await store.get("a") == [SYSTEM]
+        await store.delete("a")
+        assert await store.get("a") is None
+
+    asyncio.run(run())
+
+
+def test_least_recently_used_sessions_are_evicted() -> None:
+    store = MemorySessionStore(ttl=60, max_sessions=2)
+
+    async def run() -> None:
+        await store.set("a", [SYSTEM])
+        await store.set("b", [SYSTEM])
+        await store.get("a")
+        await store.set("c", [SYSTEM])
+        assert await store.get("a") is not None
+        assert await store.get("b") is None
+
+    asyncio.run(run())
+    assert store.stats() == {"sessions": 2, "expirations": 0, "evictions": 1}
+
+
+def test_sessions_expire(mocker: MockerFixture) -> None:
+    store = MemorySessionStore(ttl=60, max_sessions=10)
+    monotonic = mocker.patch("drivel_server.core.sessions.time.monotonic")
+    monotonic.return_value = 0
+    asyncio.run(store.set("a", [SYSTEM]))
+    monotonic.return_value = 61
+    assert asyncio.run(store.get("a")) is None
+    assert store.stats()["expirations"] == 1
+
+
+def test_turn_appends_the_user_message_to_the_history() -> None:
+    params = SessionTurnParameters(content="¿Qué tal?", temperature=0)
+    openai_params = params.to_openai_parameters([SYSTEM])
+    assert openai_params.messages == [SYSTEM, {"role": "user", "content": "¿Qué tal?"}]
+    assert openai_params.n == 1
+    assert openai_params.is_deterministic
+
+
+def test_empty_turn_is_rejected() -> None:
+    with pytest.raises(ValueError, match="content must not be empty"):
+        SessionTurnParameters(content=" ")
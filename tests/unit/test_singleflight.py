@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from drivel_server.core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_coalesced() -> None:
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run() -> list[str]:
+        return await asyncio.gather(*(flight.do("key", fetch) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["result"] * 3
+    assert calls == 1
+    assert flight.stats() == {"calls": 1, "coalesced": 2, "in_flight": 0}
+
+
+def test_cancelled_caller_does_not_cancel_the_call() -> None:
+    flight = SingleFlight()
+
+    async def fetch() -> str:
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def run() -> str:
+        first = asyncio.create_task(flight.do("key", fetch))
+        second = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "result"
+
+
+def test_errors_are_shared_and_not_cached() -> None:
+    flight = SingleFlight()
+
+    async def fail() -> str:
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run() -> list[str | BaseException]:
+        return await asyncio.gather(
+            flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    with pytest.raises(ValueError, match="upstream failed"):
+        asyncio.run(flight.do("key", fail))
+    assert flight.calls == 2
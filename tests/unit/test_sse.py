@@ -0,0 +1,13 @@
+from drivel_server.core.sse import sse_event
+
+
+def test_sse_event_data_only() -> None:
+    assert sse_event("[DONE]") == "data: [DONE]\n\n"
+
+
+def test_sse_event_with_event_name() -> None:
+    assert sse_event("{}", event="error") == "event: error\ndata: {}\n\n"
+
+
+def test_sse_event_multiline_data() -> None:
+    assert sse_event("a\nb") == "data: a\ndata: b\n\n"
@@ -0,0 +1,36 @@
+from pydantic import ValidationError
+import pytest
+
+from drivel_server.schemas.structured_replies import (
+    RESPONSE_FORMAT,
+    StructuredReplyParameters,
+)
+
+MESSAGES = [
+    {"role": "system", "content": "Habla en español."},
+    {"role": "user", "content": "Yo tener hambre."},
+]
+
+
+def test_response_format_is_strict() -> None:
+    schema = RESPONSE_FORMAT["json_schema"]["schema"]
+    assert schema["additionalProperties"] is False
+    assert set(schema["required"]) == {"reply", "translation", "correction"}
+
+
+def test_instructions_are_added_to_the_system_message() -> None:
+    params = StructuredReplyParameters(
+        messages=MESSAGES, translation_language="Swedish"
+    )
+    messages = params.with_instructions().messages
+    assert messages[0]["content"].startswith("Habla en español.\n\n")
+    assert "Swedish" in messages[0]["content"]
+    assert messages[1:] == MESSAGES[1:]
+    kwargs = params.to_openai_kwargs()
+    assert "translation_language" not in kwargs
+    assert kwargs["response_format"] is RESPONSE_FORMAT
+
+
+def test_streaming_is_rejected() -> None:
+    with pytest.raises(ValidationError, match="stream is not supported"):
+        StructuredReplyParameters(messages=MESSAGES, stream=True)
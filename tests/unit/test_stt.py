@@ -0,0 +1,77 @@
+import asyncio
+import io
+import json
+from types import SimpleNamespace
+from typing import BinaryIO
+
+import pytest
+from pytest_mock import MockerFixture
+
+from drivel_server.api.v1.endpoints.stt import transcribe_json
+from drivel_server.core.cache import TieredCache
+from drivel_server.core.singleflight import SingleFlight
+from drivel_server.schemas.stt import STTParameters
+
+
+class FakeTranscriptions:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def create(
+        self, file: tuple[str, BinaryIO, str | None], **_: str
+    ) -> SimpleNamespace:
+        self.calls += 1
+        await self.release.wait()
+        return SimpleNamespace(
+            content=json.dumps({"text": file[1].read().decode()}).encode()
+        )
+
+
+async def call(_: str, fn, **__: bool) -> object:  # noqa: ANN001
+    return await fn()
+
+
+def test_shared_transcription_outlives_a_cancelled_caller(
+    mocker: MockerFixture,
+) -> None:
+    mocker.patch("drivel_server.api.v1.endpoints.stt.stt_cache", TieredCache(1024))
+    flight = SingleFlight()
+    mocker.patch("drivel_server.api.v1.endpoints.stt.stt_flight", flight)
+    mocker.patch(
+        "drivel_server.api.v1.endpoints.stt.openai_upstream.call", side_effect=call
+    )
+    transcriptions = FakeTranscriptions()
+    client = SimpleNamespace(
+        audio=SimpleNamespace(
+            transcriptions=SimpleNamespace(with_raw_response=transcriptions)
+        )
+    )
+
+    async def run() -> str:
+        first_file, second_file = io.BytesIO(b"hola"), io.BytesIO(b"hola")
+        first = asyncio.create_task(
+            transcribe_json(first_file, "a.mp3", None, STTParameters(), client)
+        )
+        while transcriptions.calls == 0:
+            await asyncio.sleep(0)
+        second = asyncio.create_task(
+            transcribe_json(second_file, "a.mp3", None, STTParameters(), client)
+        )
+        while flight.coalesced == 0:
+            await asyncio.sleep(0)
+        # The first client disconnects, but its upload is only closed once its
+        # request is done
+        first.cancel()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert not first.done()
+        transcriptions.release.set()
+        text = json.loads(await second)["text"]
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        first_file.close()
+        return text
+
+    assert asyncio.run(run()) == "hola"
+    assert transcriptions.calls == 1
@@ -0,0 +1,24 @@
+from drivel_server.core.text import pop_sentences, split_sentences
+
+
+def test_split_sentences() -> None:
+    text = "Hola, ¿qué tal? «Muy bien.» Y tú..."
+    assert split_sentences(text) == ["Hola, ¿qué tal?", "«Muy bien.»", "Y tú..."]
+
+
+def test_split_sentences_keeps_unterminated_tail() -> None:
+    assert split_sentences("  Hola. Adiós  ") == ["Hola.", "Adiós"]
+
+
+def test_split_sentences_splits_long_sentences_at_clauses() -> None:
+    text = "uno, dos, tres, cuatro."
+    assert split_sentences(text, max_chars=10) == ["uno, dos,", "tres,", "cuatro."]
+
+
+def test_pop_sentences_returns_incomplete_rest() -> None:
+    assert pop_sentences("Hola. ¿Qué tal? Muy") == (["Hola.", "¿Qué tal?"], "Muy")
+
+
+def test_pop_sentences_waits_for_whitespace() -> None:
+    # The sentence may continue, e.g. as "Hola..."
+    assert pop_sentences("Hola.") == ([], "Hola.")
@@ -0,0 +1,58 @@
+import asyncio
+
+from pytest_mock import MockerFixture
+
+from drivel_server.core.tickets import TicketStore
+
+
+def test_tickets_are_redeemed_for_the_result() -> None:
+    store = TicketStore(ttl=60, max_tickets=10)
+
+    async def run() -> None:
+        release = asyncio.Event()
+
+        async def compute() -> str:
+            await release.wait()
+            return "audio"
+
+        ticket_id = store.create(compute)
+        task = store.get(ticket_id)
+        assert task is not None
+        assert not task.done()
+        release.set()
+        assert await task == "audio"
+        assert store.get("unknown") is None
+
+    asyncio.run(run())
+    assert store.stats()["redeemed"] == 1
+
+
+def test_oldest_tickets_are_evicted_and_cancelled() -> None:
+    store = TicketStore(ttl=60, max_tickets=1)
+
+    async def run() -> None:
+        first = store.create(asyncio.Event().wait)
+        task = store.get(first)
+        store.create(asyncio.Event().wait)
+        assert store.get(first) is None
+        await asyncio.sleep(0)
+        assert task is not None
+        assert task.cancelled()
+        store.close()
+
+    asyncio.run(run())
+    assert store.stats()["evictions"] == 1
+
+
+def test_tickets_expire(mocker: MockerFixture) -> None:
+    store = TicketStore(ttl=60, max_tickets=10)
+    monotonic = mocker.patch("drivel_server.core.tickets.time.monotonic")
+    monotonic.return_value = 0
+
+    async def run() -> None:
+        ticket_id = store.create(asyncio.Event().wait)
+        monotonic.return_value = 61
+        assert store.get(ticket_id) is None
+
+    asyncio.run(run())
+    assert store.stats()["expirations"] == 1
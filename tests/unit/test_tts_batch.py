@@ -0,0 +1,37 @@
+import asyncio
+
+from pytest_mock import MockerFixture
+
+from drivel_server.api.v1.endpoints.tts import encode_batch, synthesize_batch
+from drivel_server.schemas.tts import TTSParameters
+
+
+async def fake_synthesize(params: TTSParameters, _: object) -> bytes:
+    if params.text == "fail":
+        raise ValueError("cannot synthesize")
+    return f"<{params.text}>".encode()
+
+
+def test_batch_deduplicates_items_and_reports_failures(mocker: MockerFixture) -> None:
+    synthesize = mocker.patch(
+        "drivel_server.api.v1.endpoints.tts.synthesize", side_effect=fake_synthesize
+    )
+    items = [
+        TTSParameters(text="Hola"),
+        TTSParameters(text="fail"),
+        TTSParameters(text=" Hola "),
+        TTSParameters(text="Hola", audio_encoding="OGG_OPUS"),
+    ]
+
+    async def collect() -> bytes:
+        results = synthesize_batch(items, None)  # type: ignore[arg-type]
+        return b"".join([part async for part in encode_batch(results, "b")])
+
+    body = asyncio.run(collect())
+    assert synthesize.call_count == 3
+    assert body.endswith(b"--b--\r\n")
+    assert (
+        b"Content-Type: audio/mpeg\r\nContent-Length: 6\r\nX-Item-Index: 0, 2" in body
+    )
+    assert b"audio/ogg; codecs=opus\r\nContent-Length: 6\r\nX-Item-Index: 3" in body
+    assert b'X-Item-Index: 1\r\n\r\n{"status_code": 500' in body
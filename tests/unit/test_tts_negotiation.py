@@ -0,0 +1,22 @@
+import pytest
+
+from drivel_server.api.v1.endpoints.tts import STREAMABLE_ENCODINGS, negotiate_encoding
+
+
+@pytest.mark.parametrize(
+    ("accept", "encoding"),
+    [
+        (None, "MP3"),
+        ("application/json", "MP3"),
+        ("audio/ogg", "OGG_OPUS"),
+        ("audio/mpeg;q=0.5, audio/ogg; codecs=opus", "OGG_OPUS"),
+        ("audio/*, audio/ogg;q=0.5", "MP3"),
+        ("audio/ogg;q=0, audio/wav;q=0.1", "LINEAR16"),
+    ],
+)
+def test_encoding_is_negotiated(accept: str | None, encoding: str) -> None:
+    assert negotiate_encoding(accept) == encoding
+
+
+def test_unsupported_encodings_are_not_negotiated() -> None:
+    assert negotiate_encoding("audio/wav", STREAMABLE_ENCODINGS) == "MP3"
@@ -24,6 +24,12 @@ def test_text_must_not_be_empty_invalid() -> None:
     assert "text must not be empty" in str(exc_info.value)
 
 
+def test_text_must_not_be_blank() -> None:
+    """Text made only of whitespace should raise ValidationError."""
+    with pytest.raises(ValidationError, match="text must not be empty"):
+        TTSParameters(text=" \n\t", language_code="en-US", name="en-US-Standard-A")
+
+
 def test_language_code_must_follow_pattern_valid() -> None:
     """Valid language_code should not raise ValidationError."""
     params = TTSParameters(text="Hello", language_code="en-US", name="en-US-Standard-A")
@@ -81,3 +87,39 @@ def test_speaking_rate_invalid(speaking_rate: float) -> None:
             speaking_rate=speaking_rate,
         )
     assert "speaking_rate must be between 0.25 and 4" in str(exc_info.value)
+
+
+def test_cache_key_normalizes_text() -> None:
+    """Whitespace and unicode normalization do not change the cache key."""
+    composed = TTSParameters(text="¿Qué tal?")
+    decomposed = TTSParameters(text=" ¿Que\u0301 tal?\n")
+    assert composed.cache_key() == decomposed.cache_key()
+    # The synthesized text is the one the key was computed from
+    assert decomposed.text == composed.text
+
+
+def test_cache_key_uses_the_synthesized_speaking_rate() -> None:
+    """Rates that share a cache key are synthesized at the same rate."""
+    params = TTSParameters(text="Hola", speaking_rate=1.004)
+    assert params.speaking_rate == 1.0
+    assert params.cache_key() == TTSParameters(text="Hola").cache_key()
+
+
+def test_cache_key_depends_on_voice_settings() -> None:
+    """Different voice settings result in different cache keys."""
+    params = TTSParameters(text="Hola")
+    assert (
+        params.cache_key() != TTSParameters(text="Hola", speaking_rate=1.5).cache_key()
+    )
+    assert (
+        params.cache_key()
+        == TTSParameters(text="Hola", audio_encoding="MP3").cache_key()
+    )
+    opus = TTSParameters(text="Hola", audio_encoding="OGG_OPUS")
+    assert params.cache_key() != opus.cache_key()
+    assert (
+        opus.cache_key()
+        != TTSParameters(
+            text="Hola", audio_encoding="OGG_OPUS", sample_rate_hertz=16000
+        ).cache_key()
+    )
@@ -0,0 +1,28 @@
+import hashlib
+import io
+from pathlib import Path
+
+from drivel_server.core.uploads import audio_duration, file_digest
+
+AUDIO_PATH = (
+    Path(__file__).parents[1] / "data" / "audio" / "me_gusta_aprender_idiomas.mp3"
+)
+
+
+def test_file_digest_rewinds_file() -> None:
+    file = io.BytesIO(b"audio" * 1000)
+    file.seek(10)
+    assert file_digest(file) == hashlib.sha256(b"audio" * 1000).hexdigest()
+    assert file.tell() == 0
+
+
+def test_audio_duration_of_mp3() -> None:
+    with AUDIO_PATH.open("rb") as file:
+        duration = audio_duration(file)
+        assert file.tell() == 0
+    assert duration is not None
+    assert 0 < duration < 10
+
+
+def test_audio_duration_of_unknown_format() -> None:
+    assert audio_duration(io.BytesIO(b"not audio")) is None
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from drivel_server.core.voices import VoiceCatalog
+from drivel_server.schemas.tts import VoiceParameters
+from drivel_server.schemas.voices import Voice
+
+VOICES = [
+    Voice(
+        name="es-ES-Standard-B",
+        language_codes=["es-ES"],
+        ssml_gender="MALE",
+        natural_sample_rate_hertz=24000,
+    ),
+    Voice(
+        name="es-ES-Standard-C",
+        language_codes=["es-ES"],
+        ssml_gender="FEMALE",
+        natural_sample_rate_hertz=24000,
+    ),
+    Voice(
+        name="sv-SE-Standard-A",
+        language_codes=["sv-SE"],
+        ssml_gender="FEMALE",
+        natural_sample_rate_hertz=24000,
+    ),
+]
+
+
+def test_voices_are_indexed_by_language_and_gender() -> None:
+    catalog = VoiceCatalog(refresh_interval=60)
+    catalog.update(VOICES)
+    assert catalog.voices("es-ES", "FEMALE") == [VOICES[1]]
+    assert catalog.voices(gender="FEMALE") == [VOICES[1], VOICES[2]]
+    assert catalog.voices("fr-FR") == []
+    assert catalog.stats()["languages"] == 2
+
+
+def test_every_voice_is_accepted_until_the_catalog_is_loaded() -> None:
+    catalog = VoiceCatalog(refresh_interval=60)
+    catalog.check("es-ES-Unknown", "es-ES")
+    catalog.update(VOICES)
+    with pytest.raises(ValueError, match="does not exist"):
+        catalog.check("es-ES-Unknown", "es-ES")
+
+
+def test_voice_parameters_are_validated_against_the_catalog(
+    mocker: MockerFixture,
+) -> None:
+    catalog = VoiceCatalog(refresh_interval=60)
+    catalog.update(VOICES)
+    mocker.patch("drivel_server.schemas.tts.voice_catalog", catalog)
+    VoiceParameters(name="es-ES-Standard-C")
+    with pytest.raises(ValueError, match="does not exist"):
+        VoiceParameters(name="es-ES-Standard-Z")
+
+
+def test_listing_etag_changes_with_the_catalog() -> None:
+    catalog = VoiceCatalog(refresh_interval=60)
+    catalog.update(VOICES)
+    body, etag = catalog.listing("sv-SE")
+    assert b"sv-SE-Standard-A" in body
+    assert b"es-ES" not in body
+    assert catalog.listing("sv-SE") == (body, etag)
+    assert catalog.listing()[1] != etag
+    catalog.update(VOICES[:2])
+    body, new_etag = catalog.listing("sv-SE")
+    assert body == b"[]"
+    assert new_etag != etag
+
+
+def test_failed_refresh_keeps_the_voices() -> None:
+    catalog = VoiceCatalog(refresh_interval=60)
+    catalog.update(VOICES)
+
+    async def fail() -> list[Voice]:
+        raise RuntimeError("unavailable")
+
+    asyncio.run(catalog.refresh(fail))
+    assert catalog.stats()["voices"] == 3
+    assert catalog.stats()["failures"] == 1